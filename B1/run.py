@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import sys
@@ -8,8 +9,150 @@ from datetime import datetime
 # Add tools directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
 
-from agent import generate_state_prep
-from check_stabilizers import check_stabilizers
+from agent import SESSION_STARTUP_SECONDS, generate_state_prep_async, session_startup_summary
+from verification_cache import cached_check_stabilizers
+from client_pool import CopilotClientPool
+from result_sink import ResultSink, load_resume, resume_info, resumed_output_path
+
+
+async def generate_circuit_for_benchmark(
+    code_name: str,
+    generators: list[str],
+    model: str,
+    attempts: int,
+    timeout: int,
+    prompt_file: str,
+    agent_files_dir: str | None = None,
+    log_prefix: str = "  ",
+    client_pool: CopilotClientPool | None = None,
+) -> dict:
+    """
+    Generate and check the state preparation circuit of a single benchmark.
+    
+    Args:
+        code_name: Name of the code, copied into the result
+        generators: Stabilizer generators of the code
+        agent_files_dir: Scratch directory of the agent (default: shared data/<model>/agent_files)
+        log_prefix: Prefix of the progress lines printed for this benchmark
+        client_pool: Pool of warm Copilot clients to run the session on
+    
+    Returns:
+        The result entry for this benchmark
+    """
+    start_time = time.time()
+    try:
+        circuit = await generate_state_prep_async(
+            stabilizers=generators,
+            model=model,
+            attempts=attempts,
+            timeout=timeout,
+            prompt_file=prompt_file,
+            agent_files_dir=agent_files_dir,
+            client_pool=client_pool,
+        )
+        
+        if circuit is not None:
+            circuit_str = str(circuit)
+            stab_results = cached_check_stabilizers(circuit_str, generators)
+            preserved = sum(1 for ok in stab_results.values() if ok)
+            total = len(stab_results)
+            print(f"{log_prefix}✓ Circuit generated — stabilizers preserved: {preserved}/{total}")
+        else:
+            circuit_str = None
+            stab_results = None
+            preserved = 0
+            total = len(generators)
+            print(f"{log_prefix}✗ Failed to generate circuit")
+            
+    except Exception as e:
+        circuit_str = None
+        stab_results = None
+        preserved = 0
+        total = len(generators)
+        print(f"{log_prefix}✗ Error: {e}")
+    
+    elapsed_seconds = round(time.time() - start_time, 2)
+    print(f"{log_prefix}⏱ Elapsed: {elapsed_seconds}s")
+
+    return {
+        "code_name": code_name,
+        "circuit": circuit_str,
+        "stabilizes": stab_results,
+        "preserved": preserved,
+        "total": total,
+        "success_rate": preserved / total,
+        "elapsed_seconds": elapsed_seconds
+    }
+
+
+def _failed_result(code_name: str, generators: list[str], elapsed_seconds: float, error: str) -> dict:
+    return {
+        "code_name": code_name,
+        "circuit": None,
+        "stabilizes": None,
+        "preserved": 0,
+        "total": len(generators),
+        "success_rate": 0.0,
+        "elapsed_seconds": round(elapsed_seconds, 2),
+        "error": error,
+    }
+
+
+async def _generate_all(tasks, total, workers, task_timeout, use_client_pool, on_result, **kwargs) -> dict:
+    """
+    Run `generate_circuit_for_benchmark` for (index, code_name, generators) tasks with up
+    to `workers` agent sessions in flight, calling on_result(index, result) as each finishes.
+    
+    With more than one worker every benchmark gets its own agent files directory,
+    data/<model>/agent_files/<index>. A session still running after task_timeout seconds
+    is cancelled and recorded as failed. All sessions share one pool of
+    `workers` warm Copilot clients unless use_client_pool is False.
+    
+    Returns:
+        Session start-up statistics, see `session_startup_summary`
+    """
+    limit = asyncio.Semaphore(workers)
+    agent_files_root = os.path.join("data", kwargs["model"], "agent_files")
+
+    async def run(index, code_name, generators, client_pool):
+        concurrent = workers > 1
+        log_prefix = f"  [{index+1}] {code_name}: " if concurrent else "  "
+        async with limit:
+            print(f"[{index+1}/{total}] Generating circuit for: {code_name}")
+            # print(f"  Generators: {generators}")
+            start_time = time.time()
+            try:
+                result = await asyncio.wait_for(
+                    generate_circuit_for_benchmark(
+                        code_name,
+                        generators,
+                        agent_files_dir=os.path.join(agent_files_root, str(index)) if concurrent else None,
+                        log_prefix=log_prefix,
+                        client_pool=client_pool,
+                        **kwargs,
+                    ),
+                    timeout=task_timeout,
+                )
+            except asyncio.TimeoutError:
+                print(f"{log_prefix}✗ Timed out after {task_timeout}s")
+                result = _failed_result(code_name, generators, time.time() - start_time,
+                                        f"Timed out after {task_timeout}s")
+        on_result(index, result)
+
+    async def run_all(client_pool):
+        if workers <= 1:
+            for task in tasks:
+                await run(*task, client_pool)
+        else:
+            await asyncio.gather(*(run(*task, client_pool) for task in tasks))
+
+    startup_before = len(SESSION_STARTUP_SECONDS)
+    if use_client_pool:
+        async with CopilotClientPool(size=workers) as client_pool:
+            await run_all(client_pool)
+    else:
+        await run_all(None)
+    return session_startup_summary(startup_before)
 
 
 def generate_circuits_from_benchmarks(
@@ -18,7 +161,11 @@ def generate_circuits_from_benchmarks(
     model: str = "claude-sonnet-4.5",
     attempts: int = 3,
     timeout: int = 60,
-    prompt_file: str = "B1/prompts/state_prep_prompt4.txt"
+    prompt_file: str = "B1/prompts/state_prep_prompt4.txt",
+    workers: int = 1,
+    task_timeout: float | None = None,
+    use_client_pool: bool = True,
+    resume: str | None = None,
 ) -> list[dict]:
     """
     Generate state preparation circuits for all stabilizer groups in benchmarks.
@@ -30,10 +177,24 @@ def generate_circuits_from_benchmarks(
         model: The model to use for generation (default: claude-sonnet-4.5)
         attempts: Number of attempts for each circuit generation
         timeout: Timeout in seconds for each generation
+        workers: Number of benchmarks generated concurrently. With more than one worker every
+            benchmark gets its own agent files directory, data/<model>/agent_files/<index>.
+        task_timeout: Wall-clock limit in seconds for one benchmark
+            (default: no limit beyond the agent's own timeouts)
+        use_client_pool: Run all sessions on a shared pool of warm Copilot clients instead of
+            starting a client per benchmark. The session start-up times are saved in the
+            metadata either way.
+        resume: JSON or JSONL output of an interrupted run over the same benchmarks. Its
+            results are kept, only the remaining benchmarks are generated, and the output
+            goes to the same file unless output_path is given.
     
     Returns:
-        List of dictionaries with code_name, generators, and circuit
+        List of dictionaries with code_name, generators, and circuit, in benchmark order.
+        Results are streamed to <output_path without suffix>.jsonl as they finish, and the
+        JSON output is written from that file at the end.
     """
+    if output_path is None and resume is not None:
+        output_path = resumed_output_path(resume)
     if output_path is None:
         timestamp = datetime.now().strftime("%y%m%d.%H%M")
         output_dir = os.path.join(".", "data", model)
@@ -42,6 +203,12 @@ def generate_circuits_from_benchmarks(
 
     with open(benchmarks_path, 'r') as f:
         benchmarks = json.load(f)
+
+    completed = {}
+    if resume is not None:
+        names = [b.get("name") if b.get("name") and b.get("generators") else None for b in benchmarks]
+        previous_metadata, completed = load_resume(resume, names)
+        print(f"Resuming {resume}: {len(completed)} benchmarks already done")
     
     metadata = {
         "benchmarks_path": benchmarks_path,
@@ -49,84 +216,54 @@ def generate_circuits_from_benchmarks(
         "prompt_path": prompt_file,
         "attempts": attempts,
         "timeout": timeout,
+        "workers": workers,
+        "client_pool": use_client_pool,
         "started_at": datetime.now().isoformat(),
     }
-    results = []
+    if resume is not None:
+        metadata["resumed"] = resume_info(resume, previous_metadata, completed)
+    # One JSONL line per benchmark; the JSON output is written from it at the end
+    sink = ResultSink(output_path, metadata, completed)
+
+    def record(index: int, result: dict) -> None:
+        sink.append(index, result)
+        print(f"  Saved result to {sink.jsonl_path}")
+    
+    tasks = []
+    for i, benchmark in enumerate(benchmarks):
+        code_name = benchmark.get("name")
+        generators = benchmark.get("generators")
+        
+        if not code_name or not generators:
+            print(f"[{i+1}/{len(benchmarks)}] Skipping entry with missing name or generators")
+            continue
+        if i in completed:
+            continue
+        tasks.append((i, code_name, generators))
     
     try:
-        count = 0
-        for i, benchmark in enumerate(benchmarks):
-            code_name = benchmark.get("name")
-            generators = benchmark.get("generators")
-            count += 1
-            
-            if not code_name or not generators:
-                print(f"[{i+1}/{len(benchmarks)}] Skipping entry with missing name or generators")
-                continue
-            
-            print(f"[{i+1}/{len(benchmarks)}] Generating circuit for: {code_name}")
-            # print(f"  Generators: {generators}")
-            
-            start_time = time.time()
-            try:
-                circuit = generate_state_prep(
-                    stabilizers=generators,
-                    model=model,
-                    attempts=attempts,
-                    timeout=timeout,
-                    prompt_file=prompt_file,
-                )
-                
-                if circuit is not None:
-                    circuit_str = str(circuit)
-                    stab_results = check_stabilizers(circuit_str, generators)
-                    preserved = sum(1 for ok in stab_results.values() if ok)
-                    total = len(stab_results)
-                    print(f"  ✓ Circuit generated — stabilizers preserved: {preserved}/{total}")
-                else:
-                    circuit_str = None
-                    stab_results = None
-                    preserved = 0
-                    total = len(generators)
-                    print(f"  ✗ Failed to generate circuit")
-                    
-            except Exception as e:
-                circuit_str = None
-                stab_results = None
-                preserved = 0
-                total = len(generators)
-                print(f"  ✗ Error: {e}")
-            
-            elapsed_seconds = round(time.time() - start_time, 2)
-            print(f"  ⏱ Elapsed: {elapsed_seconds}s")
-
-            result = {
-                "code_name": code_name,
-                "circuit": circuit_str,
-                "stabilizes": stab_results,
-                "preserved": preserved,
-                "total": total,
-                "success_rate": preserved / total,
-                "elapsed_seconds": elapsed_seconds
-            }
-            results.append(result)
-            
-            # Save intermediate results after each generation
-            output = {"metadata": metadata, "results": results}
-            with open(output_path, 'w') as f:
-                json.dump(output, f, indent=4)
-            print(f"  Saved intermediate results to {output_path}")
+        metadata["session_startup"] = asyncio.run(_generate_all(
+            tasks,
+            len(benchmarks),
+            max(1, workers),
+            task_timeout,
+            use_client_pool,
+            record,
+            model=model,
+            attempts=attempts,
+            timeout=timeout,
+            prompt_file=prompt_file,
+        ))
     finally:
         metadata["finished_at"] = datetime.now().isoformat()
-        output = {"metadata": metadata, "results": results}
-        with open(output_path, 'w') as f:
-            json.dump(output, f, indent=2)
+        # Results in benchmark order, however the concurrent runs finished
+        results = sink.finalize(metadata)
 
     print(f"\nGeneration complete. {len(results)} circuits saved to {output_path}")
     return results
 
 # To run this script, use the following command line format:
-# python generate_state_prep_circuits.py --benchmarks data/benchmarks.json --output data/generated_circuits.json --attempts 3 --timeout 60
+# python generate_state_prep_circuits.py --benchmarks data/benchmarks.json --output data/generated_circuits.json --attempts 3 --timeout 60 [--workers 8 --task-timeout 3600]
 def main():
     parser = argparse.ArgumentParser(
         description="Generate fault-tolerant circuits for all stabilizer groups in benchmarks"
@@ -163,6 +300,28 @@ def main():
         default="B1/prompts/state_prep_prompt4.txt",
         help="Path to the prompt template file (default: B1/prompts/state_prep_prompt4.txt)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of benchmarks generated concurrently, each with its own agent files directory (default: 1)"
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        default=None,
+        help="Wall-clock limit in seconds for one benchmark (default: none)"
+    )
+    parser.add_argument(
+        "--no-client-pool",
+        action="store_true",
+        help="Start a new Copilot client for every benchmark instead of sharing warm clients"
+    )
+    parser.add_argument(
+        "--resume",
+        default=None,
+        help="JSON or JSONL output of an interrupted run to continue (written to the same file unless --output is given)"
+    )
     
     args = parser.parse_args()
     
@@ -172,7 +331,11 @@ def main():
         model=args.model,
         attempts=args.attempts,
         timeout=args.timeout,
-        prompt_file=args.prompt_file
+        prompt_file=args.prompt_file,
+        workers=args.workers,
+        task_timeout=args.task_timeout,
+        use_client_pool=not args.no_client_pool,
+        resume=args.resume
     )
 
 
@@ -1,17 +1,24 @@
+import asyncio
 import json
 import os
 import sys
 import argparse
 import time
-import stim
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import AsyncExitStack
 from pathlib import Path
 from datetime import datetime
 
 # Add tools directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
 
-from agent import generate_optimized_circuit
-from circuit_metric import compute_metrics
+from agent import SESSION_STARTUP_SECONDS, TOOL_CALL_SECONDS, generate_optimized_circuit_async
+from agent import session_startup_summary, tool_call_summary
+from circuit_ingest import ingest_circuit, normalize_stim_text
+from verification_cache import cached_compute_metrics
+from baseline_columns import stored_baseline
+from client_pool import CopilotClientPool
+from result_sink import ResultSink, load_resume, resume_info, resumed_output_path
 
 
 def iter_jsonl(path: Path):
@@ -27,15 +34,138 @@ def iter_jsonl(path: Path):
                 raise ValueError(f"Bad JSON on line {line_num}: {e}") from e
 
 
-def normalize_stim_text(stim_text: str) -> str:
+async def optimize_record(
+    index: int,
+    line_num: int,
+    rec: dict,
+    *,
+    prompt_template: str,
+    model: str,
+    attempts: int,
+    timeout: int,
+    agent_files_dir: str | None = None,
+    pool: Executor | None = None,
+    client_pool: CopilotClientPool | None = None,
+) -> dict:
     """
-    Dataset stores circuits with '\\n'. Convert to real newlines.
-    If it's already real newlines, this is harmless.
+    Optimize the circuit of one dataset record and return its result entry.
+
+    Failures are reported in the entry's status instead of being raised. If pool is
+    given, the agent's tool calls check candidates on it.
     """
-    return stim_text.replace("\\n", "\n").strip() + "\n"
+    started_at = datetime.now().isoformat()
+
+    # --- extract fields safely ---
+    code_name = rec.get("source_code", f"line_{line_num}")
+    stabilizers = rec.get("input_stabilizers")
+    raw_circuit = rec.get("output_circuit")
+
+    if not stabilizers or not raw_circuit:
+        print(f"\n[{index + 1}] {code_name} | SKIP – missing fields")
+        return {
+            "code_name": code_name,
+            "status": "missing_fields",
+            "error": "Record is missing 'input_stabilizers' or 'output_circuit'.",
+            "started_at": started_at,
+            "finished_at": datetime.now().isoformat(),
+        }
+
+    baseline_text = normalize_stim_text(raw_circuit)
+
+    # --- verify baseline parses ---
+    try:
+        ingest_circuit(baseline_text)
+    except Exception as e:
+        print(f"\n[{index + 1}] {code_name} | SKIP – baseline parse error")
+        return {
+            "code_name": code_name,
+            "status": "baseline_parse_error",
+            "error": str(e),
+            "started_at": started_at,
+            "finished_at": datetime.now().isoformat(),
+        }
+
+    # Precomputed in the dataset's baseline columns when they are up to date
+    stored = stored_baseline(rec)
+    if stored is not None:
+        base_metrics = stored["metrics"]
+    else:
+        base_metrics = cached_compute_metrics(baseline_text).as_dict()
+    print(f"\n[{index + 1}] {code_name} | base: {base_metrics}")
+
+    # --- run optimizer ---
+    try:
+        start_time = time.time()
+        opt_result = await generate_optimized_circuit_async(
+            stabilizers=stabilizers,
+            initial_circuit=baseline_text,
+            prompt_template=prompt_template,
+            model=model,
+            attempts=attempts,
+            timeout=timeout,
+            agent_files_dir=agent_files_dir,
+            executor=pool,
+            client_pool=client_pool,
+            baseline_metrics=base_metrics,
+        )
+        elapsed_seconds = round(time.time() - start_time, 2)
+    except Exception as e:
+        print(f"    [{index + 1}] ✗ optimizer exception: {e}")
+        return {
+            "code_name": code_name,
+            "baseline_circuit": baseline_text,
+            "baseline_metrics": base_metrics,
+            "status": "optimizer_exception",
+            "error": str(e),
+            "started_at": started_at,
+            "finished_at": datetime.now().isoformat(),
+        }
+
+    opt_circ = opt_result.get("circuit")
+    evaluations = opt_result.get("evaluations", [])
+
+    if opt_circ is None:
+        print(f"    [{index + 1}] ✗ no valid circuit returned  ({elapsed_seconds}s)")
+        return {
+            "code_name": code_name,
+            "baseline_circuit": baseline_text,
+            "baseline_metrics": base_metrics,
+            "optimized_circuit": None,
+            "valid": False,
+            "better": False,
+            "status": "no_result",
+            "evaluations": evaluations,
+            "elapsed_seconds": elapsed_seconds,
+            "started_at": started_at,
+            "finished_at": datetime.now().isoformat(),
+        }
+
+    opt_text = str(opt_circ)
+    opt_metrics = cached_compute_metrics(opt_text).as_dict()
+
+    is_better = (
+        (opt_metrics["two_qubit_gates"], opt_metrics["volume"], opt_metrics["depth"])
+        < (base_metrics["two_qubit_gates"], base_metrics["volume"], base_metrics["depth"])
+    )
+
+    print(f"    [{index + 1}] -> opt:  {opt_metrics}  [{'improved' if is_better else 'not_strictly_better'}]  ({elapsed_seconds}s)")
+
+    return {
+        "code_name": code_name,
+        "baseline_circuit": baseline_text,
+        "baseline_metrics": base_metrics,
+        "optimized_circuit": opt_text,
+        "optimized_metrics": opt_metrics,
+        "valid": True,
+        "better": is_better,
+        "evaluations": evaluations,
+        "elapsed_seconds": elapsed_seconds,
+        "started_at": started_at,
+        "finished_at": datetime.now().isoformat(),
+    }
 
 
-def optimize_circuits_from_dataset(
+async def optimize_circuits_from_dataset_async(
     dataset_path: str,
     output_path: str | None = None,
     model: str = "claude-opus-4.6",
@@ -43,22 +173,20 @@ def optimize_circuits_from_dataset(
     timeout: int = 6000,
     prompt_path: str = "optimizer_prompt2.txt",
     limit: int | None = None,
+    concurrency: int = 1,
+    verifier_workers: int | None = None,
+    use_client_pool: bool = True,
+    resume: str | None = None,
 ) -> None:
     """
-    Optimize all circuits in a JSONL dataset and write results to a JSON file.
-
-    Each input record is processed independently; failures on one record do not
-    affect others.  The output file is re-written after every record so partial
-    progress survives crashes.
-
-    Args:
-        dataset_path: Path to the input circuit_dataset.jsonl file.
-        output_path: Path to save the output JSON file.
-            If None, auto-generates as data/<model>/<YYMMdd.HHmm>.json
-        model: The model to use for optimization.
-        attempts: Number of optimization attempts per circuit.
-        timeout: Timeout in seconds for each optimization.
-        prompt_path: Path to the prompt template file.
+    Async version of `optimize_circuits_from_dataset`.
+
+    Keeps up to `concurrency` optimizer sessions in flight. With more than one session,
+    every record gets its own agent files directory and all tool calls check candidates
+    on one shared pool of `verifier_workers` processes (default: one per session).
+    Unless use_client_pool is False, the sessions run on a shared pool of warm Copilot clients.
+    Every finished record is appended to <output_path without suffix>.jsonl; the JSON
+    output, in dataset order, is written from that file at the end.
     """
     dataset = Path(dataset_path)
     if not dataset.exists():
@@ -69,6 +197,8 @@ def optimize_circuits_from_dataset(
         raise FileNotFoundError(f"Prompt file not found: {prompt_file.resolve()}")
     prompt_template = prompt_file.read_text(encoding="utf-8")
 
+    if output_path is None and resume is not None:
+        output_path = resumed_output_path(resume)
     if output_path is None:
         timestamp = datetime.now().strftime("%y%m%d.%H%M")
         out_dir = Path("data") / model
@@ -84,141 +214,126 @@ def optimize_circuits_from_dataset(
         "model": model,
         "max_attempts": attempts,
         "timeout": timeout,
+        "concurrency": concurrency,
+        "client_pool": use_client_pool,
         "started_at": datetime.now().isoformat(),
     }
-    results: list[dict] = []
-
-    def _save(finished: bool = False) -> None:
-        """Re-write the full JSON output (metadata + results so far)."""
-        output = {"metadata": {**metadata}, "results": results}
-        if finished:
-            output["metadata"]["finished_at"] = datetime.now().isoformat()
-        with out_path.open("w", encoding="utf-8") as f:
-            json.dump(output, f, indent=2)
-
-    try:
-        for line_num, rec in iter_jsonl(dataset):
-            if limit is not None and len(results) >= limit:
-                break
-            started_at = datetime.now().isoformat()
-
-            # --- extract fields safely ---
-            code_name = rec.get("source_code", f"line_{line_num}")
-            stabilizers = rec.get("input_stabilizers")
-            raw_circuit = rec.get("output_circuit")
-
-            if not stabilizers or not raw_circuit:
-                results.append({
-                    "code_name": code_name,
-                    "status": "missing_fields",
-                    "error": "Record is missing 'input_stabilizers' or 'output_circuit'.",
-                    "started_at": started_at,
-                    "finished_at": datetime.now().isoformat(),
-                })
-                _save()
-                print(f"\n[{len(results)}] {code_name} | SKIP – missing fields")
-                continue
-
-            baseline_text = normalize_stim_text(raw_circuit)
-
-            # --- verify baseline parses ---
-            try:
-                _ = stim.Circuit(baseline_text)
-            except Exception as e:
-                results.append({
-                    "code_name": code_name,
-                    "status": "baseline_parse_error",
-                    "error": str(e),
-                    "started_at": started_at,
-                    "finished_at": datetime.now().isoformat(),
-                })
-                _save()
-                print(f"\n[{len(results)}] {code_name} | SKIP – baseline parse error")
-                continue
-
-            base_metrics = compute_metrics(baseline_text).as_dict()
-            print(f"\n[{len(results) + 1}] {code_name} | base: {base_metrics}")
-
-            # --- run optimizer ---
-            try:
-                start_time = time.time()
-                opt_result = generate_optimized_circuit(
-                    stabilizers=stabilizers,
-                    initial_circuit=baseline_text,
-                    prompt_template=prompt_template,
-                    model=model,
-                    attempts=attempts,
-                    timeout=timeout,
-                )
-                elapsed_seconds = round(time.time() - start_time, 2)
-            except Exception as e:
-                results.append({
-                    "code_name": code_name,
-                    "baseline_circuit": baseline_text,
-                    "baseline_metrics": base_metrics,
-                    "status": "optimizer_exception",
-                    "error": str(e),
-                    "started_at": started_at,
-                    "finished_at": datetime.now().isoformat(),
-                })
-                _save()
-                print(f"    ✗ optimizer exception: {e}")
-                continue
-
-            opt_circ = opt_result.get("circuit")
-            evaluations = opt_result.get("evaluations", [])
-
-            if opt_circ is None:
-                results.append({
-                    "code_name": code_name,
-                    "baseline_circuit": baseline_text,
-                    "baseline_metrics": base_metrics,
-                    "optimized_circuit": None,
-                    "valid": False,
-                    "better": False,
-                    "status": "no_result",
-                    "evaluations": evaluations,
-                    "elapsed_seconds": elapsed_seconds,
-                    "started_at": started_at,
-                    "finished_at": datetime.now().isoformat(),
-                })
-                _save()
-                print(f"    ✗ no valid circuit returned  ({elapsed_seconds}s)")
-                continue
-
-            opt_text = str(opt_circ)
-            opt_metrics = compute_metrics(opt_text).as_dict()
-
-            is_better = (
-                (opt_metrics["two_qubit_gates"], opt_metrics["volume"], opt_metrics["depth"])
-                < (base_metrics["two_qubit_gates"], base_metrics["volume"], base_metrics["depth"])
+    records = list(iter_jsonl(dataset))
+    if limit is not None:
+        records = records[:limit]
+    completed = {}
+    if resume is not None:
+        names = [rec.get("source_code", f"line_{line_num}") for line_num, rec in records]
+        previous_metadata, completed = load_resume(resume, names)
+        metadata["resumed"] = resume_info(resume, previous_metadata, completed)
+        print(f"Resuming {resume}: {len(completed)} records already done")
+    # One JSONL line per record; the JSON output is written from it at the end
+    sink = ResultSink(str(out_path), metadata, completed)
+
+    run_id = datetime.now().strftime("%y%m%d.%H%M%S")
+    limit_sessions = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, line_num: int, rec: dict, pool: Executor | None,
+                  client_pool: CopilotClientPool | None) -> None:
+        agent_files_dir = None
+        if concurrency > 1:
+            agent_files_dir = str(Path("rq3") / "data" / model / "agent_files" / run_id / str(index))
+        async with limit_sessions:
+            result = await optimize_record(
+                index,
+                line_num,
+                rec,
+                prompt_template=prompt_template,
+                model=model,
+                attempts=attempts,
+                timeout=timeout,
+                agent_files_dir=agent_files_dir,
+                pool=pool,
+                client_pool=client_pool,
             )
+        sink.append(index, result)
 
-            print(f"    -> opt:  {opt_metrics}  [{'improved' if is_better else 'not_strictly_better'}]  ({elapsed_seconds}s)")
-
-            results.append({
-                "code_name": code_name,
-                "baseline_circuit": baseline_text,
-                "baseline_metrics": base_metrics,
-                "optimized_circuit": opt_text,
-                "optimized_metrics": opt_metrics,
-                "valid": True,
-                "better": is_better,
-                "evaluations": evaluations,
-                "elapsed_seconds": elapsed_seconds,
-                "started_at": started_at,
-                "finished_at": datetime.now().isoformat(),
-            })
-            _save()
+    startup_before = len(SESSION_STARTUP_SECONDS)
+    tool_calls_before = len(TOOL_CALL_SECONDS)
+    try:
+        async with AsyncExitStack() as stack:
+            client_pool = None
+            if use_client_pool:
+                client_pool = await stack.enter_async_context(CopilotClientPool(size=max(1, concurrency)))
+            remaining = [(index, line_num, rec) for index, (line_num, rec) in enumerate(records) if index not in completed]
+            if concurrency <= 1:
+                for index, line_num, rec in remaining:
+                    await run(index, line_num, rec, None, client_pool)
+            else:
+                with ProcessPoolExecutor(max_workers=verifier_workers or concurrency) as pool:
+                    await asyncio.gather(*(
+                        run(index, line_num, rec, pool, client_pool) for index, line_num, rec in remaining
+                    ))
 
     finally:
-        _save(finished=True)
+        metadata["session_startup"] = session_startup_summary(startup_before)
+        metadata["tool_calls"] = tool_call_summary(tool_calls_before)
+        metadata["finished_at"] = datetime.now().isoformat()
+        # Results in dataset order, however the concurrent sessions finished
+        results = sink.finalize(metadata)
 
     total = len(results)
     improved = sum(1 for r in results if r.get("better"))
     print(f"\nDONE. total={total} improved={improved} results={out_path.resolve()}")
 
 
+def optimize_circuits_from_dataset(
+    dataset_path: str,
+    output_path: str | None = None,
+    model: str = "claude-opus-4.6",
+    attempts: int = 10,
+    timeout: int = 6000,
+    prompt_path: str = "optimizer_prompt2.txt",
+    limit: int | None = None,
+    concurrency: int = 1,
+    verifier_workers: int | None = None,
+    use_client_pool: bool = True,
+    resume: str | None = None,
+) -> None:
+    """
+    Optimize all circuits in a JSONL dataset and write results to a JSON file.
+
+    Each input record is processed independently; failures on one record do not
+    affect others.  Every record is appended to a JSONL file next to the output
+    (see `result_sink`) so partial progress survives crashes.
+
+    Args:
+        dataset_path: Path to the input circuit_dataset.jsonl file.
+        output_path: Path to save the output JSON file.
+            If None, auto-generates as data/<model>/<YYMMdd.HHmm>.json
+        model: The model to use for optimization.
+        attempts: Number of optimization attempts per circuit.
+        timeout: Timeout in seconds for each optimization.
+        prompt_path: Path to the prompt template file.
+        concurrency: Maximum number of optimizer sessions running at once.
+        verifier_workers: Processes of the shared pool checking candidates when
+            concurrency > 1 (default: concurrency).
+        use_client_pool: Share warm Copilot clients between sessions instead of starting a
+            client per record. The session start-up times are saved in the metadata either way.
+        resume: JSON or JSONL output of an interrupted run over the same dataset. Its results
+            are kept, only the remaining records are optimized, and the output goes to the
+            same file unless output_path is given.
+    """
+    asyncio.run(optimize_circuits_from_dataset_async(
+        dataset_path,
+        output_path=output_path,
+        model=model,
+        attempts=attempts,
+        timeout=timeout,
+        prompt_path=prompt_path,
+        limit=limit,
+        concurrency=concurrency,
+        verifier_workers=verifier_workers,
+        use_client_pool=use_client_pool,
+        resume=resume,
+    ))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Optimize circuits from a JSONL dataset using an LLM agent"
@@ -261,6 +376,28 @@ def main():
         default=None,
         help="Only process the first N circuits (default: all)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of optimizer sessions running at once (default: 1)",
+    )
+    parser.add_argument(
+        "--verifier-workers",
+        type=int,
+        default=None,
+        help="Processes checking candidates when --concurrency > 1 (default: same as --concurrency)",
+    )
+    parser.add_argument(
+        "--no-client-pool",
+        action="store_true",
+        help="Start a new Copilot client for every record instead of sharing warm clients",
+    )
+    parser.add_argument(
+        "--resume",
+        default=None,
+        help="JSON or JSONL output of an interrupted run to continue (written to the same file unless --output is given)",
+    )
 
     args = parser.parse_args()
 
@@ -272,6 +409,10 @@ def main():
         timeout=args.timeout,
         prompt_path=args.prompt,
         limit=args.limit,
+        concurrency=args.concurrency,
+        verifier_workers=args.verifier_workers,
+        use_client_pool=not args.no_client_pool,
+        resume=args.resume,
     )
 
 
@@ -8,7 +8,7 @@ import argparse
 # Add tools directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
 
-from check_stabilizers import check_stabilizers
+from verification_cache import cached_check_stabilizers_batch
 
 
 def load_benchmarks(benchmarks_path: str) -> dict[str, list[str]]:
@@ -21,15 +21,17 @@ def load_benchmarks(benchmarks_path: str) -> dict[str, list[str]]:
     return mapping
 
 
-def process_outcome_file(filepath: str, stabilizers_map: dict[str, list[str]]) -> int:
+def process_outcome_file(filepath: str, stabilizers_map: dict[str, list[str]], workers: int = 1) -> int:
     """Add all_stabilized field to each generated_circuit entry in an outcome file.
     
+    All circuits of the file are checked in one batch, through the on-disk verification
+    cache, so circuits checked before (in this or another outcome file) are not re-simulated.
     Returns the number of circuits updated.
     """
     with open(filepath, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    updated = 0
+    pending = []
     for result in data.get("results", []):
         code_name = result.get("code_name")
         if code_name not in stabilizers_map:
@@ -43,15 +45,23 @@ def process_outcome_file(filepath: str, stabilizers_map: dict[str, list[str]]) -
             if circuit_str is None:
                 continue
 
-            try:
-                stab_results = check_stabilizers(circuit_str, input_stabilizers)
-                all_stabilized = all(stab_results.values())
-            except Exception as e:
-                print(f"  ⚠ Error checking stabilizers for circuit in '{code_name}': {e}")
-                all_stabilized = None
+            pending.append((code_name, circuit_entry, circuit_str, input_stabilizers))
+
+    batch_results = cached_check_stabilizers_batch(
+        [(circuit_str, input_stabilizers) for _, _, circuit_str, input_stabilizers in pending],
+        workers=workers,
+        return_exceptions=True,
+    )
+    updated = 0
+    for (code_name, circuit_entry, _, _), stab_results in zip(pending, batch_results):
+        if isinstance(stab_results, Exception):
+            print(f"  ⚠ Error checking stabilizers for circuit in '{code_name}': {stab_results}")
+            all_stabilized = None
+        else:
+            all_stabilized = all(stab_results.values())
 
-            circuit_entry["all_stabilized"] = all_stabilized
-            updated += 1
+        circuit_entry["all_stabilized"] = all_stabilized
+        updated += 1
 
     with open(filepath, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
@@ -78,6 +88,12 @@ def main():
         default="data",
         help="Path to data directory containing model subdirectories (default: data)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes for the stabilizer checks (default: 1)"
+    )
     args = parser.parse_args()
 
     # Load benchmark stabilizers
@@ -91,7 +107,7 @@ def main():
 
     for filepath in outcome_files:
         print(f"Processing {filepath}...")
-        updated = process_outcome_file(filepath, stabilizers_map)
+        updated = process_outcome_file(filepath, stabilizers_map, args.workers)
         print(f"  ✓ Updated {updated} circuit entries\n")
 
     print("Done.")
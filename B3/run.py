@@ -1,19 +1,298 @@
+import asyncio
 import json
 import os
 import sys
 import argparse
 import stim
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import AsyncExitStack
 
 # Add tools directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
 
 
 from datetime import datetime
-from agent import prompt_agent, CircuitParam, generate_ft_state_prep
+from agent import prompt_agent, CircuitParam, generate_ft_state_prep_async
+from agent import SESSION_STARTUP_SECONDS, session_startup_summary
 from copilot.tools import define_tool
 from validate_ft_circuits import check_syndrome_extraction_ft
-from check_error_propagation import check_fault_tolerance, ft_score
-from check_stabilizers import check_stabilizers
+from circuit_ingest import ingest_circuit
+from verification_cache import cached_check_stabilizers, cached_ft_check, cached_ft_score
+from baseline_columns import stored_baseline
+from client_pool import CopilotClientPool
+from result_sink import ResultSink, load_resume, resume_info, resumed_output_path
+
+def score_ft_circuit(circuit_str: str, input_stabilizers: list[str], qubits: list[int], distance: int) -> dict:
+    """
+    Check a returned FT circuit: stabilizers preserved, fault tolerance and FT score.
+    
+    Every qubit outside `qubits` is treated as a flag. CPU-bound and free of agent state,
+    so the concurrent runner sends it to its process pool.
+    """
+    ancillas = sorted(ingest_circuit(circuit_str).used_qubits - set(qubits))
+
+    # Both checks go through the on-disk verification cache, so scoring a circuit the
+    # agent validated (in whichever worker process) or seen in an earlier run is a lookup
+    stab_results = cached_check_stabilizers(circuit_str, input_stabilizers)
+    all_stabilized = all(stab_results.values())
+
+    is_ft, score = cached_ft_check(circuit_str, qubits, ancillas, distance)
+
+    return {
+        "stab_results": stab_results,
+        "all_stabilized": all_stabilized,
+        "is_ft": is_ft,
+        "score": score,
+    }
+
+
+async def generate_circuit_for_entry(
+    index: int,
+    entry: dict,
+    *,
+    model: str,
+    attempts: int,
+    timeout: int,
+    prompt_file: str,
+    agent_files_dir: str | None,
+    pool: Executor,
+    client_pool: CopilotClientPool | None = None,
+) -> dict:
+    """
+    Run one FT synthesis session for a dataset entry and score its result.
+    
+    The original circuit is scored on the pool while the agent session runs, and the
+    agent's candidate checks and the final scoring also run on the pool.
+    """
+    loop = asyncio.get_running_loop()
+    log = f"[{index+1}] "
+    source_code = entry["source_code"]
+    distance = entry["d"]
+    qubits = entry["permutation"]
+    input_stabilizers = entry["input_stabilizers"]
+    output_circuit = entry["output_circuit"]
+    all_candidates = []
+    start_time = None
+    end_time = None
+
+    # FT score of the original (non-FT) circuit: precomputed in the dataset's baseline
+    # columns, or computed on the pool while the agent session runs
+    baseline = stored_baseline(entry)
+    orig_score_future = None
+    if baseline is not None:
+        orig_ft_score = baseline["ft_score"]
+    else:
+        orig_ancillas = []
+        clean_circuit = output_circuit.replace("\\n", "\n")
+        orig_score_future = loop.run_in_executor(pool, cached_ft_score, clean_circuit, qubits, orig_ancillas, distance)
+
+    circuit_str = None
+    fallback = None
+    try:
+        start_time = datetime.now()
+
+        circuit_results, all_candidates = await generate_ft_state_prep_async(
+            stabilizers=input_stabilizers,
+            non_ft_circuit = output_circuit,
+            distance = distance,
+            attempts=attempts,
+            timeout=timeout,
+            model=model,
+            prompt_file=prompt_file,
+            agent_files_dir=agent_files_dir,
+            executor=pool,
+            client_pool=client_pool,
+        )
+        end_time = datetime.now()
+
+        # If no final result but we have validated candidates, use the latest one
+        if circuit_results is None and all_candidates:
+            latest = all_candidates[-1]
+            print(f"{log}  ⚠ Timed out, falling back to latest verified circuit (ft_score={latest['ft_score']})")
+            circuit_results = {"circuit": stim.Circuit(latest["circuit"])}
+
+        if circuit_results is not None:
+            circuit_str = str(circuit_results["circuit"])
+        else:
+            end_time = datetime.now()
+            print(f"{log}  ✗ Failed to generate circuit")
+            
+    except Exception as e:
+        end_time = datetime.now()
+        print(f"{log}  ✗ Error: {e}")
+
+        # If we have validated candidates, fall back to the latest one
+        if all_candidates:
+            latest = all_candidates[-1]
+            print(f"{log}  ⚠ Falling back to latest verified circuit (ft_score={latest['ft_score']})")
+            circuit_str = str(stim.Circuit(latest["circuit"]))
+            fallback = True
+        else:
+            all_candidates = []
+
+    if orig_score_future is not None:
+        orig_ft_score = await orig_score_future
+    print(f"{log}Original FT score: {orig_ft_score}")
+
+    async def score_circuit(circuit: str) -> dict | None:
+        # A circuit the checks cannot handle fails this entry only, not the whole run
+        try:
+            return await loop.run_in_executor(pool, score_ft_circuit, circuit, input_stabilizers, qubits, distance)
+        except Exception as e:
+            print(f"{log}  ✗ Error: {e}")
+            return None
+
+    checks = None
+    if circuit_str is not None:
+        checks = await score_circuit(circuit_str)
+        # If the final circuit cannot be scored, fall back to the latest validated candidate
+        if checks is None and not fallback and all_candidates:
+            latest = all_candidates[-1]
+            print(f"{log}  ⚠ Falling back to latest verified circuit (ft_score={latest['ft_score']})")
+            circuit_str = str(stim.Circuit(latest["circuit"]))
+            fallback = True
+            checks = await score_circuit(circuit_str)
+
+    if checks is not None:
+        stab_results = checks["stab_results"]
+        all_stabilized = checks["all_stabilized"]
+        is_ft = checks["is_ft"]
+        score = checks["score"]
+        all_true = all([all_stabilized, is_ft])
+        if fallback:
+            print(f"{log}   FT score: {score}, stabilizers: {all_stabilized}, FT: {is_ft}")
+        else:
+            print(f"{log} ✓ stabilizers preserved:  {all_stabilized}")
+            print(f"{log}  ✓ Circuit generated successfully - FT check: {is_ft}")
+            print(f"{log}   FT score: {score}")
+    else:
+        is_ft = None
+        score = None
+        stab_results = None
+        all_stabilized = None
+        all_true = None
+
+    runtime_seconds = None
+    if start_time and end_time:
+        runtime_seconds = (end_time - start_time).total_seconds()
+                
+
+    # Best output
+    best = {
+        "circuit": circuit_str,
+        "ft_score": score, 
+        "ft_check": is_ft,
+        "all_stabilized": all_stabilized,
+        "stabilizer_details": stab_results,
+        "ALL TRUE": all_true
+    }
+
+    return {
+        "code_name": source_code,
+        "original_score": orig_ft_score,
+        "start_time": start_time.isoformat() if start_time else None,
+        "end_time": end_time.isoformat() if end_time else None,
+        "runtime_seconds": runtime_seconds,
+        "best_output": best,
+        "generated_circuits": all_candidates  # <--- all intermediate circuits with FT scores
+    }
+
+
+async def generate_circuits_from_data_async(
+    benchmarks_path: str,
+    output_path: str|None = None,
+    model: str =  "claude-sonnet-4.5",
+    attempts: int = 3,
+    timeout: int = 60,
+    prompt_file: str = "B3/prompts/ft_state_prep_prompt.txt",
+    concurrency: int = 1,
+    scoring_workers: int | None = None,
+    use_client_pool: bool = True,
+    resume: str | None = None,
+) -> list[dict]:
+    """
+    Async version of `generate_circuits_from_data`: keeps up to `concurrency` agent
+    sessions in flight and scores circuits on a pool of `scoring_workers` processes
+    (default: one per session), so model latency and verification overlap. Unless
+    use_client_pool is False, the sessions run on a shared pool of warm Copilot clients.
+    
+    Every completed entry is appended to <output_path without suffix>.jsonl; the JSON
+    output, in dataset order, is written from that file at the end.
+    """
+    if output_path is None and resume is not None:
+        output_path = resumed_output_path(resume)
+    if output_path is None:
+        timestamp = datetime.now().strftime("%y%m%d.%H%M")
+        output_dir = os.path.join(".", "data", model)
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"{timestamp}.json")
+
+    with open(benchmarks_path, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    completed = {}
+    if resume is not None:
+        previous_metadata, completed = load_resume(resume, [entry["source_code"] for entry in entries])
+        print(f"Resuming {resume}: {len(completed)} entries already done")
+
+    started_at = datetime.now()
+    metadata = {
+        "benchmarks_path": benchmarks_path,
+        "prompt_path": prompt_file,
+        "model": model,
+        "attempts": attempts,
+        "timeout": timeout,
+        "concurrency": concurrency,
+        "client_pool": use_client_pool,
+        "started_at": started_at.isoformat(),
+    }
+    if resume is not None:
+        metadata["resumed"] = resume_info(resume, previous_metadata, completed)
+    # One JSONL line per entry; the JSON output is written from it at the end
+    sink = ResultSink(output_path, metadata, completed)
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    def agent_files_dir(index: int) -> str | None:
+        # Concurrent sessions must not share their scratch directory
+        if concurrency <= 1:
+            return None
+        return os.path.join("data", model, "agent_files_ft", str(index))
+
+    async def run(index: int, entry: dict, pool: Executor, client_pool: CopilotClientPool | None) -> None:
+        async with limit:
+            result = await generate_circuit_for_entry(
+                index,
+                entry,
+                model=model,
+                attempts=attempts,
+                timeout=timeout,
+                prompt_file=prompt_file,
+                agent_files_dir=agent_files_dir(index),
+                pool=pool,
+                client_pool=client_pool,
+            )
+        sink.append(index, result)
+        print(f"  Saved result to {sink.jsonl_path}")
+
+    startup_before = len(SESSION_STARTUP_SECONDS)
+    try:
+        with ProcessPoolExecutor(max_workers=scoring_workers or max(1, concurrency)) as pool:
+            async with AsyncExitStack() as stack:
+                client_pool = None
+                if use_client_pool:
+                    client_pool = await stack.enter_async_context(CopilotClientPool(size=max(1, concurrency)))
+                await asyncio.gather(*(
+                    run(i, entry, pool, client_pool) for i, entry in enumerate(entries) if i not in completed
+                ))
+    finally:
+        metadata["session_startup"] = session_startup_summary(startup_before)
+        metadata["finished_at"] = datetime.now().isoformat()
+        # Results in dataset order, however the concurrent sessions finished
+        results = sink.finalize(metadata)
+
+    print(f"\nGeneration complete. {len(results)} circuits saved to {output_path}")
+    return results
+
 
 def generate_circuits_from_data(
     benchmarks_path: str,
@@ -21,7 +300,11 @@ def generate_circuits_from_data(
     model: str =  "claude-sonnet-4.5",
     attempts: int = 3,
     timeout: int = 60,
-    prompt_file: str = "B3/prompts/ft_state_prep_prompt.txt"
+    prompt_file: str = "B3/prompts/ft_state_prep_prompt.txt",
+    concurrency: int = 1,
+    scoring_workers: int | None = None,
+    use_client_pool: bool = True,
+    resume: str | None = None,
 ) -> list[dict]:
     """
     Generate fault-tolerant state preparation circuits for all circuits in circuit_dataset.
@@ -31,177 +314,29 @@ def generate_circuits_from_data(
         output_path: Path to save the output JSON file
         attempts: Number of attempts for each circuit generation
         timeout: Timeout in seconds for each generation
+        concurrency: Maximum number of agent sessions in flight at once
+        scoring_workers: Number of processes checking circuits (default: concurrency)
+        use_client_pool: Share warm Copilot clients between sessions instead of starting a
+            client per entry. The session start-up times are saved in the metadata either way.
+        resume: JSON or JSONL output of an interrupted run over the same dataset. Its results
+            are kept, only the remaining entries are generated, and the output goes to the
+            same file unless output_path is given.
     
     Returns:
         List of dictionaries with code_name and circuit
     """
-    if output_path is None:
-        timestamp = datetime.now().strftime("%y%m%d.%H%M")
-        output_dir = os.path.join(".", "data", model)
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{timestamp}.json")
-
-    started_at = datetime.now()
-    results = []
-    with open(benchmarks_path, "r", encoding="utf-8") as f:
-        for line in f:
-            entry = json.loads(line)
-            source_code = entry["source_code"]
-            distance = entry["d"]
-            qubits = entry["permutation"]
-            input_stabilizers = entry["input_stabilizers"]
-            output_circuit = entry["output_circuit"]
-            ancillas = []
-            all_candidates = []
-            start_time = None
-            end_time = None
-
-            # Compute FT score of the original (non-FT) circuit
-            orig_ancillas = []
-            clean_circuit = output_circuit.replace("\\n", "\n")
-            orig_ft_score = ft_score(clean_circuit, qubits, orig_ancillas, distance)
-            print(f"Original FT score: {orig_ft_score}")
-            try:
-                start_time = datetime.now()
-
-                circuit_results, all_candidates = generate_ft_state_prep(
-                    stabilizers=input_stabilizers,
-                    non_ft_circuit = output_circuit,
-                    distance = distance,
-                    attempts=attempts,
-                    timeout=timeout,
-                    model=model,
-                    prompt_file=prompt_file
-                )
-                end_time = datetime.now()
-
-                # If no final result but we have validated candidates, use the latest one
-                if circuit_results is None and all_candidates:
-                    latest = all_candidates[-1]
-                    print(f"  ⚠ Timed out, falling back to latest verified circuit (ft_score={latest['ft_score']})")
-                    circuit_results = {"circuit": stim.Circuit(latest["circuit"])}
-
-                if circuit_results is not None:
-                    circuit_obj = circuit_results["circuit"]
-                    circuit_str = str(circuit_obj)
-                    temp = circuit_str.split()
-
-                    used_qubits = set()
-                    for inst in circuit_obj:
-                        for t in inst.targets_copy():
-                            if hasattr(t, "value"):
-                                used_qubits.add(t.value)
-
-                    data_qubits = set(qubits)
-                    ancillas = sorted(list(used_qubits - data_qubits))
-
-                    stab_results = check_stabilizers(circuit_str, input_stabilizers)
-                    all_stabilized = all(stab_results.values())
-                    print(f" ✓ stabilizers preserved:  {all_stabilized}")
-
-
-                    ft_details, is_ft = check_fault_tolerance(circuit_str, qubits, ancillas, distance)
-
-                    print(f"  ✓ Circuit generated successfully - FT check: {is_ft}")
-
-                    score = ft_score(circuit_str, qubits, ancillas, distance)
-                    print(f"   FT score: {score}")
-
-                    all_true = all([all_stabilized, is_ft])
-                else:
-                    circuit_str = None
-                    is_ft = None
-                    ft_details = None
-                    score = None
-                    stab_results = None
-                    all_stabilized = None
-                    all_true = None
-                    end_time = datetime.now()
-                    print("  ✗ Failed to generate circuit")
-                    
-            except Exception as e:
-                end_time = datetime.now()
-                print(f"  ✗ Error: {e}")
-
-                # If we have validated candidates, fall back to the latest one
-                if all_candidates:
-                    latest = all_candidates[-1]
-                    print(f"  ⚠ Falling back to latest verified circuit (ft_score={latest['ft_score']})")
-                    circuit_obj = stim.Circuit(latest["circuit"])
-                    circuit_str = str(circuit_obj)
-
-                    used_qubits = set()
-                    for inst in circuit_obj:
-                        for t in inst.targets_copy():
-                            if hasattr(t, "value"):
-                                used_qubits.add(t.value)
-
-                    data_qubits = set(qubits)
-                    ancillas = sorted(list(used_qubits - data_qubits))
-
-                    stab_results = check_stabilizers(circuit_str, input_stabilizers)
-                    all_stabilized = all(stab_results.values())
-                    ft_details, is_ft = check_fault_tolerance(circuit_str, qubits, ancillas, distance)
-                    score = ft_score(circuit_str, qubits, ancillas, distance)
-                    all_true = all([all_stabilized, is_ft])
-                    print(f"   FT score: {score}, stabilizers: {all_stabilized}, FT: {is_ft}")
-                else:
-                    circuit_str = None
-                    is_ft = None
-                    ft_details = None
-                    score = None
-                    stab_results = None
-                    all_stabilized = None
-                    all_true = None
-                    all_candidates = []
-
-            runtime_seconds = None
-            if start_time and end_time:
-                runtime_seconds = (end_time - start_time).total_seconds()
-                        
-
-            # Best output
-            best = {
-                "circuit": circuit_str,
-                "ft_score": score, 
-                "ft_check": is_ft,
-                "all_stabilized": all_stabilized,
-                "stabilizer_details": stab_results,
-                "ALL TRUE": all_true
-            }
-
-            result = {
-                "code_name": entry["source_code"],
-                "original_score": orig_ft_score,
-                "start_time": start_time.isoformat() if start_time else None,
-                "end_time": end_time.isoformat() if end_time else None,
-                "runtime_seconds": runtime_seconds,
-                "best_output": best,
-                "generated_circuits": all_candidates  # <--- all intermediate circuits with FT scores
-            }
-            results.append(result)
-
-            # Save intermediate results after each generation
-            output = {
-                "metadata": {
-                    "benchmarks_path": benchmarks_path,
-                    "prompt_path": prompt_file,
-                    "model": model,
-                    "attempts": attempts,
-                    "timeout": timeout,
-                    "started_at": started_at.isoformat(),
-                    "finished_at": datetime.now().isoformat()
-                },
-                "results": results
-            }
-            with open(output_path, 'w') as f:
-                json.dump(output, f, indent=4)
-            print(f"  Saved intermediate results to {output_path}")
-
-
-        
-    print(f"\nGeneration complete. {len(results)} circuits saved to {output_path}")
-    return results
+    return asyncio.run(generate_circuits_from_data_async(
+        benchmarks_path,
+        output_path=output_path,
+        model=model,
+        attempts=attempts,
+        timeout=timeout,
+        prompt_file=prompt_file,
+        concurrency=concurrency,
+        scoring_workers=scoring_workers,
+        use_client_pool=use_client_pool,
+        resume=resume,
+    ))
 
 # To run this script, use the following command line format:
 # python generate_state_prep_circuits.py --benchmarks data/benchmarks.json --output data/generated_circuits.json --attempts 3 --timeout 60
@@ -241,6 +376,28 @@ def main():
         default="prompts/ft_state_prep_prompt_3.txt",
         help="Path to the prompt template file (default: prompts/ft_state_prep_prompt_3.txt)"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of agent sessions running at once (default: 1)"
+    )
+    parser.add_argument(
+        "--scoring-workers",
+        type=int,
+        default=None,
+        help="Number of processes checking circuits (default: same as --concurrency)"
+    )
+    parser.add_argument(
+        "--no-client-pool",
+        action="store_true",
+        help="Start a new Copilot client for every entry instead of sharing warm clients"
+    )
+    parser.add_argument(
+        "--resume",
+        default=None,
+        help="JSON or JSONL output of an interrupted run to continue (written to the same file unless --output is given)"
+    )
     
     args = parser.parse_args()
     
@@ -250,7 +407,11 @@ def main():
         model=args.model,
         attempts=args.attempts,
         timeout=args.timeout,
-        prompt_file=args.prompt_file
+        prompt_file=args.prompt_file,
+        concurrency=args.concurrency,
+        scoring_workers=args.scoring_workers,
+        use_client_pool=not args.no_client_pool,
+        resume=args.resume
     )
 
 
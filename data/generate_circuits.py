@@ -1,27 +1,90 @@
+import numpy as np
 import stim
 import random
 import json
 import math
-from typing import List, Dict, Any
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
 
-def permute_stabilizers(generators: List[str], num_qubits: int) -> tuple[List[str], List[int]]:
+# Add tools directory to path to import the baseline columns
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+from baseline_columns import add_baseline_columns
+
+# Permutation counts up to which sample_permutations shuffles the full list of ranks.
+ENUMERATION_LIMIT = 1_000_000
+# Codes submitted to the pool per worker ahead of the one being written.
+CODES_IN_FLIGHT_PER_WORKER = 2
+
+def apply_permutation(generators: List[str], permutation: List[int]) -> List[str]:
+    """
+    Relabels qubit i as permutation[i] in the stabilizer strings.
+    All generators are moved at once as the columns of a byte matrix.
+    """
+    if not generators:
+        return []
+    num_qubits = len(permutation)
+    paulis = np.frombuffer("".join(generators).encode("ascii"), dtype=np.uint8).reshape(len(generators), num_qubits)
+    permuted = np.empty_like(paulis)
+    permuted[:, np.asarray(permutation, dtype=np.intp)] = paulis
+    flat = permuted.tobytes().decode("ascii")
+    return [flat[i:i + num_qubits] for i in range(0, len(flat), num_qubits)]
+
+def permutation_from_rank(rank: int, n: int) -> List[int]:
+    """
+    The permutation of range(n) with the given lexicographic rank, decoded from its Lehmer code.
+    Rank 0 is the identity.
+    """
+    remaining = list(range(n))
+    permutation = []
+    for position in range(n - 1, -1, -1):
+        digit, rank = divmod(rank, math.factorial(position))
+        permutation.append(remaining.pop(digit))
+    return permutation
+
+def sample_permutations(n: int, k: int, rng: Optional[random.Random] = None,
+                        include_identity: bool = False) -> List[List[int]]:
+    """
+    Draws min(k, available) distinct uniformly random permutations of range(n) without rejection.
+
+    Lexicographic ranks are sampled without replacement and decoded with
+    `permutation_from_rank`. When k is close to the number of permutations (and that
+    number is at most ENUMERATION_LIMIT), all ranks are shuffled instead. The identity
+    (rank 0) is only drawn when include_identity is set.
+    """
+    rng = rng or random
+    first = 0 if include_identity else 1
+    available = math.factorial(n) - first
+    k = max(0, min(k, available))
+    if available <= ENUMERATION_LIMIT and 2 * k >= available:
+        ranks = list(range(first, first + available))
+        rng.shuffle(ranks)
+        ranks = ranks[:k]
+    elif available <= sys.maxsize:
+        ranks = rng.sample(range(first, first + available), k)
+    else:
+        # More ranks than a range can index: k is negligible next to n!, so the set
+        # practically never sees a repeat
+        ranks = []
+        seen = set()
+        while len(ranks) < k:
+            rank = first + rng.randrange(available)
+            if rank not in seen:
+                seen.add(rank)
+                ranks.append(rank)
+    return [permutation_from_rank(rank, n) for rank in ranks]
+
+def permute_stabilizers(generators: List[str], num_qubits: int,
+                        rng: Optional[random.Random] = None) -> tuple[List[str], List[int]]:
     """
     Randomly relabels qubit indices in the stabilizer strings.
+    Draws from `rng` (default: the global random module).
     """
     indices = list(range(num_qubits))
-    random.shuffle(indices)
-    mapping = {old: new for old, new in enumerate(indices)}
-    
-    new_generators = []
-    for stab in generators:
-        new_chars = ['I'] * num_qubits
-        for i, char in enumerate(stab):
-            if char != 'I':
-                new_pos = mapping[i]
-                new_chars[new_pos] = char
-        new_generators.append("".join(new_chars))
-        
-    return new_generators, indices
+    (rng or random).shuffle(indices)
+    return apply_permutation(generators, indices), indices
 
 def generate_naive_circuit(stabilizers: List[str]) -> str:
     """
@@ -56,8 +119,8 @@ def process_code_entry_identity_only(code_def: Dict[str, Any]) -> Dict:
     
     return entry
 
-def process_code_entry(code_def: Dict[str, Any], num_variations: int = 50, skip_identity: bool = False) -> List[Dict]:
-    import math
+def process_code_entry(code_def: Dict[str, Any], num_variations: int = 50, skip_identity: bool = False,
+                       rng: Optional[random.Random] = None) -> List[Dict]:
     dataset = []
     
     # physical_qubits count
@@ -69,14 +132,10 @@ def process_code_entry(code_def: Dict[str, Any], num_variations: int = 50, skip_
         print(f"  WARNING: Requested {num_variations} variations but only {max_permutations} unique permutations exist for {n} qubits")
         num_variations = max_permutations
 
-    # Track used permutations (as tuples for hashability)
-    used_permutations = set()
+    identity_perm = list(range(n))
 
     # --- STEP 1: Add the Original (Identity Permutation) ---
     if not skip_identity:
-        identity_perm = list(range(n))
-        used_permutations.add(tuple(identity_perm))
-        
         original_entry = {
             "source_code": code_def["name"],
             "d": code_def.get("d"),
@@ -85,32 +144,13 @@ def process_code_entry(code_def: Dict[str, Any], num_variations: int = 50, skip_
             "output_circuit": generate_naive_circuit(code_def["generators"]).replace("\n", "\\n")
         }
         dataset.append(original_entry)
-    else:
-        # Still mark identity as used to avoid generating it in variations
-        identity_perm = list(range(n))
-        used_permutations.add(tuple(identity_perm))
 
-    # --- STEP 2: Add Random Variations (ensuring uniqueness) ---
-    attempts = 0
-    max_attempts = num_variations * 100  # Prevent infinite loops
-    
-    while len(dataset) < num_variations and attempts < max_attempts:
-        attempts += 1
-        
-        new_stabs, perm = permute_stabilizers(
-            code_def["generators"], 
-            n
-        )
-        
-        # Check if this permutation is unique
-        perm_tuple = tuple(perm)
-        if perm_tuple in used_permutations:
-            continue  # Skip duplicate
-        
+    # --- STEP 2: Add Random Variations (distinct by construction, never the identity) ---
+    for perm in sample_permutations(n, num_variations - len(dataset), rng):
+        new_stabs = apply_permutation(code_def["generators"], perm)
         circuit_str = generate_naive_circuit(new_stabs)
         
         if circuit_str:
-            used_permutations.add(perm_tuple)
             entry = {
                 "source_code": code_def["name"],
                 "d": code_def.get("d"),
@@ -125,6 +165,28 @@ def process_code_entry(code_def: Dict[str, Any], num_variations: int = 50, skip_
             
     return dataset
 
+def code_rng(seed: int, code_name: str) -> random.Random:
+    """
+    Independent random stream of one code, derived from the run seed and the code name only,
+    so the dataset does not depend on the number of workers or the order codes finish in.
+    """
+    return random.Random(f"{seed}:{code_name}")
+
+def generate_code_entries(code_def: Dict[str, Any], num_variations: int, *, seed: int,
+                          skip_identity: bool = False, identity_only: bool = False,
+                          baseline: bool = False) -> List[Dict]:
+    """
+    Generates the entries of one code; the unit of work of the parallel generation.
+    """
+    if identity_only:
+        code_data = [process_code_entry_identity_only(code_def)]
+    else:
+        code_data = process_code_entry(code_def, num_variations=num_variations, skip_identity=skip_identity,
+                                       rng=code_rng(seed, code_def["name"]))
+    if baseline:
+        add_baseline_columns(code_data)
+    return code_data
+
 def save_to_jsonl(data: List[Dict], filename: str):
     """
     Saves the list of dictionaries to a JSONL file.
@@ -133,8 +195,14 @@ def save_to_jsonl(data: List[Dict], filename: str):
         for entry in data:
             f.write(json.dumps(entry) + '\n')
 
+def load_jsonl(filename: str) -> List[Dict]:
+    """
+    Loads a JSONL file written by save_to_jsonl.
+    """
+    with open(filename, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
 if __name__ == "__main__":
-    import os
     import argparse
     
     # Set up argument parser
@@ -156,8 +224,24 @@ if __name__ == "__main__":
                         help='Print detailed progress information')
     parser.add_argument('--max-qubits', type=int, default=None,
                         help='Filter out codes with more than this many qubits')
+    parser.add_argument('--baseline', action='store_true',
+                        help='Store the baseline FT score, fault table summary and metrics of every entry')
+    parser.add_argument('--baseline-only', action='store_true',
+                        help='Only add (or refresh stale) baseline columns to the existing --output file')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processes generating codes and computing baseline columns (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the per-code random streams; the output does not depend on --workers (default: 0)')
     
     args = parser.parse_args()
+
+    if args.baseline_only:
+        entries = load_jsonl(args.output)
+        print(f"Computing baseline columns of {args.output} ({len(entries)} entries, {args.workers} workers)")
+        updated = add_baseline_columns(entries, workers=args.workers)
+        save_to_jsonl(entries, args.output)
+        print(f"Updated {updated} entries, {len(entries) - updated} were up to date")
+        sys.exit(0)
     
     # Read benchmarks.json
     json_path = args.benchmarks
@@ -177,30 +261,16 @@ if __name__ == "__main__":
         benchmarks = benchmarks[:args.limit]
         print(f"Processing first {args.limit} codes only")
     
-    # Generate dataset
-    all_training_data = []
-    
+    # Number of examples per code
     if args.identity_only:
         print("\n=== Identity-only mode (no permutations) ===\n")
-        for i, code_info in enumerate(benchmarks, 1):
-            print(f"[{i}/{len(benchmarks)}] Processing: {code_info['name']}")
-            
-            try:
-                entry = process_code_entry_identity_only(code_info)
-                all_training_data.append(entry)
-                
-                if args.verbose:
-                    print(f"  Circuit length: {len(entry['output_circuit'])} chars")
-                    
-            except Exception as e:
-                print(f"  ERROR: Failed to process {code_info['name']}: {str(e)}")
-                continue
+        allocations = [1] * len(benchmarks)
     else:
         total_target = max(args.num_examples or 0, 0)
         num_codes = len(benchmarks)
         if num_codes == 0:
             print("No codes found in benchmarks.json")
-            exit(0)
+            sys.exit(0)
 
         base = total_target // num_codes
         remainder = total_target % num_codes
@@ -226,38 +296,60 @@ if __name__ == "__main__":
         if shortfall > 0:
             print(f"WARNING: Could only allocate {total_target - shortfall} examples (requested {total_target})")
 
-        print(f"\n=== Generating ~{total_target} total examples across {num_codes} codes ===\n")
-        for i, code_info in enumerate(benchmarks, 1):
-            print(f"\n[{i}/{len(benchmarks)}] Processing: {code_info['name']}")
+        print(f"\n=== Generating ~{total_target} total examples across {num_codes} codes "
+              f"({args.workers} workers, seed {args.seed}) ===\n")
+
+    # Generate dataset: codes run on a process pool, and their entries are written to the
+    # output in benchmark order as soon as every earlier code is done. Only a window of
+    # codes is submitted ahead of the one being written, so codes that finish early do
+    # not pile up in memory behind a slow one.
+    tasks = [(i, code_info, target) for i, (code_info, target) in enumerate(zip(benchmarks, allocations), 1)
+             if target > 0]
+    for i, code_info in enumerate(benchmarks, 1):
+        if allocations[i - 1] == 0:
+            print(f"[{i}/{len(benchmarks)}] Skipping {code_info['name']} (allocation is 0)")
+
+    def submit(executor, code_info, target):
+        return executor.submit(generate_code_entries, code_info, target, seed=args.seed,
+                               skip_identity=args.skip_identity, identity_only=args.identity_only,
+                               baseline=args.baseline)
+
+    total_written = 0
+    window = CODES_IN_FLIGHT_PER_WORKER * max(1, args.workers)
+    with open(args.output, 'w') as f, ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        pending = iter(tasks)
+        futures = deque()
+
+        def fill_window():
+            while len(futures) < window:
+                task = next(pending, None)
+                if task is None:
+                    return
+                futures.append(submit(executor, task[1], task[2]))
+
+        fill_window()
+        for i, code_info, target in tasks:
+            future = futures.popleft()
+            fill_window()
+            print(f"\n[{i}/{len(benchmarks)}] {code_info['name']}")
             print(f"  Physical qubits: {code_info['physical_qubits']}, "
                   f"Logical qubits: {code_info['logical_qubits']}, "
                   f"Distance: {code_info['d']}")
-            
             try:
-                code_target = allocations[i - 1]
-                if code_target == 0:
-                    print("  Skipping (allocation is 0)")
-                    continue
-                code_data = process_code_entry(code_info, num_variations=code_target, skip_identity=args.skip_identity)
-                all_training_data.extend(code_data)
-                print(f"  Target: {code_target}, Generated: {len(code_data)}")
-                
-                if args.verbose and code_data:
-                    print(f"  Sample circuit length: {len(code_data[0]['output_circuit'])} chars")
-                    
+                code_data = future.result()
             except Exception as e:
                 print(f"  ERROR: Failed to process {code_info['name']}: {str(e)}")
                 continue
-    
-    # Save to file
+
+            for entry in code_data:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            total_written += len(code_data)
+            print(f"  Target: {target}, Generated: {len(code_data)}")
+
+            if args.verbose and code_data:
+                print(f"  Sample circuit length: {len(code_data[0]['output_circuit'])} chars")
+
     print(f"\n{'='*60}")
-    print(f"Total examples generated: {len(all_training_data)}")
-    print(f"Saving to: {args.output}")
-    
-    save_to_jsonl(all_training_data, args.output)
-    
-    print(f"\nDataset saved successfully!")
-    print(f"Total size: {len(all_training_data)} examples")
-    print(f"Codes processed: {len(benchmarks)}")
-    if not args.identity_only:
-        print(f"Average examples per code: {len(all_training_data) / len(benchmarks):.1f}")
\ No newline at end of file
+    print(f"Dataset saved successfully to: {args.output}")
+    print(f"Total size: {total_written} examples")
@@ -2,76 +2,151 @@ import mqt.qecc.codes as qecc
 import json
 import math
 
-def generate_concatenated_codes(outer: qecc.StabilizerCode, inner: qecc.StabilizerCode) -> qecc.StabilizerCode:
-    assert inner.x_logicals, "Inner code must have X logical operators defined."
-    assert inner.z_logicals, "Inner code must have Z logical operators defined."
-    assert outer.n % inner.k == 0, "Outer code's number of physical qubits must be a multiple of inner code's number of logical qubits."
+import numpy as np
+
+def _pauli_rows(paulis) -> list[str]:
+    """Plain Pauli strings (signs dropped, '_' read as 'I') of strings or mqt Pauli objects."""
+    return [str(p).lstrip("+-").replace("_", "I") for p in paulis]
+
+def _pack_paulis(paulis: list[str], n: int) -> np.ndarray:
+    """Bit-packed symplectic rows (x_0..x_{n-1} | z_0..z_{n-1}) of Pauli strings."""
+    if not paulis:
+        return np.zeros((0, (2 * n + 7) // 8), dtype=np.uint8)
+    chars = np.frombuffer("".join(paulis).encode("ascii"), dtype=np.uint8).reshape(len(paulis), n)
+    x = (chars == ord("X")) | (chars == ord("Y"))
+    z = (chars == ord("Z")) | (chars == ord("Y"))
+    return np.packbits(np.hstack([x, z]), axis=1)
+
+class SymplecticCode:
+    """
+    Stabilizer code whose generators and logicals are bit-packed symplectic (X|Z) matrices.
+
+    Row i of a matrix is the Pauli with X on qubit q when bit q is set and Z on qubit q when
+    bit n + q is set (Y when both are), packed eight bits per byte. Phases are not tracked.
+    Concatenation is a block matrix product over GF(2), so codes with thousands of physical
+    qubits, and codes concatenated over several levels, are cheap to build.
+    """
+
+    # Outer rows mapped through the inner logicals per chunk, bounding the unpacked memory
+    ROW_CHUNK = 1024
+
+    def __init__(self, n: int, k: int, distance: int, stabilizers: np.ndarray,
+                 x_logicals: np.ndarray | None = None, z_logicals: np.ndarray | None = None):
+        self.n = n
+        self.k = k
+        self.distance = distance
+        self.stabilizers = stabilizers
+        self.x_logicals = x_logicals
+        self.z_logicals = z_logicals
+
+    @classmethod
+    def from_pauli_strings(cls, generators: list[str], distance: int, k: int | None = None,
+                           x_logicals: list[str] | None = None, z_logicals: list[str] | None = None) -> "SymplecticCode":
+        generators = _pauli_rows(generators)
+        n = len(generators[0])
+        if k is None:
+            k = len(x_logicals) if x_logicals else n - len(generators)
+        return cls(
+            n, k, distance, _pack_paulis(generators, n),
+            None if x_logicals is None else _pack_paulis(_pauli_rows(x_logicals), n),
+            None if z_logicals is None else _pack_paulis(_pauli_rows(z_logicals), n),
+        )
+
+    @classmethod
+    def from_stabilizer_code(cls, code: qecc.StabilizerCode) -> "SymplecticCode":
+        return cls.from_pauli_strings(
+            code.stabs_as_pauli_strings(), code.distance, code.k,
+            None if code.x_logicals is None else list(code.x_logicals),
+            None if code.z_logicals is None else list(code.z_logicals),
+        )
+
+    def _unpack(self, rows: np.ndarray) -> np.ndarray:
+        return np.unpackbits(rows, axis=1, count=2 * self.n)
+
+    def _to_pauli_strings(self, rows: np.ndarray) -> list[str]:
+        bits = self._unpack(rows)
+        # I, X, Z, Y from x + 2 z
+        chars = np.frombuffer(b"IXZY", dtype=np.uint8)[bits[:, :self.n] + 2 * bits[:, self.n:]]
+        return [row.tobytes().decode("ascii") for row in chars]
+
+    def stabs_as_pauli_strings(self) -> list[str]:
+        return self._to_pauli_strings(self.stabilizers)
+
+    def x_logicals_as_pauli_strings(self) -> list[str] | None:
+        return None if self.x_logicals is None else self._to_pauli_strings(self.x_logicals)
+
+    def z_logicals_as_pauli_strings(self) -> list[str] | None:
+        return None if self.z_logicals is None else self._to_pauli_strings(self.z_logicals)
+
+    def to_stabilizer_code(self) -> qecc.StabilizerCode:
+        return qecc.StabilizerCode(
+            generators=self.stabs_as_pauli_strings(),
+            x_logicals=self.x_logicals_as_pauli_strings(),
+            z_logicals=self.z_logicals_as_pauli_strings(),
+            distance=self.distance,
+            n=self.n,
+        )
+
+    def _encode_rows(self, rows: np.ndarray, inner: "SymplecticCode", new_n: int) -> np.ndarray:
+        """
+        Replace every outer qubit b * inner.k + j of the rows by logical j of inner copy b.
 
-    r = outer.n // inner.k
-    new_generators = []
-    for stab in inner.stabs_as_pauli_strings():
+        With (L_X | L_Z) the inner logicals, the rows (X | Z) map to X L_X + Z L_Z per copy,
+        i.e. the product with the block diagonal matrix diag(L_X, ..., L_X ; L_Z, ..., L_Z).
+        """
+        r = self.n // inner.k
+        logical_x = inner._unpack(inner.x_logicals)[:inner.k].astype(np.int32)
+        logical_z = inner._unpack(inner.z_logicals)[:inner.k].astype(np.int32)
+        packed = []
+        for start in range(0, len(rows), self.ROW_CHUNK):
+            bits = self._unpack(rows[start:start + self.ROW_CHUNK]).astype(np.int32)
+            outer_x = bits[:, :self.n].reshape(-1, r, inner.k)
+            outer_z = bits[:, self.n:].reshape(-1, r, inner.k)
+            # (rows, r, 2 * inner.n): the image of each row on each inner copy
+            encoded = ((outer_x @ logical_x + outer_z @ logical_z) & 1).astype(np.uint8)
+            x = encoded[:, :, :inner.n].reshape(-1, new_n)
+            z = encoded[:, :, inner.n:].reshape(-1, new_n)
+            packed.append(np.packbits(np.hstack([x, z]), axis=1))
+        if not packed:
+            return np.zeros((0, (2 * new_n + 7) // 8), dtype=np.uint8)
+        return np.vstack(packed)
+
+    def concatenate(self, inner: "SymplecticCode") -> "SymplecticCode":
+        """
+        The code with this code as the outer code and n / inner.k copies of `inner`.
+
+        The generators are those of every inner copy, followed by the outer generators
+        encoded into the inner logicals; the logicals are the encoded outer logicals.
+        """
+        assert inner.x_logicals is not None and len(inner.x_logicals), "Inner code must have X logical operators defined."
+        assert inner.z_logicals is not None and len(inner.z_logicals), "Inner code must have Z logical operators defined."
+        assert self.n % inner.k == 0, "Outer code's number of physical qubits must be a multiple of inner code's number of logical qubits."
+
+        r = self.n // inner.k
+        new_n = r * inner.n
+        # Inner generators on every copy, ordered by generator then by copy
+        inner_bits = inner._unpack(inner.stabilizers)
+        copies = np.zeros((len(inner_bits), r, 2, r, inner.n), dtype=np.uint8)
         for j in range(r):
-            gen = ['I' * inner.n] * r
-            gen[j] = stab
-            new_generators.append(''.join(gen))
-    
-    x_logicals = [str(i) for i in inner.x_logicals]
-    z_logicals = [str(i) for i in inner.z_logicals]
-
-    for stab in outer.stabs_as_pauli_strings():
-        new_stab = []
-        for i in range(0, outer.n, inner.k):
-            comps = []
-            for j in range(inner.k):
-                char = stab[i + j]
-                if char == 'I':
-                    comps.append('I' * inner.n)
-                elif char == 'X':
-                    comps.append(list(x_logicals[j]))
-                elif char == 'Z':
-                    comps.append(list(z_logicals[j]))
-                else:
-                    raise ValueError(f"Unsupported Pauli operator '{char}' in outer stabilizer.")
-            
-            # compose
-            while len(comps) > 1:
-                top = comps.pop()
-                for idx, c in enumerate(top):
-                    if comps[0][idx] == 'X':
-                        if c == "Z":
-                            comps[0][idx] = "Y"
-                        elif c == "Y":
-                            comps[0][idx] = "Z"
-                        elif c == "X":
-                            comps[0][idx] = "I"
-                        else:
-                            comps[0][idx] = "X"
-                    elif comps[0][idx] == 'Z':
-                        if c == "X":
-                            comps[0][idx] = "Y"
-                        elif c == "Y":
-                            comps[0][idx] = "X"
-                        elif c == "Z":
-                            comps[0][idx] = "I"
-                        else:
-                            comps[0][idx] = "Z"
-                    elif comps[0][idx] == 'Y':
-                        if c == "X":
-                            comps[0][idx] = "Z"
-                        elif c == "Z":
-                            comps[0][idx] = "X"
-                        elif c == "Y":
-                            comps[0][idx] = "I"
-                        else:
-                            comps[0][idx] = "Y"
-                    else:
-                        comps[0][idx] = c
-            new_stab.append(''.join(comps[0]))
-        new_generators.append(''.join(new_stab))
-
-    new_n = r * inner.n # outer.n * inner.n // inner.k
-    new_distance = math.ceil(outer.distance / inner.k) * inner.distance
-    return qecc.StabilizerCode(generators = new_generators, distance = new_distance, n = new_n)
+            copies[:, j, 0, j] = inner_bits[:, :inner.n]
+            copies[:, j, 1, j] = inner_bits[:, inner.n:]
+        inner_rows = np.packbits(copies.reshape(len(inner_bits) * r, 2 * new_n), axis=1)
+
+        outer_rows = self._encode_rows(self.stabilizers, inner, new_n)
+        x_logicals = None if self.x_logicals is None else self._encode_rows(self.x_logicals, inner, new_n)
+        z_logicals = None if self.z_logicals is None else self._encode_rows(self.z_logicals, inner, new_n)
+        return SymplecticCode(
+            n=new_n,
+            k=self.k,
+            distance=math.ceil(self.distance / inner.k) * inner.distance,
+            stabilizers=np.vstack([inner_rows, outer_rows]),
+            x_logicals=x_logicals,
+            z_logicals=z_logicals,
+        )
+
+def generate_concatenated_codes(outer: qecc.StabilizerCode, inner: qecc.StabilizerCode) -> qecc.StabilizerCode:
+    concatenated = SymplecticCode.from_stabilizer_code(outer).concatenate(SymplecticCode.from_stabilizer_code(inner))
+    return concatenated.to_stabilizer_code()
 
 def ensure_logicals_defined(code: qecc.StabilizerCode, name: str) -> tuple[qecc.StabilizerCode, str]:
     """Ensure a code has x_logicals and z_logicals properties populated."""
@@ -103,7 +178,21 @@ def ensure_logicals_defined(code: qecc.StabilizerCode, name: str) -> tuple[qecc.
     
     return code, name
 
+# To regenerate data/benchmarks.json, use the following command line format:
+# python data/generate_code.py [--max-qubits 200] [--levels 1]
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate the benchmark codes, including concatenated codes')
+    parser.add_argument('--max-qubits', type=int, default=200,
+                        help='Keep only codes with fewer physical qubits than this (default: 200)')
+    parser.add_argument('--levels', type=int, default=1,
+                        help='Concatenation levels; level l concatenates the codes of level l - 1 again with '
+                             'every single logical qubit code (default: 1)')
+    parser.add_argument('-o', '--output', type=str, default='data/benchmarks.json',
+                        help='Output filename (default: data/benchmarks.json)')
+    args = parser.parse_args()
+
     codes: list[tuple[qecc.StabilizerCode, str]] = []
     distances = [3, 5, 7]
     codes.append(
@@ -154,28 +243,34 @@ if __name__ == "__main__":
     # Generate concatenated codes
     # Only concatenate single logical qubit codes (k=1) to avoid complexity
     single_logical_codes = [(code, name) for code, name in codes if code.k == 1]
-    
+    # Only concatenate if inner code has logical operators
+    inner_codes = [
+        (SymplecticCode.from_stabilizer_code(code), name) for code, name in single_logical_codes
+        if code.x_logicals and code.z_logicals
+    ]
+    outer_codes = [(SymplecticCode.from_stabilizer_code(code), name) for code, name in codes]
+
     concatenated_codes = []
-    for outer_code, outer_name in codes:  # Limit to first 5 to avoid too many combinations
-        for inner_code, inner_name in single_logical_codes:
-            # Only concatenate if inner code has logical operators
-            if not (inner_code.x_logicals and inner_code.z_logicals):
-                continue
-            
-            try:
-                concat_code = generate_concatenated_codes(outer_code, inner_code)
-                concat_name = f"({outer_name}) * ({inner_name})"
-                
-                # Only include if not too large
-                if concat_code.n < 200:
-                    concatenated_codes.append((concat_code, concat_name))
-                    print(f"Generated: {concat_name} - [[{concat_code.n},{concat_code.k},{concat_code.distance}]]")
-            except Exception as e:
-                print(f"Failed to concatenate {outer_name} * {inner_name}: {e}")
+    for level in range(1, args.levels + 1):
+        next_outer_codes = []
+        for outer_code, outer_name in outer_codes:
+            for inner_code, inner_name in inner_codes:
+                try:
+                    concat_code = outer_code.concatenate(inner_code)
+                    concat_name = f"({outer_name}) * ({inner_name})"
+
+                    # Only include if not too large
+                    if concat_code.n < args.max_qubits:
+                        concatenated_codes.append((concat_code, concat_name))
+                        next_outer_codes.append((concat_code, concat_name))
+                        print(f"Generated (level {level}): {concat_name} - [[{concat_code.n},{concat_code.k},{concat_code.distance}]]")
+                except Exception as e:
+                    print(f"Failed to concatenate {outer_name} * {inner_name}: {e}")
+        outer_codes = next_outer_codes
     
     codes += concatenated_codes
 
-    with open("data/benchmarks.json", "w") as f:
+    with open(args.output, "w") as f:
         json.dump(
             [
                 {
@@ -184,6 +279,6 @@ if __name__ == "__main__":
                     "logical_qubits": code.k,
                     "d": code.distance,
                     "generators": code.stabs_as_pauli_strings()
-                } for code, name in filter(lambda c_n: c_n[0].n < 200, codes)
+                } for code, name in filter(lambda c_n: c_n[0].n < args.max_qubits, codes)
             ], fp=f, indent=4
         )
\ No newline at end of file
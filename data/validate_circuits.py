@@ -16,26 +16,34 @@ import json
 import sys
 import os
 
-# Add parent directory to path to import from tools
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Add tools directory to path to import check_stabilizers
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
 
-from tools.check_stabilizers import check_stabilizers
+from check_stabilizers import check_stabilizers_batch
 
 
-def validate_circuits(input_file: str, output_file: str) -> None:
+def validate_circuits(input_file: str, output_file: str, workers: int = 1) -> None:
     """Validate all circuits in the input file and write results to output file.
     
     Args:
         input_file: Path to the generated_circuits.json file
         output_file: Path to write the validation results
+        workers: Number of processes used to check the stabilizers
     """
     # Load the circuits
     with open(input_file, 'r') as f:
         circuits = json.load(f)
     
+    # Check which stabilizers are preserved, for all circuits in one batch
+    batch_results = check_stabilizers_batch(
+        [(entry.get('circuit', ''), entry.get('generators', [])) for entry in circuits],
+        workers=workers,
+        return_exceptions=True,
+    )
+    
     results = []
     
-    for i, entry in enumerate(circuits):
+    for i, (entry, stabilizer_results) in enumerate(zip(circuits, batch_results)):
         code_name = entry.get('code_name', f'Unknown_{i}')
         circuit = entry.get('circuit', '')
         generators = entry.get('generators', [])
@@ -43,8 +51,8 @@ def validate_circuits(input_file: str, output_file: str) -> None:
         print(f"Validating {code_name}...")
         
         try:
-            # Check which stabilizers are preserved
-            stabilizer_results = check_stabilizers(circuit, generators)
+            if isinstance(stabilizer_results, Exception):
+                raise stabilizer_results
             
             # Separate into stabilized and not stabilized
             stabilized = [s for s, is_stable in stabilizer_results.items() if is_stable]
@@ -104,7 +112,7 @@ def validate_circuits(input_file: str, output_file: str) -> None:
 
 
 # To run this script, use the following command line format:
-# python validate_circuits.py --input data/generated_circuits.json --output data/validation_results.json
+# python validate_circuits.py --input data/generated_circuits.json --output data/validation_results.json [--workers 4]
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description='Validate circuits by checking if they are stabilized by their generators.'
@@ -119,6 +127,12 @@ if __name__ == "__main__":
         required=True,
         help='Path to write the validation results JSON file'
     )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Number of worker processes (default: 1)'
+    )
     
     args = parser.parse_args()
-    validate_circuits(args.input, args.output)
+    validate_circuits(args.input, args.output, args.workers)
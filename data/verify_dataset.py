@@ -10,7 +10,41 @@ import os
 
 # Add tools directory to path to import check_stabilizers
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tools'))
-from check_stabilizers import check_stabilizers
+from check_stabilizers import check_stabilizers_batch
+
+
+def verify_circuit_entries(entries: list[dict], workers: int = 1) -> list[bool]:
+    """
+    Verify circuit entries from the dataset in one batch.
+    
+    Args:
+        entries: Dictionaries with 'input_stabilizers' and 'output_circuit' keys
+        workers: Number of processes used by check_stabilizers_batch
+        
+    Returns:
+        For each entry, True if the circuit correctly prepares all target stabilizers, False otherwise
+    """
+    items = []
+    for entry in entries:
+        try:
+            items.append((entry['output_circuit'].replace('\\n', '\n'), entry['input_stabilizers']))
+        except Exception:
+            # Malformed entries are marked incorrect below
+            items.append(None)
+    
+    results = check_stabilizers_batch([item for item in items if item is not None],
+                                      workers=workers, return_exceptions=True)
+    results = iter(results)
+    
+    verdicts = []
+    for item in items:
+        if item is None:
+            verdicts.append(False)
+            continue
+        result = next(results)
+        # If there's an error, the circuit is considered incorrect
+        verdicts.append(not isinstance(result, Exception) and all(result.values()))
+    return verdicts
 
 
 def verify_circuit_entry(entry: dict) -> bool:
@@ -23,20 +57,7 @@ def verify_circuit_entry(entry: dict) -> bool:
     Returns:
         True if the circuit correctly prepares all target stabilizers, False otherwise
     """
-    try:
-        # Extract data
-        stabilizers = entry['input_stabilizers']
-        circuit_str = entry['output_circuit'].replace('\\n', '\n')
-        
-        # Check if circuit preserves all stabilizers
-        results = check_stabilizers(circuit_str, stabilizers)
-        
-        # All stabilizers must be preserved
-        return all(results.values())
-        
-    except Exception as e:
-        # If there's an error, the circuit is considered incorrect
-        return False
+    return verify_circuit_entries([entry])[0]
 
 
 def main():
@@ -51,6 +72,8 @@ def main():
                         help='Show summary statistics only')
     parser.add_argument('--limit', '-l', type=int, default=None,
                         help='Limit number of examples to check')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Number of worker processes (default: 1)')
     
     args = parser.parse_args()
     
@@ -59,28 +82,28 @@ def main():
         print(f"Error: File '{args.input}' not found")
         return 1
     
-    # Read and verify each entry
-    passed = 0
-    failed = 0
-    failed_entries = []
-    
+    # Read all entries, then verify them in one batch
+    entries = []
     with open(args.input, 'r') as f:
         for i, line in enumerate(f, 1):
             if args.limit and i > args.limit:
                 break
-                
-            entry = json.loads(line)
-            is_valid = verify_circuit_entry(entry)
-            
-            if is_valid:
-                passed += 1
-            else:
-                failed += 1
-                failed_entries.append((i, entry))
-            
-            # Print result for each example (unless summary only)
-            if not args.summary:
-                print(f"Example {i}: {is_valid}")
+            entries.append(json.loads(line))
+    
+    passed = 0
+    failed = 0
+    failed_entries = []
+    
+    for i, (entry, is_valid) in enumerate(zip(entries, verify_circuit_entries(entries, args.workers)), 1):
+        if is_valid:
+            passed += 1
+        else:
+            failed += 1
+            failed_entries.append((i, entry))
+        
+        # Print result for each example (unless summary only)
+        if not args.summary:
+            print(f"Example {i}: {is_valid}")
     
     # Print summary
     print("\n" + "="*60)
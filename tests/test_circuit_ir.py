@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+import stim
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+from circuit_ir import CircuitIR
+from validate_ft_circuits import FaultToleranceChecker
+
+
+def unrolled_instructions(circuit: stim.Circuit) -> list[stim.CircuitInstruction]:
+    """The instructions of a circuit with REPEAT blocks unrolled and nothing fused."""
+    instructions = []
+    for item in circuit:
+        if isinstance(item, stim.CircuitRepeatBlock):
+            instructions.extend(unrolled_instructions(item.body_copy()) * item.repeat_count)
+        else:
+            instructions.append(item)
+    return instructions
+
+
+REPEAT_CIRCUITS = [
+    "CX 1 0\nREPEAT 2 {\n CX 0 1\n H 1\n}\n",
+    "H 0\nREPEAT 3 {\n H 0\n CX 0 1\n}\nCX 0 1\nH 1\n",
+    "CX 0 1\nREPEAT 2 {\n REPEAT 2 {\n  CX 1 2\n }\n TICK\n CX 1 2\n}\nCX 1 2\n",
+]
+
+
+@pytest.mark.parametrize("text", REPEAT_CIRCUITS + [
+    pytest.param(
+        str(stim.Circuit.generated("surface_code:rotated_memory_z", distance=3, rounds=3)),
+        id="surface_code_memory",
+    ),
+])
+def test_repeat_blocks_match_unrolled_circuit(text):
+    circuit = stim.Circuit(text)
+    ir = CircuitIR.from_circuit(circuit)
+    instructions = unrolled_instructions(circuit)
+    assert ir.names == [instruction.name for instruction in instructions]
+    expected = [gate for instruction in instructions
+                for gate in CircuitIR.from_circuit(stim.Circuit(str(instruction))).gate_list()]
+    assert ir.gate_list() == expected
+
+
+def test_repeat_boundary_keeps_fault_locations():
+    # flattened() fuses these into `CX 1 0 0 1`, dropping the location between the two CXs
+    checker = FaultToleranceChecker(stim.Circuit(REPEAT_CIRCUITS[0]), num_data_qubits=2)
+    locations = [(loc.gate_type, loc.target_qubits) for loc in checker.enumerate_fault_locations()]
+    assert locations == [
+        ("CX", (1, 0)), ("CX", (1, 0)),
+        ("CX", (0, 1)), ("CX", (0, 1)), ("H", (1,)),
+        ("CX", (0, 1)), ("CX", (0, 1)), ("H", (1,)),
+    ]
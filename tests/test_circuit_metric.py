@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+from circuit_metric import DEFAULT_VOLUME_GATES, compute_metrics, compute_metrics_batch
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "circuit_dataset.jsonl")
+
+CIRCUITS = [
+    "H 0\nCX 0 1\nCZ 1 2\nH 2\n",
+    "CX 0 1 1 2\nTICK\nS 0\nCZ 0 2\nM 0 1 2\n",
+    "H 0\nREPEAT 3 {\n CX 0 1\n H 1\n}\nCZ 0 1\n",
+    "H 0 1\n",
+]
+
+
+def dataset_circuits(limit: int) -> list[str]:
+    with open(DATASET, "r", encoding="utf-8") as f:
+        return [json.loads(line)["output_circuit"] for line, _ in zip(f, range(limit))]
+
+
+@pytest.mark.parametrize("volume_gates", [
+    DEFAULT_VOLUME_GATES,
+    frozenset({"CZ", "H"}),
+    frozenset({"CX"}),
+    frozenset(),
+])
+@pytest.mark.parametrize("tick_is_barrier", [True, False])
+def test_batch_matches_single_circuit_metrics(volume_gates, tick_is_barrier):
+    circuits = CIRCUITS + dataset_circuits(20)
+    batch = compute_metrics_batch(circuits, volume_gates, tick_is_barrier=tick_is_barrier, chunk_size=7)
+    single = [compute_metrics(c, volume_gates, tick_is_barrier=tick_is_barrier) for c in circuits]
+    assert batch == single
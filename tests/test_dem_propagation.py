@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tools"))
+
+from check_error_propagation import fault_batch
+
+
+def assert_same_batch(circuit: str, data_qubits: list[int]) -> None:
+    dem = fault_batch(circuit, data_qubits, backend="dem")
+    numpy = fault_batch(circuit, data_qubits, backend="numpy")
+    assert dem.locs == numpy.locs
+    assert dem.qubits == numpy.qubits
+    assert dem.paulis == numpy.paulis
+    assert np.array_equal(dem.x, numpy.x)
+    assert np.array_equal(dem.z, numpy.z)
+
+
+@pytest.mark.parametrize("circuit", [
+    "R 0 1 2\nH 0\nCX 0 1 1 2\n",
+    "RX 0 1 2\nCX 0 1 0 2\nH 1\n",
+    "R 3\nH 0\nCX 0 1 1 3\n",  # reset of a qubit without faults
+])
+def test_leading_reset_matches_numpy(circuit):
+    assert_same_batch(circuit, [0, 1, 2])
+
+
+@pytest.mark.parametrize("circuit", [
+    "M 3\nCX rec[-1] 1\nH 0\nCX 0 1\n",
+    "M 3\nCZ rec[-1] 1\nH 0\nCX 0 1 1 2\n",
+    "M 3\nCX rec[-1] 0\nCX 0 1 1 2\nH 2\n",
+])
+def test_classically_controlled_gates_match_numpy(circuit):
+    assert_same_batch(circuit, [0, 1, 2])
+
+
+def test_reset_after_fault_raises():
+    with pytest.raises(ValueError, match="non-unitary operation R"):
+        fault_batch("H 0\nCX 0 1\nR 0\nCX 0 1\n", [0, 1], backend="dem")
+
+
+def test_classically_controlled_gate_after_fault_raises():
+    with pytest.raises(ValueError, match="classically controlled operation CX"):
+        fault_batch("H 0\nCX 0 1\nM 3\nCX rec[-1] 1\n", [0, 1], backend="dem")
@@ -2,6 +2,8 @@
 import os
 import stim
 import asyncio
+import time
+from concurrent.futures import Executor
 from datetime import datetime
 from dotenv import load_dotenv
 from copilot.types import Tool, Attachment, PermissionHandler
@@ -12,8 +14,11 @@ from pydantic import BaseModel, Field
 from pathlib import Path
 
 from check_stabilizers import check_stabilizers
-from check_error_propagation import check_fault_tolerance, ft_score
-from circuit_metric import is_strictly_more_optimal
+from check_error_propagation import analyze_propagation
+from circuit_ingest import ingest_circuit
+from client_pool import CopilotClientPool
+from verification_cache import cached_check_stabilizers, cached_ft_check
+from optimization_evaluator import CandidateParseError, Evaluation, OptimizationEvaluator
 
 load_dotenv(Path(__file__).parent / ".env")
 
@@ -69,65 +74,183 @@ def _resolve_model_and_provider(model: str) -> tuple[str, dict | None]:
 
     return model, None
 
-def prompt_agent(prompt: str, system_message: str = "", tools: list[Tool] | None = None, model: str = "gpt-4.1",
-                 attachments: list[Attachment | dict] | None = None, timeout: int | None = 60) -> str:
-    """Prompt the Copilot agent and return the response."""
+# Seconds from the start of each prompt until its session was ready (client start-up included
+# when no client pool is used), for comparing runs with and without a CopilotClientPool.
+SESSION_STARTUP_SECONDS: list[float] = []
+
+# Wall-clock seconds of every evaluate_optimization / final_circuit call of the B2 sessions,
+# from the agent's request to the tool's answer (executor queueing included).
+TOOL_CALL_SECONDS: list[float] = []
+
+def _seconds_summary(times: list[float]) -> dict:
+    if not times:
+        return {"count": 0, "mean_seconds": None, "max_seconds": None}
+    return {"count": len(times), "mean_seconds": round(sum(times) / len(times), 3), "max_seconds": round(max(times), 3)}
+
+def session_startup_summary(start: int = 0) -> dict:
+    """Count, mean and max of SESSION_STARTUP_SECONDS[start:], for the runners' metadata."""
+    return _seconds_summary(SESSION_STARTUP_SECONDS[start:])
+
+def tool_call_summary(start: int = 0) -> dict:
+    """Count, mean and max of TOOL_CALL_SECONDS[start:], for the runners' metadata."""
+    return _seconds_summary(TOOL_CALL_SECONDS[start:])
+
+async def prompt_agent_async(prompt: str, system_message: str = "", tools: list[Tool] | None = None, model: str = "gpt-4.1",
+                             attachments: list[Attachment | dict] | None = None, timeout: int | None = 60,
+                             client_pool: CopilotClientPool | None = None) -> str:
+    """Prompt the Copilot agent on the running event loop and return the response.
+
+    Several calls can be awaited concurrently. Without client_pool each call starts (and
+    stops) its own client; with it, the session is created on a warm client of the pool
+    and destroyed afterwards.
+    """
     if tools is None:
         tools = []
     if attachments is None:
         attachments = []
 
-    async def run():
-        client = CopilotClient(options={"auto_start": True})
-        try:
-            resolved_model, provider = _resolve_model_and_provider(model)
+    start_time = time.perf_counter()
 
-            def _approve_all_permission(_, __):
-                return {"kind": "approved", "rules": []}
+    async def run(client: CopilotClient) -> str:
+        resolved_model, provider = _resolve_model_and_provider(model)
 
-            create_kwargs: dict = {
-                "on_permission_request": _approve_all_permission,
-                "model": resolved_model,
-                "tools": tools,
-            }
-            if system_message:
-                create_kwargs["system_message"] = {"content": system_message}
-            if provider:
-                create_kwargs["provider"] = provider
+        def _approve_all_permission(_, __):
+            return {"kind": "approved", "rules": []}
 
-            session = await client.create_session(create_kwargs)
+        create_kwargs: dict = {
+            "on_permission_request": _approve_all_permission,
+            "model": resolved_model,
+            "tools": tools,
+        }
+        if system_message:
+            create_kwargs["system_message"] = {"content": system_message}
+        if provider:
+            create_kwargs["provider"] = provider
+
+        session = await client.create_session(create_kwargs)
+        SESSION_STARTUP_SECONDS.append(time.perf_counter() - start_time)
 
-            response = ""
+        response = ""
 
-            def handle_event(event: SessionEvent):
-                nonlocal response
-                if event.type == SessionEventType.ASSISTANT_MESSAGE:
-                    if event.data.content:
-                        print(event.data.content)
-                    response = event.data.content or ""
+        def handle_event(event: SessionEvent):
+            nonlocal response
+            if event.type == SessionEventType.ASSISTANT_MESSAGE:
+                if event.data.content:
+                    print(event.data.content)
+                response = event.data.content or ""
 
-            session.on(handle_event)
+        session.on(handle_event)
 
+        try:
             await session.send_and_wait(options={"prompt": prompt, "attachments": attachments or None}, timeout=timeout)
-            return response
         finally:
-            await client.stop()
+            if client_pool is not None:
+                # The client outlives this prompt, so its session is cleaned up here
+                await session.destroy()
+        return response
+
+    if client_pool is not None:
+        async with client_pool.client() as client:
+            return await run(client)
+
+    client = CopilotClient(options={"auto_start": True})
+    try:
+        return await run(client)
+    finally:
+        await client.stop()
+
+def prompt_agent(prompt: str, system_message: str = "", tools: list[Tool] | None = None, model: str = "gpt-4.1",
+                 attachments: list[Attachment | dict] | None = None, timeout: int | None = 60) -> str:
+    """Prompt the Copilot agent and return the response."""
+    return asyncio.run(prompt_agent_async(prompt, system_message=system_message, tools=tools, model=model,
+                                          attachments=attachments, timeout=timeout))
+
+def evaluate_ft_candidate(circuit_text: str, stabilizers: list[str], data_qubits: list[int],
+                          distance: int) -> tuple[dict, dict]:
+    """
+    Check stabilizer preservation and fault tolerance of a candidate FT circuit.
 
-    return asyncio.run(run())
+    Every qubit outside data_qubits is treated as a flag. Runs in worker processes too,
+    so it only takes and returns plain data.
+
+    Returns:
+        (report, candidate): the report returned to the agent by validate_circuit and the
+        entry recorded in the list of candidates. report is {"error": ...} when the circuit
+        does not parse, and candidate is then None.
+    """
+    # Parsed once here; the stabilizer check and the propagation analysis reuse it.
+    try:
+        ingested = ingest_circuit(circuit_text)
+    except Exception as e:
+        return {"error": f"Failed to parse circuit: {e}"}, None
+
+    # The checks run on Stim's rendering, the text recorded for the candidate, and go
+    # through the on-disk verification cache: the final scoring of a B3 run may happen
+    # in another worker process, and finds the results of this call there.
+    canonical = ingested.canonical
+    ancillas = sorted(ingested.used_qubits - set(data_qubits))
+
+    # check stabilizers
+    result = cached_check_stabilizers(canonical, stabilizers)
+    print("".join(['.' if s else '!' for s in result.values()]))
+    preserved = sum(1 for ok in result.values() if ok)
+    all_stabilized = all(result.values())
+
+    # check error propagation and fault tolerance and find the ft score; every fault is
+    # propagated once and the worst-fault report reads from the same analysis
+    fault_tolerance_results, score = cached_ft_check(canonical, data_qubits, ancillas, distance)
+
+    # Return only the worst 10 faults (highest data weight)
+    top_errors = analyze_propagation(canonical, data_qubits, ancillas).worst_faults(10)
+
+    report = {
+        "fault_tolerance": fault_tolerance_results,
+        "error_propagation": top_errors, 
+        "preserved_stabilizers": preserved,
+        "ft_score": score
+    }
+    candidate = {
+        "circuit": canonical,
+        "ft_score": score,
+        "all_stabilized": all_stabilized,
+        "preserved_stabilizers": preserved,
+    }
+    return report, candidate
 
 def generate_ft_state_prep(stabilizers: list[str], non_ft_circuit: str, 
     distance: int, attempts: int | None = 3, timeout: int | None = 60, *, model: str,
-    prompt_file: str = "rq2/prompts/ft_state_prep_prompt.txt") -> tuple[stim.Circuit, list[dict]] | None:
+    prompt_file: str = "rq2/prompts/ft_state_prep_prompt.txt",
+    agent_files_dir: str | None = None) -> tuple[stim.Circuit, list[dict]] | None:
     """
     Generate a fault-tolerant state preparation circuit for given stabilizers.
     
     Args:
         stabilizers: List of stabilizer strings (e.g., ['XXXX', 'ZIZI'])
         attempts: Number of circuit design iterations to try. Returns the best one.
+        agent_files_dir: Scratch directory for files the agent writes (default: data/<model>/agent_files_ft).
     
     Returns:
         stim.Circuit: The generated fault-tolerant circuit with minimum bad faults or None if generation failed.
     """
+    return asyncio.run(generate_ft_state_prep_async(
+        stabilizers, non_ft_circuit, distance, attempts, timeout,
+        model=model, prompt_file=prompt_file, agent_files_dir=agent_files_dir,
+    ))
+
+async def generate_ft_state_prep_async(stabilizers: list[str], non_ft_circuit: str, 
+    distance: int, attempts: int | None = 3, timeout: int | None = 60, *, model: str,
+    prompt_file: str = "rq2/prompts/ft_state_prep_prompt.txt",
+    agent_files_dir: str | None = None,
+    executor: Executor | None = None,
+    client_pool: CopilotClientPool | None = None) -> tuple[stim.Circuit, list[dict]] | None:
+    """
+    Async version of `generate_ft_state_prep`, for running several agent sessions at once.
+
+    Concurrent sessions must each use their own agent_files_dir. If executor is given,
+    the validate_circuit tool runs `evaluate_ft_candidate` on it instead of blocking the
+    event loop (and every other session) while a candidate is being checked. With
+    client_pool, the session runs on one of the pool's warm clients.
+    """
     # Track all intermediate circuits
     all_candidates = []
 
@@ -135,7 +258,8 @@ def generate_ft_state_prep(stabilizers: list[str], non_ft_circuit: str,
     stabilizers_str = ", ".join(stabilizers)
 
     # Create a scratch directory for any temporary files the agent may write
-    agent_files_dir = os.path.join("data", model, "agent_files_ft")
+    if agent_files_dir is None:
+        agent_files_dir = os.path.join("data", model, "agent_files_ft")
     os.makedirs(agent_files_dir, exist_ok=True)
 
     result = None
@@ -183,61 +307,22 @@ def generate_ft_state_prep(stabilizers: list[str], non_ft_circuit: str,
         - How many stabilizers are preserved
         - The fault tolerance score
         - The most severe error propagation events""") 
-    def validate_circuit(circuit: CircuitParam) -> dict:
-        try:
-            parsed = stim.Circuit(circuit.circuit)
-        except Exception as e:
-            return {"error": f"Failed to parse circuit: {e}"}
-
-        ancillas = compute_ancillas(parsed, circuit.data_qubits)
-
-        # check stabilizers
-        result = check_stabilizers(circuit.circuit, circuit.stabilizers)
-        print("".join(['.' if s else '!' for s in result.values()]))
-        preserved = sum(1 for ok in result.values() if ok)
-        all_stabilized = all(result.values())
-
-        # check error propagation and fault tolerance
-        error_propagation_results, fault_tolerance_results = check_fault_tolerance(circuit.circuit, circuit.data_qubits, ancillas, distance)        
-
-        # Sort propagation results by highest data weight (worst faults)
-        sorted_errors = sorted(
-            error_propagation_results,
-            key=lambda r: r["data_weight"],
-            reverse=True
-        )
-
-        # Return only the worst 10 faults
-        top_errors = sorted_errors[:10]
-
-        # find the ft score
-        score = ft_score(circuit.circuit, circuit.data_qubits, ancillas, distance)
-        
+    async def validate_circuit(circuit: CircuitParam) -> dict:
+        args = (circuit.circuit, circuit.stabilizers, circuit.data_qubits, distance)
+        if executor is None:
+            report, candidate = evaluate_ft_candidate(*args)
+        else:
+            report, candidate = await asyncio.get_running_loop().run_in_executor(
+                executor, evaluate_ft_candidate, *args)
+        if candidate is None:
+            return report
 
         # Append candidate to list
-        all_candidates.append({
-            "circuit": str(parsed),
-            "ft_score": score,
-            "all_stabilized": all_stabilized,
-            "preserved_stabilizers": preserved,
-        })
+        all_candidates.append(candidate)
 
-        print(f"attempt:{len(all_candidates)}, score:{score}, stabilizers:{preserved}")
+        print(f"attempt:{len(all_candidates)}, score:{candidate['ft_score']}, stabilizers:{candidate['preserved_stabilizers']}")
 
-        return {
-            "fault_tolerance": fault_tolerance_results,
-            "error_propagation": top_errors, 
-            "preserved_stabilizers": preserved,
-            "ft_score": score
-        } 
-
-    def compute_ancillas(parsed_circuit, data_qubits):
-        used_qubits = set()
-        for inst in parsed_circuit:
-            for t in inst.targets_copy():
-                if hasattr(t, "value"):
-                    used_qubits.add(t.value)
-        return sorted(list(used_qubits - set(data_qubits)))
+        return report
 
     with open(prompt_file, "r") as f:
         prompt_template = f.read()
@@ -259,32 +344,50 @@ def generate_ft_state_prep(stabilizers: list[str], non_ft_circuit: str,
 
     print(prompt)
 
-    prompt_agent(prompt, system_message=system_message, tools=[validate_circuit, return_result], model=model, timeout=timeout)
+    await prompt_agent_async(prompt, system_message=system_message, tools=[validate_circuit, return_result], model=model, timeout=timeout,
+                             client_pool=client_pool)
 
     if result is None:
         return None, all_candidates
 
     return result, all_candidates
 
-
-def generate_state_prep(stabilizers: list[str], *, model:str, attempts: int = 1, timeout: int | None = 600, prompt_file: str = "rq1/prompts/state_prep_prompt4.txt") -> stim.Circuit | None:
+def generate_state_prep(stabilizers: list[str], *, model:str, attempts: int = 1, timeout: int | None = 600, prompt_file: str = "rq1/prompts/state_prep_prompt4.txt",
+                        agent_files_dir: str | None = None) -> stim.Circuit | None:
     """
     Generate a state preparation circuit for given stabilizers (without fault-tolerance requirement).
     
     Args:
         stabilizers: List of stabilizer strings (e.g., ['XXXX', 'ZIZI'])
         attempts: Number of circuit design iterations to try. Returns the best one.
+        agent_files_dir: Scratch directory for files the agent writes (default: data/<model>/agent_files).
+            Concurrent generations must each use their own directory.
     
     Returns:
         stim.Circuit: The generated circuit or None if generation failed.
     """
+    return asyncio.run(generate_state_prep_async(
+        stabilizers, model=model, attempts=attempts, timeout=timeout, prompt_file=prompt_file,
+        agent_files_dir=agent_files_dir,
+    ))
+
+async def generate_state_prep_async(stabilizers: list[str], *, model:str, attempts: int = 1, timeout: int | None = 600,
+                                    prompt_file: str = "rq1/prompts/state_prep_prompt4.txt",
+                                    agent_files_dir: str | None = None,
+                                    client_pool: CopilotClientPool | None = None) -> stim.Circuit | None:
+    """
+    Async version of `generate_state_prep`, for running several agent sessions at once.
+
+    With client_pool, the session runs on one of the pool's warm clients.
+    """
     
     # Format stabilizers for display
     stabilizers_str = ", ".join(stabilizers)
     qubits_count = len(stabilizers[0])
 
     # Create a scratch directory for any temporary files the agent may write
-    agent_files_dir = os.path.join("data", model, "agent_files")
+    if agent_files_dir is None:
+        agent_files_dir = os.path.join("data", model, "agent_files")
     os.makedirs(agent_files_dir, exist_ok=True)
 
     result = None
@@ -320,7 +423,7 @@ def generate_state_prep(stabilizers: list[str], *, model:str, attempts: int = 1,
     ))
     def check_stabilizers_tool(params: CheckStabilizersParam) -> dict:
         try:
-            _ = stim.Circuit(params.circuit)
+            ingest_circuit(params.circuit)
         except Exception as e:
             return {"error": f"Failed to parse circuit: {e}"}
 
@@ -350,7 +453,8 @@ def generate_state_prep(stabilizers: list[str], *, model:str, attempts: int = 1,
 
     print(prompt)
 
-    prompt_agent(prompt, system_message=system_message, tools=[check_stabilizers_tool, final_circuit], model=model, timeout=timeout)
+    await prompt_agent_async(prompt, system_message=system_message, tools=[check_stabilizers_tool, final_circuit], model=model, timeout=timeout,
+                             client_pool=client_pool)
 
     # Check if result was populated by the agent
     if not result:
@@ -365,6 +469,20 @@ class OptimizeParam(BaseModel):
     candidate: str = Field(description="Candidate Stim circuit")
 
 
+def compare_optimization_candidate(candidate: str, stabilizers: list[str],
+                                   baseline_text: str) -> tuple[dict[str, bool], bool, dict]:
+    """
+    Stabilizer check and lexicographic comparison of a candidate against the baseline.
+
+    One-off form of `OptimizationEvaluator`; sessions evaluating many candidates of the
+    same record keep one evaluator instead.
+
+    Returns:
+        (stab_results, better, info) as from `check_stabilizers` and `is_strictly_more_optimal`.
+    """
+    evaluation = OptimizationEvaluator(stabilizers, baseline_text).compute(candidate)
+    return evaluation.preserved, evaluation.better, evaluation.info
+
 def generate_optimized_circuit(
     stabilizers: list[str],
     initial_circuit: str,
@@ -373,6 +491,8 @@ def generate_optimized_circuit(
     model: str,
     attempts: int = 10,
     timeout: int | None = 6000,
+    agent_files_dir: str | Path | None = None,
+    baseline_metrics: dict | None = None,
 ) -> dict:
     """
     Optimize an existing Clifford circuit while preserving stabilizers.
@@ -386,21 +506,72 @@ def generate_optimized_circuit(
         model: LLM model identifier.
         attempts: Number of optimization attempts.
         timeout: Timeout in seconds.
+        agent_files_dir: Scratch directory for the agent
+            (default: rq3/data/<model>/agent_files/<timestamp>).
+        baseline_metrics: `compute_metrics(initial_circuit).as_dict()` when already known.
 
     Returns:
         dict with keys:
             'circuit': stim.Circuit | None  – the accepted optimized circuit, or None if none accepted.
             'evaluations': list[dict]       – intermediate results from each evaluate_optimization call,
-                each containing 'circuit', 'preserved_stabilizers', 'candidate', 'baseline', 'better'.
+                each containing 'circuit', 'preserved_stabilizers', 'candidate', 'baseline', 'better'
+                and 'latency_seconds', the wall-clock time of the call.
+    """
+    return asyncio.run(generate_optimized_circuit_async(
+        stabilizers,
+        initial_circuit,
+        prompt_template=prompt_template,
+        model=model,
+        attempts=attempts,
+        timeout=timeout,
+        agent_files_dir=agent_files_dir,
+        baseline_metrics=baseline_metrics,
+    ))
+
+async def generate_optimized_circuit_async(
+    stabilizers: list[str],
+    initial_circuit: str,
+    *,
+    prompt_template: str,
+    model: str,
+    attempts: int = 10,
+    timeout: int | None = 6000,
+    agent_files_dir: str | Path | None = None,
+    executor: Executor | None = None,
+    client_pool: CopilotClientPool | None = None,
+    baseline_metrics: dict | None = None,
+) -> dict:
+    """
+    Async version of `generate_optimized_circuit`, for running several agent sessions at once.
+
+    Both tools evaluate candidates with one `OptimizationEvaluator` for the session, and
+    a candidate evaluated before is answered from its kept result. Concurrent sessions
+    must each use their own agent_files_dir. If executor is given, the evaluations run on
+    it, so no tool call blocks the event loop. With client_pool, the session runs on one
+    of the pool's warm clients. The latency of every tool call is printed and added to
+    TOOL_CALL_SECONDS.
     """
 
     stabilizers_str = ", ".join(stabilizers)
 
-    repo_root = Path(__file__).resolve().parents[1]
-    run_id = datetime.now().strftime("%y%m%d.%H%M%S")
-    agent_files_dir = repo_root / "rq3" / "data" / model / "agent_files" / run_id
+    if agent_files_dir is None:
+        repo_root = Path(__file__).resolve().parents[1]
+        run_id = datetime.now().strftime("%y%m%d.%H%M%S")
+        agent_files_dir = repo_root / "rq3" / "data" / model / "agent_files" / run_id
+    agent_files_dir = Path(agent_files_dir)
     agent_files_dir.mkdir(parents=True, exist_ok=True)
 
+    evaluator = OptimizationEvaluator(stabilizers, initial_circuit, baseline_metrics)
+
+    async def compare(candidate: str) -> Evaluation:
+        if executor is None:
+            return evaluator.evaluate(candidate)
+        evaluation = evaluator.lookup(candidate)
+        if evaluation is None:
+            evaluation = await asyncio.get_running_loop().run_in_executor(executor, evaluator.compute, candidate)
+            evaluator.store(candidate, evaluation)
+        return evaluation
+
     result = None
     best_valid_circuit = None   # best valid+better circuit seen across all evaluations
     best_valid_metrics = None   # its (two_qubit_gates, volume, depth) tuple
@@ -438,25 +609,21 @@ def generate_optimized_circuit(
         "    optimizing — do NOT stop early. Use all available attempts.\n"
         "  - Prioritize reducing two_qubit_gates first, then volume, then depth."
     ))
-    def evaluate_optimization(params: OptimizeParam) -> dict:
+    async def evaluate_optimization(params: OptimizeParam) -> dict:
+        start = time.perf_counter()
+        # --- stabilizer check and optimization comparison, from one parse ---
         try:
-            stim.Circuit(params.candidate)
-        except Exception as e:
+            evaluation = await compare(params.candidate)
+        except CandidateParseError as e:
             return {"error": f"Failed to parse circuit: {e}"}
-
-        # --- stabilizer check ---
-        stab_results = check_stabilizers(params.candidate, stabilizers)
+        stab_results, better, info = evaluation.preserved, evaluation.better, evaluation.info
+        latency = time.perf_counter() - start
+        TOOL_CALL_SECONDS.append(latency)
         preserved = sum(1 for v in stab_results.values() if v)
         all_preserved = preserved == len(stab_results)
 
         print("".join(['.' if v else '!' for v in stab_results.values()]))
 
-        # --- optimization comparison ---
-        better, info = is_strictly_more_optimal(
-            candidate_text=params.candidate,
-            baseline_text=initial_circuit,
-        )
-
         cand = info["candidate"]
         base = info["baseline"]
 
@@ -466,7 +633,8 @@ def generate_optimized_circuit(
             f"DEPTH: {cand['depth']} (base {base['depth']}) "
             f"{'✓' if better else '✗'} | "
             f"stabilizers: {preserved}/{len(stab_results)} "
-            f"{'✓' if all_preserved else '✗'}"
+            f"{'✓' if all_preserved else '✗'} "
+            f"({latency * 1000:.1f} ms)"
         )
 
         eval_result = {
@@ -481,6 +649,7 @@ def generate_optimized_circuit(
         evaluations.append({
             "circuit": params.candidate,
             **eval_result,
+            "latency_seconds": round(latency, 4),
         })
 
         # Update best valid+better seen so far
@@ -513,25 +682,24 @@ def generate_optimized_circuit(
         "  - Submit the circuit with the lowest (two_qubit_gates, volume, depth) tuple\n"
         "    that was both valid and better."
     ))
-    def final_circuit(params: FinalCircuitParam) -> str:
+    async def final_circuit(params: FinalCircuitParam) -> str:
         nonlocal result, best_valid_circuit, best_valid_metrics
 
+        start = time.perf_counter()
         try:
-            parsed = stim.Circuit(params.stim_circuit)
-        except Exception as e:
+            evaluation = await compare(params.stim_circuit)
+        except CandidateParseError as e:
             return f"Failed to parse Stim circuit ({e}). Retry."
+        stab_results, better, info = evaluation.preserved, evaluation.better, evaluation.info
+        latency = time.perf_counter() - start
+        TOOL_CALL_SECONDS.append(latency)
+        print(f"[FINAL] evaluated in {latency * 1000:.1f} ms")
 
         # Enforce stabilizer preservation
-        stab_results = check_stabilizers(params.stim_circuit, stabilizers)
         if not all(stab_results.values()):
             return "Circuit does not preserve all stabilizers. Retry."
 
         # Enforce strict optimization
-        better, info = is_strictly_more_optimal(
-            candidate_text=params.stim_circuit,
-            baseline_text=initial_circuit,
-        )
-
         if not better:
             cand = info["candidate"]
             base = info["baseline"]
@@ -548,7 +716,7 @@ def generate_optimized_circuit(
 
         # Accept only if this beats or matches the current best
         if best_valid_metrics is None or candidate_key <= best_valid_metrics:
-            result = parsed
+            result = ingest_circuit(params.stim_circuit).circuit.copy()
             best_valid_circuit = params.stim_circuit
             best_valid_metrics = candidate_key
 
@@ -573,7 +741,8 @@ def generate_optimized_circuit(
 
     print(prompt)
 
-    prompt_agent(prompt, system_message=system_message, tools=[evaluate_optimization, final_circuit], model=model, timeout=timeout)
+    await prompt_agent_async(prompt, system_message=system_message, tools=[evaluate_optimization, final_circuit], model=model, timeout=timeout,
+                             client_pool=client_pool)
 
     # Return best found: prefer what agent explicitly submitted via final_circuit,
     # but fall back to the best internally tracked if the agent failed to submit.
@@ -581,7 +750,7 @@ def generate_optimized_circuit(
     if result:
         return {"circuit": result, "evaluations": evaluations}
     if best_valid_circuit:
-        return {"circuit": stim.Circuit(best_valid_circuit), "evaluations": evaluations}
+        return {"circuit": ingest_circuit(best_valid_circuit).circuit.copy(), "evaluations": evaluations}
     return {"circuit": None, "evaluations": evaluations}
 
 
@@ -0,0 +1,112 @@
+"""
+Precomputed baseline columns of the circuit dataset.
+
+The dataset circuits never change, yet every B3 run used to recompute the FT score of
+each original circuit and every B2 run its metrics. `data/generate_circuits.py --baseline`
+stores them once per entry, under a "baseline" key:
+
+    {"checksum": ..., "ft_score": 0.42, "fault_tolerant": false,
+     "fault_table": {"faults": ..., "high_weight_faults": ..., "max_data_weight": ...},
+     "metrics": {"cx_count": ..., "volume": ..., ...}}
+
+The FT values are those of the circuit with the permuted data qubits (`permutation`) and
+no flag qubits at distance `d`, as B3 scores the original circuit.
+
+The checksum hashes the normalized circuit, the permutation, d, BASELINE_VERSION and the
+checker versions of `verification_cache`. `stored_baseline` only returns columns whose
+checksum matches the entry, so columns of an edited entry, or computed by older checkers,
+are ignored and the runners fall back to computing the values.
+"""
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from check_error_propagation import analyze_propagation
+from circuit_ingest import normalize_stim_text
+from circuit_metric import compute_metrics
+from verification_cache import CHECKER_VERSIONS
+
+# Bump when the layout of the columns changes.
+BASELINE_VERSION = 1
+
+
+def _entry_circuit(entry: dict) -> str:
+    return normalize_stim_text(entry["output_circuit"].replace("\\n", "\n"))
+
+
+def baseline_checksum(entry: dict) -> str:
+    """Checksum of everything the baseline columns of a dataset entry depend on."""
+    circuit_digest = hashlib.sha256(_entry_circuit(entry).encode()).hexdigest()
+    payload = json.dumps(
+        [
+            BASELINE_VERSION,
+            CHECKER_VERSIONS["ft_check"],
+            CHECKER_VERSIONS["compute_metrics"],
+            circuit_digest,
+            list(entry["permutation"]),
+            entry["d"],
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def compute_baseline(entry: dict) -> dict:
+    """The baseline columns of a dataset entry."""
+    circuit = _entry_circuit(entry)
+    data_qubits = list(entry["permutation"])
+    d = entry["d"]
+    threshold = (d - 1) // 2
+
+    analysis = analyze_propagation(circuit, data_qubits, [])
+    data_weights = analysis.data_weights
+    return {
+        "checksum": baseline_checksum(entry),
+        "ft_score": analysis.ft_score(d),
+        "fault_tolerant": analysis.is_fault_tolerant(d),
+        "fault_table": {
+            "faults": int(data_weights.size),
+            "high_weight_faults": int((data_weights > threshold).sum()),
+            "max_data_weight": int(data_weights.max()) if data_weights.size else 0,
+        },
+        "metrics": compute_metrics(circuit).as_dict(),
+    }
+
+
+def stored_baseline(entry: dict) -> dict | None:
+    """The entry's baseline columns if they are present and up to date, else None."""
+    baseline = entry.get("baseline")
+    if not isinstance(baseline, dict):
+        return None
+    try:
+        if baseline.get("checksum") != baseline_checksum(entry):
+            return None
+    except (KeyError, TypeError):
+        return None
+    return baseline
+
+
+def add_baseline_columns(entries: list[dict], workers: int = 1, only_stale: bool = True) -> int:
+    """
+    Compute the "baseline" key of dataset entries in place.
+
+    Args:
+        entries: Dataset entries
+        workers: Number of processes computing the columns
+        only_stale: Keep the columns of entries whose checksum still matches
+
+    Returns:
+        The number of entries whose columns were (re)computed
+    """
+    todo = [i for i, entry in enumerate(entries) if not only_stale or stored_baseline(entry) is None]
+    if not todo:
+        return 0
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            baselines = list(executor.map(compute_baseline, [entries[i] for i in todo], chunksize=4))
+    else:
+        baselines = [compute_baseline(entries[i]) for i in todo]
+    for i, baseline in zip(todo, baselines):
+        entries[i]["baseline"] = baseline
+    return len(todo)
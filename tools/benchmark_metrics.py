@@ -0,0 +1,107 @@
+"""
+Benchmark `compute_metrics_batch` against per-circuit `compute_metrics`.
+
+Collects circuits from the dataset (every `output_circuit`) and/or B2 result files
+(the baseline, optimized and every evaluated candidate circuit of each result), computes
+their metrics both ways, checks that the results are identical and reports the
+throughput in circuits per second. The parse caches are cleared before each timed pass,
+so both passes parse every circuit.
+
+Usage:
+    python tools/benchmark_metrics.py --results B2/data/*/*.json --workers 4
+"""
+
+import argparse
+import json
+import os
+import time
+
+from circuit_ingest import _ingest_cache, normalize_stim_text
+from circuit_metric import BATCH_CHUNK_SIZE, compute_metrics, compute_metrics_batch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def dataset_circuits(path: str) -> list[str]:
+    """The `output_circuit` of every entry of a dataset JSONL file."""
+    circuits = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                circuits.append(json.loads(line)["output_circuit"])
+    return circuits
+
+
+def result_circuits(path: str) -> list[str]:
+    """The baseline, optimized and evaluated circuits of a B2 result file."""
+    with open(path, "r", encoding="utf-8") as f:
+        results = json.load(f)["results"]
+    circuits = []
+    for result in results:
+        for key in ("baseline_circuit", "optimized_circuit"):
+            if result.get(key):
+                circuits.append(result[key])
+        circuits.extend(evaluation["circuit"] for evaluation in result.get("evaluations") or [])
+    return circuits
+
+
+def clear_parse_caches() -> None:
+    _ingest_cache.clear()
+    normalize_stim_text.cache_clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch circuit metrics")
+    parser.add_argument(
+        "--dataset",
+        nargs="*",
+        default=None,
+        help="Dataset JSONL files (default: data/circuit_dataset.jsonl when no --results are given)",
+    )
+    parser.add_argument("--results", nargs="*", default=[], help="B2 result JSON files")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Processes of the batch pass (default: 1)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=BATCH_CHUNK_SIZE,
+        help=f"Circuits scheduled together (default: {BATCH_CHUNK_SIZE})",
+    )
+    parser.add_argument("--no-reference", action="store_true", help="Skip the per-circuit pass")
+    args = parser.parse_args()
+
+    datasets = args.dataset
+    if datasets is None:
+        datasets = [] if args.results else [os.path.join(REPO_ROOT, "data", "circuit_dataset.jsonl")]
+    circuits = [circuit for path in datasets for circuit in dataset_circuits(path)]
+    circuits += [circuit for path in args.results for circuit in result_circuits(path)]
+    # Unparseable candidates are part of the B2 results; they are not metrics workloads
+    valid = []
+    for circuit in circuits:
+        try:
+            compute_metrics(circuit)
+        except Exception:
+            continue
+        valid.append(circuit)
+    print(f"{len(valid)} circuits ({len(circuits) - len(valid)} skipped as unparseable)")
+
+    clear_parse_caches()
+    start = time.perf_counter()
+    batch = compute_metrics_batch(valid, workers=args.workers, chunk_size=args.chunk_size)
+    batch_seconds = time.perf_counter() - start
+    print(f"batch ({args.workers} workers): {batch_seconds:8.3f}s  {len(valid) / batch_seconds:10.1f} circuits/s")
+
+    if args.no_reference:
+        return
+    clear_parse_caches()
+    start = time.perf_counter()
+    reference = [compute_metrics(circuit) for circuit in valid]
+    reference_seconds = time.perf_counter() - start
+    print(f"per circuit:         {reference_seconds:8.3f}s  {len(valid) / reference_seconds:10.1f} circuits/s")
+    if batch != reference:
+        raise AssertionError("Batch and per-circuit metrics disagree")
+    print(f"identical results, speedup {reference_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
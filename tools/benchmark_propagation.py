@@ -0,0 +1,124 @@
+"""
+Benchmark fault propagation on the largest codes in data/benchmarks.json.
+
+Compares the propagation backends of `check_error_propagation` ("numpy": all faults
+as packed column operations, "frame": single backward pass) with the per-fault
+reference (`propagate_fault`, one suffix tableau per injected fault). The
+reference is quadratic in the gate count, so it is only run on the first
+`--reference-faults` faults of each circuit; its full cost is extrapolated from that
+sample, and the sampled rows are checked to be identical to the engine's output. The
+analysis and parse caches are cleared before each timed call, so every backend
+propagates every fault of the circuit (identical circuits would otherwise be lookups).
+
+Usage:
+    python tools/benchmark_propagation.py --top 5 --reference-faults 300
+"""
+
+import argparse
+import json
+import os
+import time
+
+import stim
+
+from check_error_propagation import (
+    BACKENDS,
+    _analysis_cache,
+    check_error_propagation,
+    error_weight_on,
+    parse_circuit_to_gate_list,
+    propagate_fault,
+)
+from circuit_ingest import _ingest_cache, normalize_stim_text
+
+
+def naive_circuit(generators: list[str]) -> str:
+    """Baseline state-prep circuit, built the same way as data/generate_circuits.py."""
+    tableau = stim.Tableau.from_stabilizers(
+        [stim.PauliString(s) for s in generators],
+        allow_redundant=False,
+        allow_underconstrained=True,
+    )
+    return str(tableau.to_circuit(method="elimination"))
+
+
+def clear_caches() -> None:
+    _analysis_cache.clear()
+    _ingest_cache.clear()
+    normalize_stim_text.cache_clear()
+
+
+def reference_rows(circuit: str, data_qubits: list[int], flag_qubits: list[int], limit: int) -> list[dict]:
+    """The original per-fault propagation loop, stopped after `limit` faults."""
+    gate_list = parse_circuit_to_gate_list(stim.Circuit(circuit))
+    rows = []
+    for gate_index, (gate_name, qubits) in enumerate(gate_list):
+        for q in qubits:
+            if q not in data_qubits:
+                continue
+            for pauli in ("X", "Z", "Y"):
+                if len(rows) >= limit:
+                    return rows
+                final_paulis, x_mask, z_mask = propagate_fault(gate_list, gate_index, pauli, q)
+                rows.append({
+                    "loc": gate_index,
+                    "gate": gate_name,
+                    "fault_qubit": q,
+                    "fault_pauli": pauli,
+                    "final_paulis": final_paulis,
+                    "data_weight": error_weight_on(data_qubits, x_mask, z_mask),
+                    "flag_weight": error_weight_on(flag_qubits, x_mask, x_only=True),
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fault propagation engines")
+    parser.add_argument(
+        "--benchmarks",
+        default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "benchmarks.json"),
+        help="Path to benchmarks JSON file (default: data/benchmarks.json)",
+    )
+    parser.add_argument("--top", type=int, default=5, help="Number of largest codes to benchmark (default: 5)")
+    parser.add_argument(
+        "--reference-faults",
+        type=int,
+        default=300,
+        help="Faults propagated with the per-fault reference per code (default: 300)",
+    )
+    args = parser.parse_args()
+
+    with open(args.benchmarks, "r") as f:
+        benchmarks = json.load(f)
+    largest = sorted(benchmarks, key=lambda b: b["physical_qubits"], reverse=True)[:args.top]
+
+    header = f"{'code':<55s} | {'n':>4s} | {'gates':>6s} | {'faults':>7s} | "
+    header += " | ".join(f"{backend + ' s':>9s}" for backend in BACKENDS)
+    print(header + f" | {'reference s (est.)':>18s} | {'speedup':>8s}")
+    for entry in largest:
+        circuit = naive_circuit(entry["generators"])
+        data_qubits = list(range(entry["physical_qubits"]))
+        num_gates = len(parse_circuit_to_gate_list(stim.Circuit(circuit)))
+
+        engine_seconds = {}
+        for backend in BACKENDS:
+            clear_caches()
+            start = time.perf_counter()
+            rows = check_error_propagation(circuit, data_qubits, [], backend=backend)
+            engine_seconds[backend] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sample = reference_rows(circuit, data_qubits, [], args.reference_faults)
+        sample_seconds = time.perf_counter() - start
+        if sample != rows[:len(sample)]:
+            raise AssertionError(f"Engine and reference disagree on {entry['name']}")
+
+        reference_seconds = sample_seconds * len(rows) / max(len(sample), 1)
+        fastest = min(engine_seconds.values())
+        line = f"{entry['name'][:55]:<55s} | {entry['physical_qubits']:4d} | {num_gates:6d} | {len(rows):7d} | "
+        line += " | ".join(f"{engine_seconds[backend]:9.3f}" for backend in BACKENDS)
+        print(line + f" | {reference_seconds:18.1f} | {reference_seconds / fastest:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,20 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
 import stim
 
-def parse_circuit_to_gate_list(circuit):
-    """Parse a Stim circuit into individual gates for fault injection."""
-    gate_list = []
-    for instruction in circuit:
-        if instruction.name in ['CX', 'CY', 'CZ', 'CNOT']:
-            # Two-qubit gates: split into individual pairs
-            targets = instruction.targets_copy()
-            for i in range(0, len(targets), 2):
-                qubit_a = targets[i].value
-                qubit_b = targets[i+1].value
-                gate_list.append((instruction.name, [qubit_a, qubit_b]))
-        elif instruction.name in ['M', 'MX', 'MY', 'MZ', 'MR', 'MRX', 'MRY', 'MRZ']:
-            # Measurement: one entry per qubit
-            for tg in instruction.targets_copy():
-                if hasattr(tg, 'value'):
-                    gate_list.append((instruction.name, [tg.value]))
-        elif instruction.name in ['H', 'X', 'Y', 'Z', 'S', 'S_DAG', 'SQRT_X', 'SQRT_Y']:
-            # Single qubit gates
-            for tg in instruction.targets_copy():
-                if hasattr(tg, 'value'):
-                    gate_list.append((instruction.name, [tg.value]))
-        else:
-            # General case: extract all qubit targets
-            qubits = []
-            for tg in instruction.targets_copy():
-                if hasattr(tg, 'value'):
-                    qubits.append(tg.value)
-            if qubits:
-                gate_list.append((instruction.name, qubits))
-    return gate_list
+from batch_propagation import FaultBatch, propagate_fault_batch
+from circuit_ingest import ingest_circuit, parse_circuit_to_gate_list
+from dem_propagation import propagate_fault_batch_dem
+from multi_fault import find_multi_fault_violation
+from pauli_frame import propagate_all_faults
+
+BACKENDS = ("numpy", "frame", "dem")
+
+# Number of (circuit, data qubits, flag qubits, backend) analyses kept by `analyze_propagation`.
+ANALYSIS_CACHE_SIZE = 32
+_analysis_cache: "OrderedDict[tuple, PropagationAnalysis]" = OrderedDict()
 
 def inject_pauli(sim, pauli, qubit):
     """Inject X, Z, or Y fault on a qubit."""
@@ -112,12 +97,171 @@ def error_weight_on(qubits, x_mask, z_mask=None, x_only=False):
     return w
 
 
-def check_error_propagation(circuit: str, data_qubits: list[int], flag_qubits: list[int]):
+def fault_batch(circuit: str, data_qubits: list[int], backend: str = "numpy") -> FaultBatch:
+    """Propagate every single-qubit Pauli fault on `data_qubits` and return the fault table.
+
+    Args:
+        circuit: A string in the stim circuit format.
+        data_qubits: Qubits on which faults are injected.
+        backend: "numpy" propagates all faults at once as packed column operations;
+            "frame" answers each fault from a single backward pass over the gate list;
+            "dem" reads every fault's frame off stim's detector error model of the
+            circuit with DEPOLARIZE1 noise after each gate.
+    """
+    ingested = ingest_circuit(circuit)
+    if backend == "numpy":
+        return propagate_fault_batch(ingested.ir, data_qubits)
+    gate_list = ingested.gate_list
+    if backend == "frame":
+        num_qubits = 0
+        for _, targets in gate_list:
+            if targets:
+                num_qubits = max(num_qubits, max(targets) + 1)
+        return FaultBatch.from_frames(propagate_all_faults(gate_list, data_qubits), num_qubits)
+    if backend == "dem":
+        return propagate_fault_batch_dem(gate_list, data_qubits)
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+
+def _propagation_rows(batch: FaultBatch, data_weights: np.ndarray, flag_weights: np.ndarray) -> list[dict]:
+    """Expand a fault table into the per-fault dictionaries returned by `check_error_propagation`."""
+    data_weights = data_weights.tolist()
+    flag_weights = flag_weights.tolist()
+    results = []
+    for i, final_paulis in enumerate(batch.final_paulis()):
+        results.append({
+            "loc": batch.locs[i],
+            "gate": batch.gates[i],
+            "fault_qubit": batch.qubits[i],
+            "fault_pauli": batch.paulis[i],
+            "final_paulis": final_paulis,
+            "data_weight": data_weights[i],
+            "flag_weight": flag_weights[i],
+        })
+    return results
+
+class PropagationAnalysis:
+    """Single-fault propagation table of one circuit, computed once and shared by every FT check.
+
+    Use `analyze_propagation` to obtain instances; it keeps a bounded LRU so that
+    `check_fault_tolerance`, `ft_score` and the worst-fault report on the same circuit
+    propagate each fault only once. Everything is computed lazily.
+    """
+
+    def __init__(self, circuit: str, data_qubits: list[int], flag_qubits: list[int], backend: str = "numpy"):
+        self.circuit = circuit
+        self.data_qubits = list(data_qubits)
+        self.flag_qubits = list(flag_qubits)
+        self.backend = backend
+        self._batch = None
+        self._data_weights = None
+        self._flag_weights = None
+        self._rows = None
+        self._flags_xy = None
+        self._multi_fault = {}
+
+    @property
+    def batch(self) -> FaultBatch:
+        if self._batch is None:
+            self._batch = fault_batch(self.circuit, self.data_qubits, self.backend)
+        return self._batch
+
+    @property
+    def data_weights(self) -> np.ndarray:
+        if self._data_weights is None:
+            self._data_weights = self.batch.data_weights(self.data_qubits)
+        return self._data_weights
+
+    @property
+    def flag_weights(self) -> np.ndarray:
+        if self._flag_weights is None:
+            self._flag_weights = self.batch.flag_weights(self.flag_qubits)
+        return self._flag_weights
+
+    @property
+    def rows(self) -> list[dict]:
+        """Per-fault dictionaries in the format of `check_error_propagation` (shared, do not mutate)."""
+        if self._rows is None:
+            self._rows = _propagation_rows(self.batch, self.data_weights, self.flag_weights)
+        return self._rows
+
+    def flags_with_xy_without_fault(self) -> dict[int, str]:
+        if self._flags_xy is None:
+            self._flags_xy = flags_with_xy_without_fault(self.circuit, self.flag_qubits)
+        return self._flags_xy
+
+    def is_fault_tolerant(self, d: int = 3) -> bool:
+        threshold = (d - 1) // 2
+        return not bool(np.any((self.data_weights > threshold) & (self.flag_weights < 1)))
+
+    def multi_fault_violation(self, d: int = 3, max_faults: int | None = None, workers: int = 1) -> dict | None:
+        """First set of up to `max_faults` faults causing an unflagged error of weight > (d - 1) // 2, see `find_multi_fault_violation`."""
+        key = (d, max_faults)
+        if key not in self._multi_fault:
+            self._multi_fault[key] = find_multi_fault_violation(
+                self.batch, self.data_qubits, self.flag_qubits, d, max_faults, workers
+            )
+        return self._multi_fault[key]
+
+    def ft_score(self, d: int = 3) -> float:
+        if self.flags_with_xy_without_fault():
+            return 0.0
+        threshold = (d - 1) // 2
+        high_weight = self.data_weights > threshold
+        denominator = float(np.count_nonzero(high_weight))
+        numerator = float(np.count_nonzero(high_weight & (self.flag_weights == 0)))
+        if denominator == 0.0:
+            return 1.0
+        return 1.0 - (numerator / denominator)
+
+    def worst_faults(self, k: int = 10) -> list[dict]:
+        """The `k` faults with the highest data weight, ties kept in circuit order."""
+        if self._rows is not None:
+            return sorted(self._rows, key=lambda r: r["data_weight"], reverse=True)[:k]
+        order = np.argsort(-self.data_weights, kind="stable")[:k]
+        batch = self.batch
+        subset = FaultBatch(
+            locs=[batch.locs[i] for i in order],
+            gates=[batch.gates[i] for i in order],
+            qubits=[batch.qubits[i] for i in order],
+            paulis=[batch.paulis[i] for i in order],
+            x=batch.x[order],
+            z=batch.z[order],
+        )
+        return _propagation_rows(subset, self.data_weights[order], self.flag_weights[order])
+
+
+def analyze_propagation(circuit: str, data_qubits: list[int], flag_qubits: list[int],
+                        backend: str = "numpy") -> PropagationAnalysis:
+    """Return the (possibly cached) PropagationAnalysis of a circuit.
+
+    The cache key is a hash of the canonical Stim text of the circuit plus the data and
+    flag qubit sets, so formatting differences between callers still hit the cache.
+    """
+    canonical = ingest_circuit(circuit).canonical
+    key = (
+        hashlib.sha256(canonical.encode()).hexdigest(),
+        tuple(sorted(set(data_qubits))),
+        tuple(sorted(set(flag_qubits))),
+        backend,
+    )
+    analysis = _analysis_cache.get(key)
+    if analysis is not None:
+        _analysis_cache.move_to_end(key)
+        return analysis
+    analysis = PropagationAnalysis(canonical, data_qubits, flag_qubits, backend)
+    _analysis_cache[key] = analysis
+    while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _analysis_cache.popitem(last=False)
+    return analysis
+
+def check_error_propagation(circuit: str, data_qubits: list[int], flag_qubits: list[int], backend: str = "numpy"):
     '''Check error propagation through the circuit for single-qubit Pauli faults.
     Args:
         circuit: A string in the stim circuit format.
         data_qubits: List of qubit indices considered as data qubits.
         flag_qubits: List of qubit indices considered as flag qubits.
+        backend: Propagation engine, see `fault_batch`.
     Returns: List of dictionaries containing error propagation results:
             - loc: Gate index after which the fault is injected.
             - gate: Gate name at that location.
@@ -127,31 +271,7 @@ def check_error_propagation(circuit: str, data_qubits: list[int], flag_qubits: l
             - data_weight: Number of data qubits affected by the fault (error propagation if > 1).
             - flag_weight: Number of flag qubits with an X error (error detected when >= 1).
     '''
-    gate_list = parse_circuit_to_gate_list(stim.Circuit(circuit))
-    
-    results = []
-    # Iterate through each gate in the gate list
-    for gate_index, (gate_name, qubits) in enumerate(gate_list):
-        for q in qubits:
-            # Only inject faults on data qubits
-            if q not in data_qubits:
-                continue
-            
-            for pauli in ("X", "Z", "Y"):
-                final_paulis, x_mask, z_mask = propagate_fault(gate_list, gate_index, pauli, q)
-                data_w = error_weight_on(data_qubits, x_mask, z_mask)
-                flag_w = error_weight_on(flag_qubits, x_mask, x_only=True)
-
-                results.append({
-                    "loc": gate_index,
-                    "gate": gate_name,
-                    "fault_qubit": q,
-                    "fault_pauli": pauli,
-                    "final_paulis": final_paulis,
-                    "data_weight": data_w,
-                    "flag_weight": flag_w,
-                })
-    return results
+    return list(analyze_propagation(circuit, data_qubits, flag_qubits, backend).rows)
 
 # def check_fault_tolerance(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3, distance: int) -> tuple[list, bool]:
 #     '''Check if the circuit is fault-tolerant against single-qubit Pauli faults.
@@ -165,18 +285,42 @@ def check_error_propagation(circuit: str, data_qubits: list[int], flag_qubits: l
 #             return results, False
 #     return results, True
 
-def check_fault_tolerance(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3) -> tuple[list, bool]:
+def check_fault_tolerance(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3,
+                          backend: str = "numpy", max_faults: int = 1, workers: int = 1) -> tuple[list, bool]:
     '''Check if the circuit is fault-tolerant against single-qubit Pauli faults.
     A circuit is fault-tolerant if:
         - Every single-qubit Pauli fault causes at most one data qubit error without flagging.
         - Every single-qubit Pauli fault that causes more than one data qubit error causes at least one flag qubit to have an X error.
+    With max_faults > 1, every combination of up to max_faults faults must likewise either
+    leave at most (d - 1) // 2 data errors or be flagged (see `check_multi_fault_tolerance`).
     '''
-    results = check_error_propagation(circuit, data_qubits, flag_qubits)
-    threshold = (d - 1) // 2
-    for r in results:
-        if r["data_weight"] > threshold and r["flag_weight"] < 1:
-            return results, False
-    return results, True
+    analysis = analyze_propagation(circuit, data_qubits, flag_qubits, backend)
+    if not analysis.is_fault_tolerant(d):
+        return list(analysis.rows), False
+    if max_faults > 1 and analysis.multi_fault_violation(d, max_faults, workers) is not None:
+        return list(analysis.rows), False
+    return list(analysis.rows), True
+
+def check_multi_fault_tolerance(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3,
+                                max_faults: int | None = None, workers: int = 1,
+                                backend: str = "numpy") -> tuple[dict | None, bool]:
+    '''Check fault tolerance against every combination of up to max_faults single-qubit Pauli faults.
+    Combined frames are XORs of the single-fault frames, so nothing is re-simulated; the search
+    stops at the first undetected combination with more than (d - 1) // 2 data errors.
+    Args:
+        circuit: A string in the stim circuit format.
+        data_qubits: List of qubit indices considered as data qubits.
+        flag_qubits: List of qubit indices considered as flag qubits.
+        d: Code distance.
+        max_faults: Largest number of simultaneous faults, (d - 1) // 2 by default.
+        workers: Number of processes used to search fault pairs, triples, ...
+        backend: Propagation engine, see `fault_batch`.
+    Returns: (violation, is_ft) where violation is None or the first violating fault set
+        (see `find_multi_fault_violation`).
+    '''
+    analysis = analyze_propagation(circuit, data_qubits, flag_qubits, backend)
+    violation = analysis.multi_fault_violation(d, max_faults, workers)
+    return violation, violation is None
 
 def flags_with_xy_without_fault(circuit: str, flag_qubits: list[int]) -> dict[int, str]:
     """Return flag qubits that end in an X/Y Bloch axis without injected faults."""
@@ -184,7 +328,7 @@ def flags_with_xy_without_fault(circuit: str, flag_qubits: list[int]) -> dict[in
         return {}
 
     sim = stim.TableauSimulator()
-    sim.do(stim.Circuit(circuit))
+    sim.do(ingest_circuit(circuit).circuit)
 
     flagged = {}
     for q in flag_qubits:
@@ -193,29 +337,15 @@ def flags_with_xy_without_fault(circuit: str, flag_qubits: list[int]) -> dict[in
             flagged[q] = bloch
     return flagged
 
-def ft_score(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3) -> float:
+def ft_score(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3,
+             backend: str = "numpy") -> float:
     '''Compute the fault-tolerance score based on weighted undetected faults.
     FT = 1 - (1/|T(S(C))|) * \\sum_{C' \\in T(S(C))} 1{C' is undetected}
 
     If any flag qubit already ends in X or Y without injected faults, return 0.0.
     If |T(S(C))| = 0 (no faults cause > threshold data errors), return 1.0.
     '''
-    if flags_with_xy_without_fault(circuit, flag_qubits):
-        return 0.0
-
-    results = check_error_propagation(circuit, data_qubits, flag_qubits)
-    threshold = (d - 1) // 2
-    numerator = 0.0
-    denominator = 0.0
-    for r in results:
-        weight = r["data_weight"]
-        if weight > threshold:
-            denominator += 1
-            if r["flag_weight"] == 0:
-                numerator += 1
-    if denominator == 0.0:
-        return 1.0
-    return 1.0 - (numerator / denominator)
+    return analyze_propagation(circuit, data_qubits, flag_qubits, backend).ft_score(d)
 
 if __name__ == "__main__":
     data_qubits = [0, 1, 2, 3]
@@ -1,5 +1,21 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
 import stim
-import re
+
+from circuit_ingest import IngestedCircuit, ingest_circuit, normalize_stim_text
+
+# Lookup tables from the ASCII code of a Pauli letter to its X / Z bit.
+_X_BIT = np.zeros(256, dtype=np.float32)
+_Z_BIT = np.zeros(256, dtype=np.float32)
+_X_BIT[[ord("X"), ord("Y")]] = 1
+_Z_BIT[[ord("Z"), ord("Y")]] = 1
+
+# Number of (circuit, stabilizers) results of measurement-free circuits kept by `check_stabilizers`.
+RESULT_CACHE_SIZE = 256
+_result_cache: "OrderedDict[tuple, tuple[bool, ...]]" = OrderedDict()
 
 def check_stabilizers(circuit: str, stabilizers: list[str]) -> dict[str, bool]:
     """Check if the given stabilizers are preserved by the circuit.
@@ -11,47 +27,157 @@ def check_stabilizers(circuit: str, stabilizers: list[str]) -> dict[str, bool]:
     Returns:
         A dictionary mapping each stabilizer to a boolean indicating if it is preserved.
     """
-    circuit = preprocess_stim_text(circuit)
-    circ = stim.Circuit(circuit)
-    sim = stim.TableauSimulator()
-    sim.do(circ)
-
-    results = {}
-    for stabilizer in stabilizers:
-        pauli = stim.PauliString(stabilizer + 'I' * (circ.num_qubits - len(stabilizer)))
-        expectation = sim.peek_observable_expectation(pauli)
-        results[stabilizer] = expectation > 0
-    return results
+    return StabilizerTargets(stabilizers).check(ingest_circuit(circuit))
 
-def preprocess_stim_text(raw: str) -> str:
-    """
-    Normalize a Stim circuit string so Stim can parse it reliably.
-    - Converts literal '\\n' sequences into real newlines.
-    - Strips leading/trailing whitespace per line.
-    - Removes empty lines.
-    - Collapses internal whitespace to single spaces.
-    - (Optional) removes comment lines starting with '#'.
+class StabilizerTargets:
+    """Target stabilizers prepared once for checking many circuits against them.
+
+    The X/Z bit matrices of the stabilizers only depend on the simulator width, so they
+    are built once per width instead of once per checked circuit.
     """
-    if raw is None:
-        return ""
 
-    text = raw.strip()
+    def __init__(self, stabilizers: list[str]):
+        self.stabilizers = list(stabilizers)
+        self._key = tuple(self.stabilizers)
+        self._width = max([len(s) for s in self.stabilizers], default=0)
+        self._bits: dict[int, tuple[np.ndarray, np.ndarray]] = {}
 
-    # If the user wrote "\\n" inside a triple-quoted string, turn it into actual newlines.
-    text = text.replace("\\n", "\n")
+    def bits(self, width: int) -> tuple[np.ndarray, np.ndarray]:
+        """`_pauli_bits` of the stabilizers for a simulator of `width` qubits."""
+        bits = self._bits.get(width)
+        if bits is None:
+            bits = self._bits[width] = _pauli_bits(self.stabilizers, width)
+        return bits
 
-    lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith("#"):
+    def check(self, ingested: IngestedCircuit) -> dict[str, bool]:
+        """`check_stabilizers` of an ingested circuit."""
+        return dict(zip(self.stabilizers, self.preserved(ingested)))
+
+    def preserved(self, ingested: IngestedCircuit) -> tuple[bool, ...]:
+        """Whether each stabilizer is preserved by the ingested circuit, in order."""
+        key = (ingested.digest, self._key)
+        preserved = _result_cache.get(key)
+        if preserved is not None:
+            _result_cache.move_to_end(key)
+            return preserved
+
+        circ = ingested.circuit
+        sim = stim.TableauSimulator()
+        sim.do(circ)
+        width = max(ingested.num_qubits, self._width)
+        sim.set_num_qubits(width)
+        xs, zs = self.bits(width)
+        preserved = tuple(bool(ok) for ok in _stabilized_by_bits(sim, self.stabilizers, xs, zs))
+
+        # Without measurements, resets or noise the answer is deterministic and can be reused.
+        if is_unitary_circuit(circ):
+            _result_cache[key] = preserved
+            while len(_result_cache) > RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+        return preserved
+
+@lru_cache(maxsize=None)
+def _is_unitary_gate(name: str) -> bool:
+    data = stim.gate_data(name)
+    if data.is_unitary:
+        return True
+    # Annotations (TICK, QUBIT_COORDS, ...) are fine; measurements, resets and noise are not.
+    return not (data.produces_measurements or data.is_reset or data.is_noisy_gate)
+
+def is_unitary_circuit(circ: stim.Circuit) -> bool:
+    """Whether the circuit is a pure Clifford unitary (no measurements, resets or noise)."""
+    for instruction in circ:
+        if isinstance(instruction, stim.CircuitRepeatBlock):
+            if not is_unitary_circuit(instruction.body_copy()):
+                return False
+        elif not _is_unitary_gate(instruction.name):
+            return False
+    return True
+
+def _pauli_bits(paulis: list[str], width: int) -> tuple[np.ndarray, np.ndarray]:
+    """X and Z bits of Pauli strings as (len(paulis), width) float arrays; signs are ignored."""
+    if paulis and all(len(p) == width for p in paulis):
+        joined = "".join(paulis)
+        if not joined.strip("IXYZ_"):
+            codes = np.frombuffer(joined.encode(), dtype=np.uint8).reshape(len(paulis), width)
+            return _X_BIT[codes], _Z_BIT[codes]
+    xs = np.zeros((len(paulis), width), dtype=np.float32)
+    zs = np.zeros((len(paulis), width), dtype=np.float32)
+    for i, pauli in enumerate(paulis):
+        letters = pauli.lstrip("+-")
+        if letters.strip("IXYZ_"):
+            # Anything unusual (e.g. 'X0*Z3' sparse notation) is left to stim's parser.
+            x, z = stim.PauliString(pauli).to_numpy()
+            xs[i, :len(x)] = x
+            zs[i, :len(z)] = z
             continue
-        # collapse runs of whitespace to a single space
-        line = re.sub(r"\s+", " ", line)
-        lines.append(line)
+        codes = np.frombuffer(letters.encode(), dtype=np.uint8)
+        xs[i, :len(codes)] = _X_BIT[codes]
+        zs[i, :len(codes)] = _Z_BIT[codes]
+    return xs, zs
+
+def stabilized_by_state(sim: stim.TableauSimulator, paulis: list[str]) -> np.ndarray:
+    """Return, for each Pauli string, whether the simulator's state has expectation +1 for it.
+
+    With T the simulator's tableau, <P> = +/-1 exactly when T^-1 P T is a Z-type Pauli.
+    That test is done for all Paulis at once as a GF(2) product with the X-output columns
+    of the inverse tableau; only the Paulis that pass are evaluated one by one for their
+    sign. The Pauli strings must not be wider than the simulator.
+    """
+    xs, zs = _pauli_bits(paulis, sim.num_qubits)
+    return _stabilized_by_bits(sim, paulis, xs, zs)
+
+def _stabilized_by_bits(sim: stim.TableauSimulator, paulis: list[str], xs: np.ndarray,
+                        zs: np.ndarray) -> np.ndarray:
+    """`stabilized_by_state` with the `_pauli_bits` of the Paulis already computed."""
+    preserved = np.zeros(len(paulis), dtype=bool)
+    if not paulis:
+        return preserved
+    inverse = sim.current_inverse_tableau()
+    width = len(inverse)
+    x2x, _, z2x, _, _, _ = inverse.to_numpy(bit_packed=True)
+    x2x = np.unpackbits(x2x, axis=1, count=width, bitorder="little").astype(np.float32)
+    z2x = np.unpackbits(z2x, axis=1, count=width, bitorder="little").astype(np.float32)
+    # Float products go through BLAS and are exact for any realistic qubit count.
+    x_part = (xs @ x2x + zs @ z2x).astype(np.int64) & 1
+    for i in np.flatnonzero(~x_part.any(axis=1)):
+        preserved[i] = sim.peek_observable_expectation(stim.PauliString(paulis[i])) > 0
+    return preserved
+
+def _check_one(item, return_exceptions):
+    circuit, stabilizers = item
+    try:
+        return check_stabilizers(circuit, stabilizers)
+    except Exception as e:
+        if return_exceptions:
+            return e
+        raise
+
+def check_stabilizers_batch(items: list[tuple[str, list[str]]], workers: int = 1,
+                            return_exceptions: bool = False) -> list:
+    """Run `check_stabilizers` on many (circuit, stabilizers) pairs.
 
-    return "\n".join(lines) + ("\n" if lines else "")
+    Each circuit is simulated once and all of its stabilizers are tested together against
+    the final tableau.
+
+    Args:
+        items: List of (circuit, stabilizers) pairs, in the formats of `check_stabilizers`.
+        workers: Number of processes; 1 checks the items in this process.
+        return_exceptions: If True, an item whose check raises gets the exception as its
+            result instead of aborting the whole batch.
+    Returns:
+        One {stabilizer: preserved} dictionary (or exception) per item, in input order.
+    """
+    items = [(circuit, list(stabilizers)) for circuit, stabilizers in items]
+    if workers <= 1 or len(items) <= 1:
+        return [_check_one(item, return_exceptions) for item in items]
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_check_one, items, [return_exceptions] * len(items), chunksize=chunksize))
+
+def preprocess_stim_text(raw: str) -> str:
+    """Normalize a Stim circuit string so Stim can parse it reliably, see `circuit_ingest.normalize_stim_text`."""
+    return normalize_stim_text(raw)
 
 if __name__ == "__main__":
     # Example: Check if a circuit prepares the |0000⟩ + |1111⟩ state (4-qubit GHZ)
@@ -0,0 +1,117 @@
+"""
+Shared normalization and parsing of Stim circuit text.
+
+Every tool used to run its own normalizer and `stim.Circuit(...)` parse, so a single agent
+tool call parsed the same text several times. `ingest_circuit` normalizes once, hashes the
+normalized text and keeps a bounded LRU from that hash to an `IngestedCircuit`, which
+parses the circuit once and derives its `CircuitIR` (see circuit_ir.py), gate list and
+qubit sets lazily. Stabilizer checks, metrics and error propagation all read from it.
+
+The cached `stim.Circuit` is shared between callers and must not be mutated; take a
+`.copy()` first when a modified circuit is needed.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from functools import cached_property, lru_cache
+
+import numpy as np
+import stim
+
+from circuit_ir import MEASURED, USED, CircuitIR
+
+# Number of parsed circuits (and of raw -> normalized texts) kept in memory.
+INGEST_CACHE_SIZE = 128
+_ingest_cache: "OrderedDict[str, IngestedCircuit]" = OrderedDict()
+
+
+@lru_cache(maxsize=INGEST_CACHE_SIZE)
+def normalize_stim_text(raw: str) -> str:
+    """
+    Normalize a Stim circuit string so Stim can parse it reliably.
+    - Converts literal '\\n' sequences into real newlines.
+    - Strips leading/trailing whitespace per line.
+    - Removes empty lines and comment lines starting with '#'.
+    - Collapses internal whitespace to single spaces.
+    """
+    if raw is None:
+        return ""
+
+    # Circuits stored in JSON / typed into triple-quoted strings often contain literal "\n".
+    text = raw.strip().replace("\\n", "\n")
+
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        lines.append(re.sub(r"\s+", " ", line))
+
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def parse_circuit_to_gate_list(circuit):
+    """Parse a Stim circuit into individual gates for fault injection, REPEAT blocks expanded.
+
+    Two-qubit CX/CY/CZ gates are split into pairs, measurements and common single-qubit
+    gates into one entry per target; other instructions keep all their targets. See
+    `CircuitIR`, which holds the same split as arrays.
+    """
+    return CircuitIR.from_circuit(circuit).gate_list()
+
+
+class IngestedCircuit:
+    """A normalized circuit text with its parse and derived structures, computed on first use."""
+
+    def __init__(self, text: str, digest: str):
+        self.text = text
+        self.digest = digest
+        self.circuit = stim.Circuit(text)
+
+    @cached_property
+    def canonical(self) -> str:
+        """Stim's own rendering of the circuit (merges equivalent formattings)."""
+        return str(self.circuit)
+
+    @cached_property
+    def num_qubits(self) -> int:
+        return self.circuit.num_qubits
+
+    @cached_property
+    def ir(self) -> CircuitIR:
+        """Array form of the circuit, REPEAT blocks expanded (shared, do not mutate)."""
+        return CircuitIR.from_circuit(self.circuit)
+
+    @cached_property
+    def gate_list(self) -> list[tuple[str, list[int]]]:
+        """`parse_circuit_to_gate_list` of the circuit (shared, do not mutate)."""
+        return self.ir.gate_list()
+
+    @cached_property
+    def used_qubits(self) -> frozenset[int]:
+        """Qubits targeted by at least one instruction."""
+        return frozenset(np.flatnonzero(self.ir.qubit_roles & USED).tolist())
+
+    @cached_property
+    def measured_qubits(self) -> frozenset[int]:
+        """Qubits targeted by at least one measurement."""
+        return frozenset(np.flatnonzero(self.ir.qubit_roles & MEASURED).tolist())
+
+
+def ingest_circuit(raw: str) -> IngestedCircuit:
+    """Normalize and parse circuit text, returning the cached entry when the text was seen before.
+
+    Raises whatever `stim.Circuit` raises for unparseable text; failures are not cached.
+    """
+    text = normalize_stim_text(raw)
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    entry = _ingest_cache.get(digest)
+    if entry is not None:
+        _ingest_cache.move_to_end(digest)
+        return entry
+    entry = IngestedCircuit(text, digest)
+    _ingest_cache[digest] = entry
+    while len(_ingest_cache) > INGEST_CACHE_SIZE:
+        _ingest_cache.popitem(last=False)
+    return entry
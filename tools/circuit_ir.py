@@ -0,0 +1,255 @@
+"""
+Compact, array-backed form of a Stim circuit shared by metrics, fault propagation and
+FT checking.
+
+Each analysis used to walk the `stim.Circuit` objects itself and build its own lists of
+`(name, [targets])` tuples, and they expanded REPEAT blocks inconsistently. A `CircuitIR`
+is built once per circuit, with REPEAT blocks expanded, and stores:
+
+    opcodes[i]                           opcode of instruction i; OPCODE_NAMES[op] is its name
+    targets[offsets[i]:offsets[i + 1]]   values of its targets, in Stim order
+    target_kinds[...]                    QUBIT / PAULI / RECORD / SWEEP / COMBINER per target
+    qubits[qubit_offsets[i]:qubit_offsets[i + 1]]   its plain qubit targets only
+
+Fault injection works on gates rather than instructions: `CX 0 1 2 3` is two gates.
+`gate_opcodes`, `gate_starts` and `gate_stops` slice the same `targets` array into the
+gates of `parse_circuit_to_gate_list`, so the split costs no copies of target lists.
+
+`qubit_roles` is a per-qubit bit mask: USED and MEASURED are set from the circuit,
+`role_mask` adds the DATA and FLAG bits of a particular analysis.
+"""
+
+import re
+from functools import cached_property
+
+import numpy as np
+import stim
+
+# Kinds of targets
+QUBIT = 1
+PAULI = 2  # X0, Y1, Z2 (MPP, SPP, ...)
+RECORD = 4  # rec[-k]
+SWEEP = 8  # sweep[k]
+COMBINER = 16  # the "*" of a Pauli product
+
+# Bits of the qubit role mask
+USED = 1
+MEASURED = 2
+DATA = 4
+FLAG = 8
+
+# Opcodes are shared by all circuits of the process.
+OPCODE_NAMES: list[str] = []
+_opcodes: dict[str, int] = {}
+# Per opcode, whether the gate produces measurement results.
+_measuring: list[bool] = []
+
+# Gates split into target pairs, and gates split into single targets, for fault injection.
+PAIR_GATES = frozenset({"CX", "CY", "CZ", "CNOT"})
+PER_TARGET_GATES = frozenset({
+    "M", "MX", "MY", "MZ", "MR", "MRX", "MRY", "MRZ",
+    "H", "X", "Y", "Z", "S", "S_DAG", "SQRT_X", "SQRT_Y",
+})
+# An instruction line without tag whose targets are all plain qubits: "CX 0 1", "M(0.01) 2 3".
+_QUBIT_LINE = re.compile(r"([A-Z][A-Z0-9_]*)(?:\([^)]*\))?((?: \d+)*)")
+
+
+def opcode(name: str) -> int:
+    """The opcode of a gate name, registered on first use."""
+    op = _opcodes.get(name)
+    if op is None:
+        op = _opcodes[name] = len(OPCODE_NAMES)
+        OPCODE_NAMES.append(name)
+        try:
+            _measuring.append(stim.gate_data(name).produces_measurements)
+        except (IndexError, ValueError):
+            _measuring.append(False)
+    return op
+
+
+def _target_kind(target: stim.GateTarget) -> int:
+    if target.is_qubit_target:
+        return QUBIT
+    if target.is_x_target or target.is_y_target or target.is_z_target:
+        return PAULI
+    if target.is_measurement_record_target:
+        return RECORD
+    if target.is_sweep_bit_target:
+        return SWEEP
+    return COMBINER
+
+
+def _expanded_lines(lines: list[str]) -> list[str]:
+    """
+    The instruction lines of a rendered circuit with REPEAT blocks expanded.
+
+    Unlike `stim.Circuit.flattened()`, this keeps the instructions on both sides of a block
+    boundary apart: `CX 1 0` followed by `REPEAT 2 { CX 0 1 ... }` stays two instructions
+    instead of `CX 1 0 0 1`, so every instruction remains a fault location of its own.
+    """
+    def expand(i: int) -> tuple[list[str], int]:
+        out = []
+        while i < len(lines):
+            line = lines[i].strip()
+            if line == "}":
+                return out, i + 1
+            if line.startswith("REPEAT") and line.endswith("{"):
+                body, i = expand(i + 1)
+                out.extend(body * int(line.split()[-2]))
+            else:
+                out.append(line)
+                i += 1
+        return out, i
+
+    return expand(0)[0]
+
+
+class CircuitIR:
+    """Flat instruction, target and gate arrays of a circuit, REPEAT blocks expanded."""
+
+    def __init__(self, opcodes: np.ndarray, offsets: np.ndarray, targets: np.ndarray,
+                 target_kinds: np.ndarray, num_qubits: int):
+        self.opcodes = opcodes
+        self.offsets = offsets
+        self.targets = targets
+        self.target_kinds = target_kinds
+        self.num_qubits = num_qubits
+
+        is_qubit = target_kinds == QUBIT
+        self.qubits = targets[is_qubit]
+        self.qubit_offsets = np.concatenate(([0], np.cumsum(is_qubit)))[offsets]
+
+    @classmethod
+    def from_circuit(cls, circuit: stim.Circuit) -> "CircuitIR":
+        # Stim's rendering of the circuit has one instruction per line; REPEAT blocks are
+        # expanded on the text (see `_expanded_lines`). Lines whose targets are all plain
+        # qubits are read from the text, which is much faster than a GateTarget object per
+        # target; the others are parsed back by Stim.
+        opcodes = []
+        counts = []
+        values = []
+        kinds = []
+        for line in _expanded_lines(str(circuit).splitlines()):
+            match = _QUBIT_LINE.fullmatch(line)
+            if match is not None:
+                opcodes.append(opcode(match.group(1)))
+                qubits = match.group(2).split()
+                counts.append(len(qubits))
+                values.extend(map(int, qubits))
+                kinds.extend([QUBIT] * len(qubits))
+                continue
+            instruction = stim.Circuit(line)[0]
+            opcodes.append(opcode(instruction.name))
+            targets = instruction.targets_copy()
+            counts.append(len(targets))
+            for target in targets:
+                values.append(target.value)
+                kinds.append(_target_kind(target))
+        return cls(
+            np.array(opcodes, dtype=np.int32),
+            np.concatenate(([0], np.cumsum(counts, dtype=np.int64))),
+            np.array(values, dtype=np.int64),
+            np.array(kinds, dtype=np.uint8),
+            circuit.num_qubits,
+        )
+
+    @classmethod
+    def from_gate_list(cls, gate_list: list[tuple[str, list[int]]]) -> "CircuitIR":
+        """IR of a `(name, [qubits])` gate list, one instruction per gate."""
+        targets = np.array([q for _, qubits in gate_list for q in qubits], dtype=np.int64)
+        qubits = targets[targets >= 0]
+        return cls(
+            np.array([opcode(name) for name, _ in gate_list], dtype=np.int32),
+            np.concatenate(([0], np.cumsum([len(qubits) for _, qubits in gate_list], dtype=np.int64))),
+            targets,
+            np.full(len(targets), QUBIT, dtype=np.uint8),
+            int(qubits.max()) + 1 if len(qubits) else 0,
+        )
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    @cached_property
+    def names(self) -> list[str]:
+        """Name of every instruction."""
+        return [OPCODE_NAMES[op] for op in self.opcodes.tolist()]
+
+    def instruction_qubits(self, i: int) -> np.ndarray:
+        """The plain qubit targets of instruction i."""
+        return self.qubits[self.qubit_offsets[i]:self.qubit_offsets[i + 1]]
+
+    def only_qubit_targets(self, i: int) -> bool:
+        """Whether every target of instruction i is a plain qubit."""
+        return (self.qubit_offsets[i + 1] - self.qubit_offsets[i]) == (self.offsets[i + 1] - self.offsets[i])
+
+    @cached_property
+    def _gates(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        gate_opcodes = []
+        starts = []
+        stops = []
+        offsets = self.offsets.tolist()
+        for i, name in enumerate(self.names):
+            start, stop = offsets[i], offsets[i + 1]
+            if start == stop:
+                continue
+            if name in PAIR_GATES:
+                bounds = range(start, stop, 2)
+                width = 2
+            elif name in PER_TARGET_GATES:
+                bounds = range(start, stop)
+                width = 1
+            else:
+                bounds = (start,)
+                width = stop - start
+            gate_opcodes.extend([self.opcodes[i]] * len(bounds))
+            starts.extend(bounds)
+            stops.extend(b + width for b in bounds)
+        return (
+            np.array(gate_opcodes, dtype=np.int32),
+            np.array(starts, dtype=np.int64),
+            np.array(stops, dtype=np.int64),
+        )
+
+    @property
+    def gate_opcodes(self) -> np.ndarray:
+        return self._gates[0]
+
+    @property
+    def gate_starts(self) -> np.ndarray:
+        return self._gates[1]
+
+    @property
+    def gate_stops(self) -> np.ndarray:
+        return self._gates[2]
+
+    @cached_property
+    def gate_names(self) -> list[str]:
+        return [OPCODE_NAMES[op] for op in self.gate_opcodes.tolist()]
+
+    def gate_list(self) -> list[tuple[str, list[int]]]:
+        """The gates as `(name, [targets])` tuples, for consumers of `parse_circuit_to_gate_list`."""
+        targets = self.targets.tolist()
+        return [
+            (name, targets[start:stop])
+            for name, start, stop in zip(self.gate_names, self.gate_starts.tolist(), self.gate_stops.tolist())
+        ]
+
+    @cached_property
+    def qubit_roles(self) -> np.ndarray:
+        """USED / MEASURED bits per qubit; do not mutate, see `role_mask`."""
+        roles = np.zeros(self.num_qubits, dtype=np.uint8)
+        addressed = (self.target_kinds == QUBIT) | (self.target_kinds == PAULI)
+        roles[self.targets[addressed]] |= USED
+        measuring = np.array(_measuring, dtype=bool)
+        per_target = np.repeat(measuring[self.opcodes], np.diff(self.offsets))
+        roles[self.targets[addressed & per_target]] |= MEASURED
+        return roles
+
+    def role_mask(self, data_qubits=(), flag_qubits=()) -> np.ndarray:
+        """A copy of `qubit_roles` with the DATA and FLAG bits set, sized to hold every given qubit."""
+        size = max([self.num_qubits, *(q + 1 for q in data_qubits), *(q + 1 for q in flag_qubits)])
+        roles = np.zeros(size, dtype=np.uint8)
+        roles[:self.num_qubits] = self.qubit_roles
+        roles[np.asarray(list(data_qubits), dtype=np.intp)] |= DATA
+        roles[np.asarray(list(flag_qubits), dtype=np.intp)] |= FLAG
+        return roles
@@ -1,11 +1,15 @@
 # circuit_metric.py
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable, Iterator, Union
 
+import numpy as np
 import stim
 
+from circuit_ingest import IngestedCircuit, ingest_circuit
+from circuit_ir import OPCODE_NAMES, CircuitIR
+
 DEFAULT_VOLUME_GATES = frozenset({"H", "S", "X", "Z", "CX", "CZ"})
 
 
@@ -27,107 +31,388 @@ class CircuitMetrics:
         }
 
 
-StimItem = Union[stim.CircuitInstruction, stim.CircuitRepeatBlock]
+# Instructions that carry no gates.
+ANNOTATIONS = frozenset({"QUBIT_COORDS", "SHIFT_COORDS", "DETECTOR", "OBSERVABLE_INCLUDE"})
 
+# Variables of the depth schedule as a max-plus linear system (see `_block_transfer`):
+# a constant 0, the depth, the TICK floor, then the last layer of every qubit.
+_ZERO, _DEPTH, _FLOOR = 0, 1, 2
 
-def _iter_instructions(circuit: stim.Circuit) -> Iterator[stim.CircuitInstruction]:
-    """
-    Iterates over instructions in a circuit, recursively expanding REPEAT blocks.
-    """
-    for item in circuit:
-        # Stim yields either CircuitInstruction or CircuitRepeatBlock.
-        if isinstance(item, stim.CircuitRepeatBlock):
-            body = item.body_copy()
-            for _ in range(item.repeat_count):
-                yield from _iter_instructions(body)
-        else:
-            yield item
 
+def _split_ops(name: str, qubits: list[int]) -> list[tuple[int, ...]]:
+    """Expand an instruction into per-gate operations (important for Stim "packed" instructions)."""
+    if name in {"CX", "CZ", "SWAP"}:
+        if len(qubits) % 2 != 0:
+            raise ValueError(
+                f"Malformed {name} instruction with odd #qubit targets: {qubits}"
+            )
+        return [(qubits[j], qubits[j + 1]) for j in range(0, len(qubits), 2)]
+    return [(q,) for q in qubits]
 
-def _qubit_targets(inst: stim.CircuitInstruction) -> list[int]:
-    return [t.value for t in inst.targets_copy() if t.is_qubit_target]
 
+def _count_ops(counts: list[int], name: str, ops: list[tuple[int, ...]], volume_gates: frozenset[str]) -> None:
+    """Add an instruction's ops to counts = [cx_count, volume, one_qubit, two_qubit]."""
+    # Counting: one-/two-qubit counts are structural; volume is gate-set-defined.
+    for op in ops:
+        if len(op) == 1:
+            counts[2] += 1
+        elif len(op) == 2:
+            counts[3] += 1
 
-def compute_metrics(
-    circuit_text: str,
-    volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
-    *,
-    tick_is_barrier: bool = True,
-) -> CircuitMetrics:
-    circuit_text = _normalize_stim_text(circuit_text)
-    circuit = stim.Circuit(circuit_text)
-    cx_count = 0
-    volume = 0
-    one_qubit = 0
-    two_qubit = 0
+    if name in volume_gates:
+        counts[1] += len(ops)
+        if name == "CX":
+            counts[0] += len(ops)
+
+
+def _maxplus_product(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(a ⊗ b)[i, j] = max_k a[i, k] + b[k, j]."""
+    out = np.full((a.shape[0], b.shape[1]), -np.inf)
+    for k in range(a.shape[1]):
+        np.maximum(out, a[:, k:k + 1] + b[k], out=out)
+    return out
+
+
+def _maxplus_power(a: np.ndarray, n: int) -> np.ndarray:
+    result = np.full(a.shape, -np.inf)
+    np.fill_diagonal(result, 0.0)
+    while n:
+        if n & 1:
+            result = _maxplus_product(a, result)
+        n >>= 1
+        if n:
+            a = _maxplus_product(a, a)
+    return result
 
-    # Greedy depth: last scheduled layer per qubit.
-    last_layer: dict[int, int] = {}
-    depth = 0
 
-    # If tick_is_barrier, enforce that operations after a TICK occur strictly after prior layers.
-    tick_floor = 1
+def _touched_qubits(block: stim.Circuit) -> set[int]:
+    qubits = set()
+    for item in block:
+        if isinstance(item, stim.CircuitRepeatBlock):
+            qubits |= _touched_qubits(item.body_copy())
+        elif item.name not in ANNOTATIONS:
+            qubits.update(t.value for t in item.targets_copy() if t.is_qubit_target)
+    return qubits
+
+
+def _block_transfer(
+    block: stim.Circuit,
+    index: dict[int, int],
+    volume_gates: frozenset[str],
+    tick_is_barrier: bool,
+) -> tuple[np.ndarray, list[int]]:
+    """
+    The effect of one pass over a block on the depth schedule, and the block's counts.
 
-    for inst in _iter_instructions(circuit):
-        name = inst.name
+    Every step of the greedy schedule is a max of variables plus constants, so a pass over
+    the block is a max-plus linear map: the variables after it are T ⊗ x of the variables
+    x before it. Row v of T holds the form of variable v, built by running the schedule
+    on forms instead of numbers. A REPEAT block of count n is then T^n, computed by
+    squaring, so its cost depends on the size of its body, not on n.
+    """
+    forms = np.full((len(index) + 3, len(index) + 3), -np.inf)
+    np.fill_diagonal(forms, 0.0)
+    counts = [0, 0, 0, 0]
+    for item in block:
+        if isinstance(item, stim.CircuitRepeatBlock):
+            body, body_counts = _block_transfer(item.body_copy(), index, volume_gates, tick_is_barrier)
+            forms = _maxplus_product(_maxplus_power(body, item.repeat_count), forms)
+            for i, value in enumerate(body_counts):
+                counts[i] += value * item.repeat_count
+            continue
 
-        if name in {"QUBIT_COORDS", "SHIFT_COORDS", "DETECTOR", "OBSERVABLE_INCLUDE"}:
+        name = item.name
+        if name in ANNOTATIONS:
             continue
 
         if name == "TICK":
             if tick_is_barrier:
-                # Next ops must start after everything scheduled so far.
-                tick_floor = max(tick_floor, depth + 1)
+                np.maximum(forms[_FLOOR], forms[_DEPTH] + 1, out=forms[_FLOOR])
             continue
 
-        qubits = _qubit_targets(inst)
+        qubits = [t.value for t in item.targets_copy() if t.is_qubit_target]
         if not qubits:
             continue
+        ops = _split_ops(name, qubits)
+        _count_ops(counts, name, ops, volume_gates)
 
-        # Expand into per-gate operations (important for Stim "packed" instructions).
-        ops: list[tuple[int, ...]] = []
-        if name in {"CX", "CZ", "SWAP"}:
-            if len(qubits) % 2 != 0:
-                raise ValueError(
-                    f"Malformed {name} instruction with odd #qubit targets: {qubits}"
-                )
-            for i in range(0, len(qubits), 2):
-                ops.append((qubits[i], qubits[i + 1]))
-        else:
-            for q in qubits:
-                ops.append((q,))
-
-        # Counting: one-/two-qubit counts are structural; volume is gate-set-defined.
         for op in ops:
-            if len(op) == 1:
-                one_qubit += 1
-            elif len(op) == 2:
-                two_qubit += 1
+            rows = [index[q] for q in set(op)]
+            layer = forms[rows].max(axis=0) + 1
+            np.maximum(layer, forms[_FLOOR] if tick_is_barrier else forms[_ZERO] + 1, out=layer)
+            forms[rows] = layer
+            np.maximum(forms[_DEPTH], layer, out=forms[_DEPTH])
+    return forms, counts
+
+
+class _DepthSchedule:
+    """Greedy ASAP schedule of a circuit's ops into layers, with counts."""
+
+    def __init__(self, volume_gates: frozenset[str], tick_is_barrier: bool):
+        self.volume_gates = volume_gates
+        self.tick_is_barrier = tick_is_barrier
+        self.counts = [0, 0, 0, 0]  # cx_count, volume, one_qubit, two_qubit
 
-        if name in volume_gates:
-            volume += len(ops)
-            if name == "CX":
-                cx_count += len(ops)
+        # Greedy depth: last scheduled layer per qubit.
+        self.last_layer: dict[int, int] = {}
+        self.depth = 0
+
+        # If tick_is_barrier, enforce that operations after a TICK occur strictly after prior layers.
+        self.tick_floor = 1
+
+    def instruction(self, name: str, qubits: list[int]) -> None:
+        if name in ANNOTATIONS:
+            return
+
+        if name == "TICK":
+            if self.tick_is_barrier:
+                # Next ops must start after everything scheduled so far.
+                self.tick_floor = max(self.tick_floor, self.depth + 1)
+            return
+
+        if not qubits:
+            return
+
+        ops = _split_ops(name, qubits)
+        _count_ops(self.counts, name, ops, self.volume_gates)
 
         # Depth scheduling per op (lets disjoint ops in same instruction parallelize).
+        last_layer = self.last_layer
         for op in ops:
             uq = set(op)
 
-            layer = tick_floor if tick_is_barrier else 1
+            layer = self.tick_floor if self.tick_is_barrier else 1
             for q in uq:
                 layer = max(layer, last_layer.get(q, 0) + 1)
 
             for q in uq:
                 last_layer[q] = layer
-            depth = max(depth, layer)
-
-    return CircuitMetrics(
-        cx_count=cx_count,
-        volume=volume,
-        one_qubit_gates=one_qubit,
-        two_qubit_gates=two_qubit,
-        depth=depth,
+            self.depth = max(self.depth, layer)
+
+    def repeat(self, body: stim.Circuit, count: int) -> None:
+        """Schedule `count` passes over `body` analytically, see `_block_transfer`."""
+        qubits = sorted(_touched_qubits(body))
+        index = {q: i + 3 for i, q in enumerate(qubits)}
+        transfer, body_counts = _block_transfer(body, index, self.volume_gates, self.tick_is_barrier)
+        transfer = _maxplus_power(transfer, count)
+
+        state = np.array(
+            [0, self.depth, self.tick_floor] + [self.last_layer.get(q, 0) for q in qubits], dtype=float
+        )
+        state = (transfer + state).max(axis=1)
+        self.depth = int(state[_DEPTH])
+        self.tick_floor = int(state[_FLOOR])
+        for q, value in zip(qubits, state[3:].tolist()):
+            self.last_layer[q] = int(value)
+        for i, value in enumerate(body_counts):
+            self.counts[i] += value * count
+
+    def metrics(self) -> CircuitMetrics:
+        cx_count, volume, one_qubit, two_qubit = self.counts
+        return CircuitMetrics(
+            cx_count=cx_count,
+            volume=volume,
+            one_qubit_gates=one_qubit,
+            two_qubit_gates=two_qubit,
+            depth=self.depth,
+        )
+
+
+def compute_metrics(
+    circuit_text: str,
+    volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
+    *,
+    tick_is_barrier: bool = True,
+) -> CircuitMetrics:
+    """
+    Gate counts and greedy depth of a circuit, with the results of its unrolled form.
+
+    REPEAT blocks are not unrolled: their counts are the body's times the repeat count
+    and their effect on the depth schedule is a max-plus matrix power.
+    """
+    return ingested_metrics(ingest_circuit(circuit_text), volume_gates, tick_is_barrier=tick_is_barrier)
+
+
+def ingested_metrics(
+    ingested: IngestedCircuit,
+    volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
+    *,
+    tick_is_barrier: bool = True,
+) -> CircuitMetrics:
+    """`compute_metrics` of an already ingested circuit."""
+    schedule = _DepthSchedule(volume_gates, tick_is_barrier)
+
+    if "REPEAT" not in ingested.text:
+        ir = ingested.ir
+        all_qubits = ir.qubits.tolist()
+        qubit_offsets = ir.qubit_offsets.tolist()
+        for i, name in enumerate(ir.names):
+            schedule.instruction(name, all_qubits[qubit_offsets[i]:qubit_offsets[i + 1]])
+        return schedule.metrics()
+
+    for item in ingested.circuit:
+        if isinstance(item, stim.CircuitRepeatBlock):
+            schedule.repeat(item.body_copy(), item.repeat_count)
+        else:
+            schedule.instruction(item.name, [t.value for t in item.targets_copy() if t.is_qubit_target])
+    return schedule.metrics()
+
+
+# Circuits per task of `compute_metrics_batch`.
+BATCH_CHUNK_SIZE = 256
+# Instructions whose qubit targets are split into pairs by `_split_ops`.
+_PAIR_OPS = frozenset({"CX", "CZ", "SWAP"})
+
+
+def _ops_of(ir: CircuitIR, volume_gates: frozenset[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[int]]:
+    """
+    The ops of a REPEAT-free circuit as arrays (first qubit, second qubit, is TICK), and its counts.
+
+    Single-qubit ops have equal first and second qubits; TICKs are ops on qubit -1.
+    """
+    names = OPCODE_NAMES
+    kinds = np.array(
+        [2 if name in _PAIR_OPS else 3 if name == "TICK" else 0 if name in ANNOTATIONS else 1 for name in names],
+        dtype=np.int8,
     )
+    in_volume = np.array([name in volume_gates for name in names], dtype=bool)
+    instruction_kinds = kinds[ir.opcodes]
+    num_qubits = np.diff(ir.qubit_offsets)
+
+    pair = instruction_kinds == 2
+    odd = pair & (num_qubits % 2 == 1)
+    if odd.any():
+        i = int(np.flatnonzero(odd)[0])
+        raise ValueError(
+            f"Malformed {names[ir.opcodes[i]]} instruction with odd #qubit targets: {ir.instruction_qubits(i).tolist()}"
+        )
+
+    # Op counts per instruction; annotations and targetless instructions have none
+    num_ops = np.where(pair, num_qubits // 2, np.where(instruction_kinds == 1, num_qubits, 0))
+    one_qubit = int(num_ops[instruction_kinds == 1].sum())
+    two_qubit = int(num_ops[pair].sum())
+    volume = int(num_ops[in_volume[ir.opcodes]].sum())
+    # CX ops are counted as part of the volume, as in `_count_ops`
+    cx_count = 0
+    if "CX" in volume_gates and "CX" in names:
+        cx_count = int(num_ops[ir.opcodes == names.index("CX")].sum())
+
+    # Every op starts at a position of the flat qubit array; ops of pair instructions at
+    # every other position. A TICK sorts before the qubits of the instructions after it.
+    position_kinds = np.repeat(instruction_kinds, num_qubits)
+    within = np.arange(len(ir.qubits)) - np.repeat(ir.qubit_offsets[:-1], num_qubits)
+    starts = np.flatnonzero((position_kinds == 1) | ((position_kinds == 2) & (within % 2 == 0)))
+    seconds = np.where(position_kinds[starts] == 2, starts + 1, starts)
+    ticks = ir.qubit_offsets[:-1][instruction_kinds == 3]
+    order = np.argsort(np.concatenate((2 * starts + 1, 2 * ticks)), kind="stable")
+
+    first = np.concatenate((ir.qubits[starts], np.full(len(ticks), -1)))[order]
+    second = np.concatenate((ir.qubits[seconds], np.full(len(ticks), -1)))[order]
+    is_tick = np.concatenate((np.zeros(len(starts), dtype=bool), np.ones(len(ticks), dtype=bool)))[order]
+    return first, second, is_tick, [cx_count, volume, one_qubit, two_qubit]
+
+
+def _schedule_batch(
+    ops: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    tick_is_barrier: bool,
+) -> list[int]:
+    """
+    Greedy depths of many circuits at once, one step per op index.
+
+    The last layer of every qubit of every circuit is one row of an array, so step t
+    schedules the t-th op of all circuits with a few array operations. Circuits are
+    sorted by length, so the circuits still running at step t are a prefix of the rows;
+    their ops are gathered from the concatenated op arrays, without padding.
+    """
+    if not ops:
+        return []
+    lengths = np.array([len(first) for first, _, _ in ops], dtype=np.int64)
+    order = np.argsort(-lengths, kind="stable")
+    rows, steps = len(ops), int(lengths.max())
+    # TICKs address the extra last column
+    width = max((int(max(first.max(), second.max())) + 1 for first, second, _ in ops if len(first)), default=0)
+    is_tick = np.concatenate([ops[k][2] for k in order.tolist()])
+    first = np.concatenate([ops[k][0] for k in order.tolist()])
+    second = np.concatenate([ops[k][1] for k in order.tolist()])
+    first[is_tick] = width
+    second[is_tick] = width
+    starts = np.concatenate(([0], np.cumsum(lengths[order])[:-1]))
+
+    last_layer = np.zeros((rows, width + 1), dtype=np.int64)
+    depth = np.zeros(rows, dtype=np.int64)
+    tick_floor = np.ones(rows, dtype=np.int64)
+    # Circuits still running at every step
+    active = rows - np.searchsorted(lengths[order][::-1], np.arange(steps), side="right")
+    index = np.arange(rows)
+    for t in range(steps):
+        m = int(active[t])
+        r = index[:m]
+        at = starts[:m] + t
+        a, b, tick = first[at], second[at], is_tick[at]
+        layer = np.maximum(np.maximum(last_layer[r, a], last_layer[r, b]) + 1, tick_floor[:m])
+        layer[tick] = 0
+        last_layer[r, a] = layer
+        last_layer[r, b] = layer
+        np.maximum(depth[:m], layer, out=depth[:m])
+        if tick_is_barrier:
+            tick_floor[:m][tick] = np.maximum(tick_floor[:m][tick], depth[:m][tick] + 1)
+
+    depths = [0] * rows
+    for row, k in enumerate(order.tolist()):
+        depths[k] = int(depth[row])
+    return depths
+
+
+def _metrics_chunk(
+    circuit_texts: list[str],
+    volume_gates: frozenset[str],
+    tick_is_barrier: bool,
+) -> list[CircuitMetrics]:
+    results: list[CircuitMetrics | None] = [None] * len(circuit_texts)
+    batch = []
+    for i, text in enumerate(circuit_texts):
+        ingested = ingest_circuit(text)
+        if "REPEAT" in ingested.text:
+            results[i] = ingested_metrics(ingested, volume_gates, tick_is_barrier=tick_is_barrier)
+            continue
+        first, second, is_tick, counts = _ops_of(ingested.ir, volume_gates)
+        batch.append((i, (first, second, is_tick), counts))
+
+    depths = _schedule_batch([ops for _, ops, _ in batch], tick_is_barrier)
+    for (i, _, counts), depth in zip(batch, depths):
+        cx_count, volume, one_qubit, two_qubit = counts
+        results[i] = CircuitMetrics(
+            cx_count=cx_count,
+            volume=volume,
+            one_qubit_gates=one_qubit,
+            two_qubit_gates=two_qubit,
+            depth=depth,
+        )
+    return results
+
+
+def compute_metrics_batch(
+    circuit_texts: list[str],
+    volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
+    *,
+    tick_is_barrier: bool = True,
+    workers: int = 1,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> list[CircuitMetrics]:
+    """
+    `compute_metrics` of many circuits, in order.
+
+    Counts come from array reductions over each circuit's IR, and the depths of a chunk
+    of circuits are scheduled together (see `_schedule_batch`). Chunks of `chunk_size`
+    circuits are spread over `workers` processes. Circuits with REPEAT blocks go through
+    `compute_metrics`. A malformed circuit raises, as in `compute_metrics`.
+    """
+    chunks = [circuit_texts[i:i + chunk_size] for i in range(0, len(circuit_texts), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_metrics_chunk, chunk, volume_gates, tick_is_barrier) for chunk in chunks]
+            return [metrics for future in futures for metrics in future.result()]
+    return [metrics for chunk in chunks for metrics in _metrics_chunk(chunk, volume_gates, tick_is_barrier)]
 
 
 def is_strictly_more_optimal(
@@ -147,7 +432,17 @@ def is_strictly_more_optimal(
         volume_gates=volume_gates,
         tick_is_barrier=tick_is_barrier,
     )
+    return compare_metrics(cand, base, volume_gates, tick_is_barrier=tick_is_barrier)
+
 
+def compare_metrics(
+    cand: CircuitMetrics,
+    base: CircuitMetrics,
+    volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
+    *,
+    tick_is_barrier: bool = True,
+) -> tuple[bool, dict]:
+    """`is_strictly_more_optimal` of already computed metrics."""
     better = (
         (cand.two_qubit_gates, cand.volume, cand.depth)
         < (base.two_qubit_gates, base.volume, base.depth)
@@ -162,28 +457,6 @@ def is_strictly_more_optimal(
         "volume_gates": sorted(volume_gates),
     }
 
-def _normalize_stim_text(text: str) -> str:
-    """
-    Makes Stim text robust to:
-    - literal "\\n" sequences inside strings
-    - leading indentation from triple-quoted strings
-    - trailing spaces / blank lines
-    """
-    if text is None:
-        return ""
-
-    # Convert literal backslash-n into actual newlines (common when circuits are stored/serialized)
-    text = text.replace("\\n", "\n")
-
-    # Normalize newlines and strip indentation/whitespace per line
-    lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if line:
-            lines.append(line)
-
-    return "\n".join(lines) + "\n"
-
 if __name__ == "__main__":
     # Example usage:
     circuit_a = """
@@ -0,0 +1,122 @@
+"""
+Long-lived pool of started Copilot clients.
+
+`prompt_agent` starts a `CopilotClient` (which spawns the Copilot CLI server) for every
+prompt and stops it afterwards. A `CopilotClientPool` starts its clients once and lends
+them out: a prompt then only creates, and afterwards destroys, its own session on a warm
+client, since the tools and system message differ from prompt to prompt.
+
+A client that has been idle for HEALTH_CHECK_INTERVAL seconds is pinged before it is lent
+out again and replaced by a fresh one if the ping fails. `close()` stops every client,
+falling back to `force_stop` for those that do not stop cleanly.
+
+Clients are bound to the event loop that started them, so a pool lives inside a single
+`asyncio.run`:
+
+    async with CopilotClientPool(size=4) as pool:
+        await prompt_agent_async(prompt, ..., client_pool=pool)
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from copilot import CopilotClient
+
+# Seconds a client may sit idle before it is pinged again when lent out.
+HEALTH_CHECK_INTERVAL = 30.0
+# Seconds to wait for a ping (and for a graceful stop) before giving up on a client.
+HEALTH_CHECK_TIMEOUT = 10.0
+
+
+class CopilotClientPool:
+    """A fixed number of started CopilotClients shared by concurrent prompts."""
+
+    def __init__(self, size: int = 1, options: dict | None = None):
+        self.size = max(1, size)
+        self.options = options or {}
+        self.startup_seconds: list[float] = []  # start-up time of every client started
+        self._idle: asyncio.Queue | None = None
+        self._clients: set[CopilotClient] = set()
+        self._closed = False
+
+    async def start(self) -> None:
+        """Start all clients concurrently. Called by `async with`; later calls do nothing."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        clients = await asyncio.gather(*(self._new_client() for _ in range(self.size)), return_exceptions=True)
+        if all(isinstance(client, BaseException) for client in clients):
+            self._idle = None
+            raise clients[0]
+        for client in clients:
+            # A client that failed to start leaves an empty slot, retried when it is borrowed
+            if isinstance(client, BaseException):
+                self._idle.put_nowait((None, 0.0))
+            else:
+                self._idle.put_nowait((client, time.monotonic()))
+
+    async def _new_client(self) -> CopilotClient:
+        start_time = time.perf_counter()
+        client = CopilotClient(options={**self.options, "auto_start": False})
+        await client.start()
+        self.startup_seconds.append(time.perf_counter() - start_time)
+        self._clients.add(client)
+        return client
+
+    async def _is_healthy(self, client: CopilotClient, idle_since: float) -> bool:
+        if client.get_state() != "connected":
+            return False
+        if time.monotonic() - idle_since < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            await asyncio.wait_for(client.ping("health check"), HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, client: CopilotClient) -> None:
+        self._clients.discard(client)
+        await self._stop(client)
+
+    @asynccontextmanager
+    async def client(self):
+        """Borrow a healthy, started client; waits while all clients are in use."""
+        if self._closed:
+            raise RuntimeError("CopilotClientPool is closed")
+        await self.start()
+        client, idle_since = await self._idle.get()
+        try:
+            # An empty slot (None) is left behind when a replacement client failed to start
+            if client is None or not await self._is_healthy(client, idle_since):
+                if client is not None:
+                    await self._discard(client)
+                client = await self._new_client()
+        except BaseException:
+            # Keep the slot so the pool stays at full size
+            self._idle.put_nowait((None, 0.0))
+            raise
+        try:
+            yield client
+        finally:
+            self._idle.put_nowait((client, time.monotonic()))
+
+    async def close(self) -> None:
+        """Stop all clients; in-flight prompts should be finished or cancelled first."""
+        self._closed = True
+        clients, self._clients = list(self._clients), set()
+        await asyncio.gather(*(self._stop(client) for client in clients))
+
+    @staticmethod
+    async def _stop(client: CopilotClient) -> None:
+        try:
+            await asyncio.wait_for(client.stop(), HEALTH_CHECK_TIMEOUT)
+        except Exception:
+            await client.force_stop()
+
+    async def __aenter__(self) -> "CopilotClientPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,133 @@
+"""
+Single-fault propagation through stim's detector-error-model machinery.
+
+The gate list is turned into a noisy stim circuit whose detectors read out the final
+Pauli frame of every qubit, and `explain_detector_error_model_errors` then reports the
+frame of every injected fault from compiled code:
+
+    1. every circuit qubit q is entangled with a reference qubit q + n (Bell pair),
+    2. the inverse of the circuit's Clifford is applied, followed by the circuit itself
+       with a DEPOLARIZE1 after every gate on its fault qubits and a TICK after every
+       gate-list entry (so a fault's tick offset is its gate index),
+    3. each Bell pair is measured; without faults all outcomes are deterministic, and a
+       final X (Z) on qubit q flips the detector on the reference (main) qubit.
+
+Measurements are dropped from the circuit, matching `stim.Tableau.from_circuit(...,
+ignore_measurement=True)`. Faults are single-qubit, so DEPOLARIZE1 is used for every
+gate (a DEPOLARIZE2 would also add correlated two-qubit faults).
+"""
+
+import numpy as np
+import stim
+
+from batch_propagation import FaultBatch
+from pauli_frame import gate_action
+
+# Any probability works; only the structure of the error model is used.
+NOISE_PROBABILITY = 0.001
+
+
+def dem_circuit(gate_list, fault_qubits) -> tuple[stim.Circuit, int]:
+    """Build the Bell-pair readout circuit described in the module docstring.
+
+    Returns: (circuit, num_qubits). Detector 2q holds the X component and detector 2q + 1
+        the Z component of the final frame on qubit q.
+    """
+    fault_qubits = set(fault_qubits)
+    num_qubits = 0
+    for _, targets in gate_list:
+        if targets:
+            num_qubits = max(num_qubits, max(targets) + 1)
+
+    first_fault = next(
+        (loc for loc, (_, targets) in enumerate(gate_list) if any(q in fault_qubits for q in targets)),
+        len(gate_list),
+    )
+    # Faults are injected after their gate, so only gates after the first fault location
+    # must have a tableau; earlier resets and classically controlled gates (rec[-k] targets,
+    # negative in the gate list) are dropped, as they cannot change any fault's frame.
+    kept = []
+    for loc, (gate_name, targets) in enumerate(gate_list):
+        kind, _ = gate_action(gate_name)
+        controlled = any(q < 0 for q in targets)
+        if loc > first_fault and kind == "invalid":
+            raise ValueError(
+                "The circuit has no well-defined tableau after the fault location "
+                f"because it contains the non-unitary operation {gate_name}."
+            )
+        if loc > first_fault and controlled:
+            raise ValueError(
+                "The circuit has no well-defined tableau after the fault location "
+                f"because it contains the classically controlled operation {gate_name}."
+            )
+        kept.append(kind == "unitary" and not controlled)
+
+    unitary = stim.Circuit()
+    for (gate_name, targets), keep in zip(gate_list, kept):
+        if keep:
+            unitary.append(gate_name, targets)
+
+    circuit = stim.Circuit()
+    qubits = list(range(num_qubits))
+    references = [q + num_qubits for q in qubits]
+    circuit.append("H", qubits)
+    circuit.append("CX", [t for q in qubits for t in (q, q + num_qubits)])
+    circuit += unitary.inverse()
+    for (gate_name, targets), keep in zip(gate_list, kept):
+        if keep:
+            circuit.append(gate_name, targets)
+        noisy = [q for q in targets if q in fault_qubits]
+        if noisy:
+            circuit.append("DEPOLARIZE1", noisy, NOISE_PROBABILITY)
+        circuit.append("TICK")
+    circuit.append("CX", [t for q in qubits for t in (q, q + num_qubits)])
+    circuit.append("H", qubits)
+    circuit.append("M", qubits + references)
+    for q in qubits:
+        circuit.append("DETECTOR", [stim.target_rec(-num_qubits + q)])
+        circuit.append("DETECTOR", [stim.target_rec(-2 * num_qubits + q)])
+    return circuit, num_qubits
+
+
+def propagate_fault_batch_dem(gate_list, fault_qubits, paulis=("X", "Z", "Y")) -> FaultBatch:
+    """Propagate all single-qubit Pauli faults of a gate list with stim's error-model analysis.
+
+    Faults are enumerated exactly like `propagate_fault_batch` and the result is identical.
+
+    Args:
+        gate_list: List of (gate_name, qubits) tuples from `parse_circuit_to_gate_list`.
+        fault_qubits: Qubits on which faults are injected.
+        paulis: Pauli types injected at every location.
+    Returns: A FaultBatch with one row per injected fault.
+    """
+    circuit, num_qubits = dem_circuit(gate_list, fault_qubits)
+    fault_qubits = set(fault_qubits)
+
+    locs, gates, qubits, fault_paulis = [], [], [], []
+    rows = {}
+    for loc, (gate_name, targets) in enumerate(gate_list):
+        for q in targets:
+            if q in fault_qubits:
+                for pauli in paulis:
+                    rows.setdefault((loc, q, pauli), []).append(len(locs))
+                    locs.append(loc)
+                    gates.append(gate_name)
+                    qubits.append(q)
+                    fault_paulis.append(pauli)
+
+    x = np.zeros((len(locs), num_qubits), dtype=bool)
+    z = np.zeros((len(locs), num_qubits), dtype=bool)
+    # Faults whose frame is the identity trigger no detector and are absent from the model.
+    explained = circuit.explain_detector_error_model_errors(reduce_to_one_representative_error=False)
+    for error in explained:
+        detectors = [term.dem_target.val for term in error.dem_error_terms if term.dem_target.is_relative_detector_id()]
+        x_cols = [d // 2 for d in detectors if d % 2 == 0]
+        z_cols = [d // 2 for d in detectors if d % 2 == 1]
+        for location in error.circuit_error_locations:
+            (target,) = location.flipped_pauli_product
+            key = (location.tick_offset, target.gate_target.value, target.gate_target.pauli_type)
+            for i in rows.get(key, ()):
+                x[i, x_cols] = True
+                z[i, z_cols] = True
+
+    return FaultBatch(locs=locs, gates=gates, qubits=qubits, paulis=fault_paulis, x=x, z=z)
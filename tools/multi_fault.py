@@ -0,0 +1,214 @@
+"""
+Fault-tolerance search over sets of up to t simultaneous single-qubit faults.
+
+A distance-d code must tolerate every combination of s <= t = (d - 1) // 2 faults, not
+only single ones. Pauli propagation through a Clifford circuit is linear over GF(2), so
+the final frame of a fault set is the XOR of the precomputed single-fault frames in a
+`FaultBatch`; no combination is ever re-simulated.
+
+Only the projection of each frame onto the qubits that matter is kept: the X and Z bits
+on the data qubits (data weight) and the X bits on the flag qubits (flag weight), packed
+into uint64 words. Faults with identical projections are merged and faults with an empty
+projection are dropped, since neither can change the outcome of a combination.
+
+The search enumerates fault sets of size 1, 2, ..., max_faults in that order and stops at
+the first violation: a set whose combined data weight exceeds t while no flag qubit ends
+with an X error. Because weight(a ^ b) <= weight(a) + weight(b), faults are visited in
+order of decreasing data weight and every branch whose weight bound cannot exceed t is
+cut. The last fault of a set is handled with one array operation over all candidates.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import multiprocessing
+
+import numpy as np
+
+from batch_propagation import FaultBatch
+
+# Number of tasks per worker process; more tasks balance better and cancel sooner.
+TASKS_PER_WORKER = 8
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """Pack a (rows, columns) bool array into (rows, words) uint64 words."""
+    num_rows, num_columns = bits.shape
+    words = max((num_columns + 63) // 64, 1)
+    padded = np.zeros((num_rows, words * 64), dtype=bool)
+    padded[:, :num_columns] = bits
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8")
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Number of set bits along the last axis of a uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+class FaultSpace:
+    """Distinct data/flag projections of the single faults of a batch, heaviest first."""
+
+    def __init__(self, batch: FaultBatch, data_qubits, flag_qubits):
+        data_cols = batch._columns(data_qubits)
+        flag_cols = batch._columns(flag_qubits)
+        xd = _pack(batch.x[:, data_cols])
+        zd = _pack(batch.z[:, data_cols])
+        xf = _pack(batch.x[:, flag_cols])
+        packed = np.concatenate([xd, zd, xf], axis=1)
+
+        nonzero = np.flatnonzero(packed.any(axis=1))
+        unique, first = np.unique(packed[nonzero], axis=0, return_index=True)
+        weights = _popcount(unique[:, :xd.shape[1]] | unique[:, xd.shape[1]:2 * xd.shape[1]])
+        order = np.argsort(-weights, kind="stable")
+
+        self.words = xd.shape[1]
+        self.rows = np.ascontiguousarray(unique[order])
+        self.weights = weights[order]
+        # Index into the batch of one fault with each projection.
+        self.representatives = nonzero[first[order]]
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def data_weight(self, rows: np.ndarray) -> np.ndarray:
+        return _popcount(rows[..., :self.words] | rows[..., self.words:2 * self.words])
+
+    def flag_weight(self, rows: np.ndarray) -> np.ndarray:
+        return _popcount(rows[..., 2 * self.words:])
+
+    def search(self, size: int, threshold: int, first_indices=None, stop=None):
+        """Find a set of `size` distinct faults whose combination violates fault tolerance.
+
+        Args:
+            size: Number of faults in the set.
+            threshold: Largest tolerated data weight, t = (d - 1) // 2.
+            first_indices: Restrict the heaviest fault of the set to these indices (used to
+                split the search between processes); all indices by default.
+            stop: Optional event; the search gives up (returning None) once it is set.
+        Returns: Sorted tuple of indices into this space, or None if no violation exists.
+        """
+        if first_indices is None:
+            first_indices = range(len(self))
+        # Faults with weight > w are exactly the first `cuts[w]` rows.
+        cuts = np.searchsorted(-self.weights, -np.arange(threshold + 1), side="left")
+        for i in first_indices:
+            if stop is not None and stop.is_set():
+                return None
+            if size * int(self.weights[i]) <= threshold:
+                break
+            found = self._extend((int(i),), self.rows[i].copy(), size - 1, threshold, cuts)
+            if found is not None:
+                return found
+        return None
+
+    def _extend(self, chosen: tuple, acc: np.ndarray, remaining: int, threshold: int, cuts: np.ndarray):
+        acc_weight = int(self.data_weight(acc))
+        start = chosen[-1] + 1
+        if remaining == 0:
+            if acc_weight > threshold and int(self.flag_weight(acc)) == 0:
+                return chosen
+            return None
+        if remaining == 1:
+            # Only faults heavier than threshold - acc_weight can push the set over t.
+            needed = threshold - acc_weight
+            end = len(self) if needed < 0 else int(cuts[needed])
+            if end <= start:
+                return None
+            combined = self.rows[start:end] ^ acc
+            bad = np.flatnonzero((self.data_weight(combined) > threshold) & (self.flag_weight(combined) == 0))
+            if len(bad):
+                return chosen + (start + int(bad[0]),)
+            return None
+        for j in range(start, len(self)):
+            if acc_weight + remaining * int(self.weights[j]) <= threshold:
+                break
+            found = self._extend(chosen + (j,), acc ^ self.rows[j], remaining - 1, threshold, cuts)
+            if found is not None:
+                return found
+        return None
+
+
+_worker_space = None
+_worker_stop = None
+
+
+def _init_worker(rows, weights, words, stop):
+    global _worker_space, _worker_stop
+    space = FaultSpace.__new__(FaultSpace)
+    space.rows, space.weights, space.words = rows, weights, words
+    space.representatives = None
+    _worker_space, _worker_stop = space, stop
+
+
+def _search_task(size, threshold, offset, stride):
+    indices = range(offset, len(_worker_space), stride)
+    found = _worker_space.search(size, threshold, indices, _worker_stop)
+    if found is not None:
+        _worker_stop.set()
+    return found
+
+
+def _parallel_search(space: FaultSpace, size: int, threshold: int, workers: int):
+    num_tasks = workers * TASKS_PER_WORKER
+    stop = multiprocessing.Event()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(space.rows, space.weights, space.words, stop)) as pool:
+        # Strided index sets give every task a similar mix of heavy and light faults.
+        pending = {pool.submit(_search_task, size, threshold, offset, num_tasks) for offset in range(num_tasks)}
+        found = None
+        while pending and found is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.result() is not None:
+                    found = future.result()
+                    break
+        for future in pending:
+            future.cancel()
+    return found
+
+
+def find_multi_fault_violation(batch: FaultBatch, data_qubits, flag_qubits, d: int = 3,
+                               max_faults: int | None = None, workers: int = 1) -> dict | None:
+    """Search all sets of up to `max_faults` faults of a batch for an undetected high-weight error.
+
+    Args:
+        batch: Single-fault propagation table, see `check_error_propagation.fault_batch`.
+        data_qubits: Qubits whose errors count towards the data weight.
+        flag_qubits: Qubits whose X errors flag the fault set.
+        d: Code distance; combinations with data weight above (d - 1) // 2 must be flagged.
+        max_faults: Largest fault set considered, (d - 1) // 2 by default (at least 1).
+        workers: Number of processes used for sets of two or more faults.
+    Returns: None if every considered fault set is tolerated, otherwise the first (smallest)
+        violating set as a dictionary:
+            - faults: List of {"loc", "gate", "fault_qubit", "fault_pauli"} dictionaries.
+            - data_weight: Data weight of the combined error.
+            - flag_weight: Number of flag qubits with an X error (always 0).
+    """
+    threshold = (d - 1) // 2
+    if max_faults is None:
+        max_faults = max(threshold, 1)
+    space = FaultSpace(batch, data_qubits, flag_qubits)
+    for size in range(1, min(max_faults, len(space)) + 1):
+        if size == 1 or workers <= 1:
+            found = space.search(size, threshold)
+        else:
+            found = _parallel_search(space, size, threshold, workers)
+        if found is None:
+            continue
+        combined = np.bitwise_xor.reduce(space.rows[list(found)], axis=0)
+        faults = []
+        for index in found:
+            i = int(space.representatives[index])
+            faults.append({
+                "loc": batch.locs[i],
+                "gate": batch.gates[i],
+                "fault_qubit": batch.qubits[i],
+                "fault_pauli": batch.paulis[i],
+            })
+        faults.sort(key=lambda f: f["loc"])
+        return {
+            "faults": faults,
+            "data_weight": int(space.data_weight(combined)),
+            "flag_weight": int(space.flag_weight(combined)),
+        }
+    return None
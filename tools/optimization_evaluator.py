@@ -0,0 +1,133 @@
+"""
+Evaluation of the optimization candidates of one B2 record.
+
+Every `evaluate_optimization` and `final_circuit` call of a B2 session used to run
+`check_stabilizers` and `is_strictly_more_optimal` on the candidate text: the baseline's
+metrics were recomputed from its text on every call, and the two checks each went
+through the candidate text on their own. An `OptimizationEvaluator` is created once per
+record and pins
+
+    - the baseline metrics (computed once, or the dataset's baseline columns),
+    - the stabilizer targets with their X/Z bit matrices (`StabilizerTargets`),
+
+so `compute` ingests a candidate once, simulates it once and takes its metrics from the
+same parse. Agents usually evaluate a circuit again when they submit it, so `evaluate`
+keeps the results of measurement-free candidates, whose stabilizer check is
+deterministic, by normalized text. `compute` only reads the pinned state, so it can
+run in worker processes; `lookup` and `store` keep the results in the session's process.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from check_stabilizers import StabilizerTargets, is_unitary_circuit
+from circuit_ingest import ingest_circuit, normalize_stim_text
+from circuit_metric import DEFAULT_VOLUME_GATES, CircuitMetrics, compare_metrics, ingested_metrics
+
+# Evaluations kept per evaluator.
+EVALUATION_CACHE_SIZE = 256
+
+
+class CandidateParseError(ValueError):
+    """The candidate text is not a valid Stim circuit."""
+
+
+@dataclass(frozen=True)
+class Evaluation:
+    preserved: dict[str, bool]  # per target stabilizer
+    better: bool
+    info: dict  # see `circuit_metric.compare_metrics`
+    deterministic: bool  # measurement-free, so the result can be reused
+    seconds: float  # time spent in `compute`
+
+
+class OptimizationEvaluator:
+    """Stabilizer check and comparison with a pinned baseline, for the candidates of one record."""
+
+    def __init__(
+        self,
+        stabilizers: list[str],
+        baseline_text: str,
+        baseline_metrics: CircuitMetrics | dict | None = None,
+        volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
+        *,
+        tick_is_barrier: bool = True,
+    ):
+        """
+        Args:
+            stabilizers: Target stabilizers every candidate must preserve
+            baseline_text: The circuit candidates are compared with
+            baseline_metrics: Its metrics when already known (e.g. the dataset's baseline
+                columns), as CircuitMetrics or `as_dict()`; computed from baseline_text otherwise
+            volume_gates, tick_is_barrier: As in `compute_metrics`
+        """
+        self.targets = StabilizerTargets(stabilizers)
+        self.volume_gates = volume_gates
+        self.tick_is_barrier = tick_is_barrier
+        if baseline_metrics is None:
+            baseline_metrics = ingested_metrics(
+                ingest_circuit(baseline_text), volume_gates, tick_is_barrier=tick_is_barrier
+            )
+        elif isinstance(baseline_metrics, dict):
+            baseline_metrics = CircuitMetrics(**baseline_metrics)
+        self.baseline = baseline_metrics
+        self._results: "OrderedDict[str, Evaluation]" = OrderedDict()
+
+    def __getstate__(self) -> dict:
+        # Worker processes only run `compute`; the kept results stay in the session's process
+        state = self.__dict__.copy()
+        state["_results"] = OrderedDict()
+        return state
+
+    def compute(self, candidate: str) -> Evaluation:
+        """
+        Evaluate a candidate circuit text.
+
+        Raises:
+            CandidateParseError: If the text does not parse.
+        """
+        start = time.perf_counter()
+        try:
+            ingested = ingest_circuit(candidate)
+        except Exception as e:
+            raise CandidateParseError(str(e)) from e
+        preserved = self.targets.check(ingested)
+        metrics = ingested_metrics(ingested, self.volume_gates, tick_is_barrier=self.tick_is_barrier)
+        better, info = compare_metrics(metrics, self.baseline, self.volume_gates, tick_is_barrier=self.tick_is_barrier)
+        return Evaluation(
+            preserved=preserved,
+            better=better,
+            info=info,
+            deterministic=is_unitary_circuit(ingested.circuit),
+            seconds=time.perf_counter() - start,
+        )
+
+    @staticmethod
+    def _key(candidate: str) -> str:
+        return hashlib.sha256(normalize_stim_text(candidate).encode()).hexdigest()
+
+    def lookup(self, candidate: str) -> Evaluation | None:
+        """The kept evaluation of the candidate, or None."""
+        key = self._key(candidate)
+        evaluation = self._results.get(key)
+        if evaluation is not None:
+            self._results.move_to_end(key)
+        return evaluation
+
+    def store(self, candidate: str, evaluation: Evaluation) -> None:
+        """Keep the evaluation of a candidate if it is deterministic."""
+        if not evaluation.deterministic:
+            return
+        self._results[self._key(candidate)] = evaluation
+        while len(self._results) > EVALUATION_CACHE_SIZE:
+            self._results.popitem(last=False)
+
+    def evaluate(self, candidate: str) -> Evaluation:
+        """`compute` in this process, through the kept results."""
+        evaluation = self.lookup(candidate)
+        if evaluation is None:
+            evaluation = self.compute(candidate)
+            self.store(candidate, evaluation)
+        return evaluation
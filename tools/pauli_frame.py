@@ -0,0 +1,157 @@
+"""
+Single-pass backward Pauli-frame propagation.
+
+Instead of rebuilding a suffix circuit and tableau for every injected fault,
+this module walks a gate list (as produced by `parse_circuit_to_gate_list`)
+backwards exactly once. It keeps the cumulative suffix Clifford as the images
+of every X_q and Z_q, each stored as a pair of bit-packed Python ints
+(x bits, z bits). A fault injected after gate `i` is then answered by a lookup
+into the images of the suffix that starts at gate `i + 1`.
+
+Signs are not tracked: only the support of the propagated Pauli matters for
+the weight-based fault-tolerance checks.
+"""
+
+from functools import lru_cache
+
+import stim
+
+
+@lru_cache(maxsize=None)
+def gate_action(name: str) -> tuple[str, tuple]:
+    """Classify a gate and, for Cliffords, return the images of its input generators.
+
+    Returns:
+        ("unitary", images) where images[j] = (x_image, z_image) for local qubit j and
+            each image is a tuple of (local_qubit, has_x, has_z) components,
+        ("identity", ()) for measurements and annotations (measurements are ignored,
+            matching `stim.Tableau.from_circuit(..., ignore_measurement=True)`),
+        ("invalid", ()) for resets and noise, which have no well-defined tableau.
+    """
+    data = stim.gate_data(name)
+    if data.is_unitary:
+        try:
+            tableau = data.tableau
+        except (IndexError, ValueError):
+            # Pauli-product rotations (SPP, ...) have no fixed 1q/2q tableau.
+            return "invalid", ()
+        images = []
+        for j in range(len(tableau)):
+            pair = []
+            for out in (tableau.x_output(j), tableau.z_output(j)):
+                pair.append(tuple(
+                    (m, out[m] in (1, 2), out[m] in (2, 3))
+                    for m in range(len(out)) if out[m]
+                ))
+            images.append(tuple(pair))
+        return "unitary", tuple(images)
+    if data.is_reset:
+        return "invalid", ()
+    if data.produces_measurements:
+        return "identity", ()
+    if data.is_noisy_gate:
+        return "invalid", ()
+    return "identity", ()
+
+
+class SuffixFrame:
+    """Images of X_q and Z_q under the Clifford of a gate-list suffix, packed as ints."""
+
+    def __init__(self, num_qubits: int):
+        self.num_qubits = num_qubits
+        # xs[q] = (x bits, z bits) of the image of X_q; zs[q] likewise for Z_q.
+        self.xs = [(1 << q, 0) for q in range(num_qubits)]
+        self.zs = [(0, 1 << q) for q in range(num_qubits)]
+        # Name of the first non-unitary operation folded into the suffix, if any.
+        self.invalid_gate = None
+
+    def image(self, pauli: str, qubit: int) -> tuple[int, int]:
+        """Return the (x bits, z bits) image of a single-qubit Pauli under the suffix."""
+        if self.invalid_gate is not None:
+            raise ValueError(
+                "The circuit has no well-defined tableau after the fault location "
+                f"because it contains the non-unitary operation {self.invalid_gate}."
+            )
+        if pauli == "X":
+            return self.xs[qubit]
+        if pauli == "Z":
+            return self.zs[qubit]
+        if pauli == "Y":
+            (ax, az), (bx, bz) = self.xs[qubit], self.zs[qubit]
+            return ax ^ bx, az ^ bz
+        raise ValueError(pauli)
+
+    def _conjugate(self, components, targets) -> tuple[int, int]:
+        x = z = 0
+        for m, has_x, has_z in components:
+            q = targets[m]
+            if has_x:
+                x ^= self.xs[q][0]
+                z ^= self.xs[q][1]
+            if has_z:
+                x ^= self.zs[q][0]
+                z ^= self.zs[q][1]
+        return x, z
+
+    def prepend(self, gate_name: str, targets: list[int]) -> None:
+        """Extend the suffix to start one gate earlier (suffix := suffix o gate)."""
+        kind, images = gate_action(gate_name)
+        if kind == "identity":
+            return
+        if kind == "invalid":
+            self.invalid_gate = gate_name
+            return
+
+        arity = len(images)
+        groups = [targets[i:i + arity] for i in range(0, len(targets), arity)]
+        # The last group in an instruction acts last, so it is folded in first.
+        for group in reversed(groups):
+            new_xs = []
+            new_zs = []
+            for x_image, z_image in images:
+                new_xs.append(self._conjugate(x_image, group))
+                new_zs.append(self._conjugate(z_image, group))
+            for q, x_img, z_img in zip(group, new_xs, new_zs):
+                self.xs[q] = x_img
+                self.zs[q] = z_img
+
+
+def propagate_all_faults(gate_list, fault_qubits, paulis=("X", "Z", "Y")) -> list[tuple]:
+    """Propagate every single-qubit Pauli fault of a gate list in one backward pass.
+
+    A fault is injected AFTER each gate on each of its qubits that is in `fault_qubits`,
+    mirroring the enumeration order of `check_error_propagation`.
+
+    Args:
+        gate_list: List of (gate_name, qubits) tuples from `parse_circuit_to_gate_list`.
+        fault_qubits: Qubits on which faults are injected.
+        paulis: Pauli types injected at every location.
+    Returns: List of (loc, gate_name, qubit, pauli, x_bits, z_bits) tuples in forward order,
+        where x_bits / z_bits are ints whose bit q is set when the propagated fault has an
+        X / Z component on qubit q.
+    """
+    fault_qubits = set(fault_qubits)
+    num_qubits = 0
+    for _, targets in gate_list:
+        if targets:
+            num_qubits = max(num_qubits, max(targets) + 1)
+
+    frame = SuffixFrame(num_qubits)
+    per_location = []
+    for loc in range(len(gate_list) - 1, -1, -1):
+        gate_name, targets = gate_list[loc]
+        # `frame` currently holds the suffix that starts right after gate `loc`.
+        faults = []
+        for q in targets:
+            if q not in fault_qubits:
+                continue
+            for pauli in paulis:
+                x_bits, z_bits = frame.image(pauli, q)
+                faults.append((loc, gate_name, q, pauli, x_bits, z_bits))
+        per_location.append(faults)
+        frame.prepend(gate_name, targets)
+
+    results = []
+    for faults in reversed(per_location):
+        results.extend(faults)
+    return results
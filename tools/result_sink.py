@@ -0,0 +1,195 @@
+"""
+Append-only JSONL sink for the results of the B1/B2/B3 runners.
+
+The runners used to re-dump their whole, growing `{"metadata", "results"}` JSON after every
+record, so the total write I/O of a run grew quadratically (B3 results carry every
+candidate circuit). A `ResultSink` appends one line per finished record instead and
+fsyncs it, so a crash loses at most the record being written. `finalize` then writes the
+legacy JSON file the analysis scripts read; `jsonl_to_json` does the same for the JSONL
+file of a run that crashed:
+
+    python tools/result_sink.py data/<model>/<timestamp>.jsonl
+
+The JSONL file sits next to the JSON output (same name, `.jsonl` suffix). Its first line
+is `{"metadata": {...}}`, every other line `{"index": i, "result": {...}}`, where i is the
+position of the record in the runner's input. Concurrent runners finish records out of
+order, and the results are sorted back by index; if an index appears more than once,
+the last line wins.
+
+`load_resume` maps the results of an earlier, interrupted run back to input positions
+so a runner started with `--resume` only processes the remaining records.
+"""
+
+import argparse
+import json
+import os
+from collections import defaultdict, deque
+from datetime import datetime
+
+
+def jsonl_path_for(output_path: str) -> str:
+    """Path of the JSONL file streamed next to the JSON output file."""
+    root, _ = os.path.splitext(output_path)
+    return root + ".jsonl"
+
+
+def read_jsonl_results(jsonl_path: str) -> tuple[dict, dict[int, dict]]:
+    """
+    Read a result JSONL file.
+
+    A truncated last line (from a crash while writing it) is ignored.
+
+    Returns:
+        (metadata, results) where results maps each record index to its result.
+    """
+    metadata = {}
+    results = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "metadata" in record:
+                metadata = record["metadata"]
+            else:
+                results[record["index"]] = record["result"]
+    return metadata, results
+
+
+def jsonl_to_json(jsonl_path: str, output_path: str | None = None, metadata: dict | None = None) -> list[dict]:
+    """
+    Write the legacy {"metadata", "results"} JSON for a result JSONL file.
+
+    Args:
+        jsonl_path: The JSONL file written by a ResultSink
+        output_path: JSON file to write (default: jsonl_path with a .json suffix)
+        metadata: Metadata to write instead of the one stored in the JSONL file
+
+    Returns:
+        The results, in record order
+    """
+    if output_path is None:
+        output_path = os.path.splitext(jsonl_path)[0] + ".json"
+    stored_metadata, by_index = read_jsonl_results(jsonl_path)
+    results = [by_index[i] for i in sorted(by_index)]
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata if metadata is not None else stored_metadata, "results": results}, f, indent=2)
+    return results
+
+
+def load_resume(path: str, record_names: list[str | None]) -> tuple[dict, dict[int, dict]]:
+    """
+    Index the results of an earlier run of the same input for resuming it.
+
+    Args:
+        path: The earlier run's JSON or JSONL output. For a JSON path whose JSONL file
+            still exists, the JSONL file is read, since it is written first.
+        record_names: The code_name of the result of every input record, by position
+            (None for records that produce no result).
+
+    Returns:
+        (metadata, completed): the earlier run's metadata and its results by input position.
+        JSONL lines carry their position; results of a JSON file are matched to the input
+        by code_name, the k-th result named c going to the k-th record named c.
+    """
+    jsonl_path = path if path.endswith(".jsonl") else jsonl_path_for(path)
+    if os.path.exists(jsonl_path):
+        metadata, by_index = read_jsonl_results(jsonl_path)
+        completed = {
+            i: result for i, result in by_index.items()
+            if 0 <= i < len(record_names) and record_names[i] == result.get("code_name")
+        }
+        return metadata, completed
+
+    with open(path, "r", encoding="utf-8") as f:
+        output = json.load(f)
+    positions = defaultdict(deque)
+    for i, name in enumerate(record_names):
+        if name is not None:
+            positions[name].append(i)
+    completed = {}
+    for result in output.get("results", []):
+        queue = positions.get(result.get("code_name"))
+        if queue:
+            completed[queue.popleft()] = result
+    return output.get("metadata", {}), completed
+
+
+def resume_info(path: str, previous_metadata: dict, completed: dict[int, dict]) -> dict:
+    """The "resumed" metadata entry of a run continuing the output at `path`."""
+    return {
+        "from": path,
+        "completed_records": len(completed),
+        "previous_started_at": previous_metadata.get("started_at"),
+        "previous_resumed": previous_metadata.get("resumed"),
+        "resumed_at": datetime.now().isoformat(),
+    }
+
+
+def resumed_output_path(path: str) -> str:
+    """The JSON output a run resumed from `path` (JSON or JSONL) continues writing."""
+    return os.path.splitext(path)[0] + ".json"
+
+
+class ResultSink:
+    """Streams one result per record to `<output_path without suffix>.jsonl`."""
+
+    def __init__(self, output_path: str, metadata: dict, completed: dict[int, dict] | None = None):
+        """
+        Args:
+            output_path: The JSON output; the JSONL file is created (or replaced) next to it.
+            metadata: Metadata line of the JSONL file.
+            completed: Results carried over from a resumed run, by input position.
+        """
+        self.output_path = output_path
+        self.jsonl_path = jsonl_path_for(output_path)
+        # Written aside and moved into place, so resuming into the same file never loses
+        # the results carried over
+        staging_path = self.jsonl_path + ".tmp"
+        with open(staging_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"metadata": metadata}) + "\n")
+            for index in sorted(completed or {}):
+                f.write(json.dumps({"index": index, "result": completed[index]}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging_path, self.jsonl_path)
+        self._file = open(self.jsonl_path, "a", encoding="utf-8")
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, index: int, result: dict) -> None:
+        """Append and fsync the result of the record at position `index` of the input."""
+        self._write({"index": index, "result": result})
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def finalize(self, metadata: dict | None = None) -> list[dict]:
+        """Close the sink and write the legacy JSON output; see `jsonl_to_json`."""
+        self.close()
+        return jsonl_to_json(self.jsonl_path, self.output_path, metadata)
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# To convert the JSONL file of an interrupted run, use the following command line format:
+# python tools/result_sink.py data/<model>/<timestamp>.jsonl [--output data/<model>/<timestamp>.json]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the {metadata, results} JSON of a runner's result JSONL file"
+    )
+    parser.add_argument("jsonl", help="Path to the result JSONL file")
+    parser.add_argument("--output", default=None, help="Path to the JSON file (default: same name, .json)")
+    args = parser.parse_args()
+
+    results = jsonl_to_json(args.jsonl, args.output)
+    print(f"{len(results)} results written to {args.output or os.path.splitext(args.jsonl)[0] + '.json'}")
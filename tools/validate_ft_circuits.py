@@ -19,6 +19,9 @@ from typing import List, Dict, Tuple, Set, Optional, Union, Any
 from dataclasses import dataclass
 import itertools
 
+from circuit_ir import DATA, FLAG, CircuitIR
+from pauli_frame import gate_action
+
 
 @dataclass
 class FaultLocation:
@@ -104,35 +107,83 @@ class FaultToleranceChecker:
         
         self.fault_locations: List[FaultLocation] = []
         self.error_propagations: List[ErrorPropagation] = []
+
+        # Array form of the circuit with REPEAT blocks expanded, built once (see `ir`).
+        self._ir: Optional[CircuitIR] = None
+        # (step, gate_type, qubit) -> index of the first matching flattened instruction.
+        self._location_index: Optional[Dict[Tuple[int, str, int], int]] = None
+        # Instruction index -> {qubit: (X, Y, Z) images under the suffix after that
+        # instruction}, or None when the suffix has no well-defined tableau.
+        self._suffix_images: Optional[Dict[int, Optional[Dict[int, Tuple[stim.PauliString, ...]]]]] = None
     
-    def _flatten_circuit(self, circuit: stim.Circuit) -> List:
+    @property
+    def ir(self) -> CircuitIR:
+        """The circuit as a `CircuitIR` (REPEAT blocks expanded), built only once per checker."""
+        if self._ir is None:
+            self._ir = CircuitIR.from_circuit(self.circuit)
+        return self._ir
+
+    def _build_location_index(self) -> Dict[Tuple[int, str, int], int]:
         """
-        Flatten a circuit by expanding REPEAT blocks into individual instructions.
-        
-        Args:
-            circuit: Stim circuit that may contain REPEAT blocks
-            
-        Returns:
-            List of individual instructions
+        Map (step, gate_type, qubit) to the first flattened instruction at that TICK step
+        with that name acting on that qubit, i.e. the instruction a fault location refers to.
         """
-        instructions = []
-        
-        for item in circuit:
-            # Check if it's a REPEAT block by trying to access its attributes
-            try:
-                # CircuitRepeatBlock has these attributes
-                repeat_count = item.repeat_count  # type: ignore
-                body = item.body_copy()  # type: ignore
-                
-                # Recursively flatten the body and repeat it
-                body_instructions = self._flatten_circuit(body)
-                for _ in range(repeat_count):
-                    instructions.extend(body_instructions)
-            except AttributeError:
-                # It's a regular instruction (CircuitInstruction)
-                instructions.append(item)
-        
-        return instructions
+        if self._location_index is None:
+            index = {}
+            step = 0
+            ir = self.ir
+            for idx, name in enumerate(ir.names):
+                if name == 'TICK':
+                    step += 1
+                    continue
+                for qubit in ir.instruction_qubits(idx).tolist():
+                    index.setdefault((step, name, qubit), idx)
+            self._location_index = index
+        return self._location_index
+
+    def _build_suffix_images(self) -> Dict[int, Optional[Dict[int, Tuple[stim.PauliString, ...]]]]:
+        """
+        Walk the flattened circuit backwards once, prepending each instruction to a running
+        tableau, and record the images of X/Y/Z on every targeted qubit of every fault
+        instruction under the suffix that follows it.
+        """
+        if self._suffix_images is None:
+            needed: Dict[int, Set[int]] = {}
+            for (_, _, qubit), idx in self._build_location_index().items():
+                needed.setdefault(idx, set()).add(qubit)
+
+            ir = self.ir
+            tableau = stim.Tableau(self.num_qubits)
+            well_defined = True
+            images: Dict[int, Optional[Dict[int, Tuple[stim.PauliString, ...]]]] = {}
+            for idx in range(len(ir) - 1, -1, -1):
+                if idx in needed:
+                    if well_defined:
+                        images[idx] = {
+                            q: (tableau.x_output(q), tableau.y_output(q), tableau.z_output(q))
+                            for q in needed[idx]
+                        }
+                    else:
+                        images[idx] = None
+                if not well_defined:
+                    continue
+
+                name = ir.names[idx]
+                kind, gate_images = gate_action(name)
+                if kind == 'identity':
+                    continue
+                if kind == 'invalid' or not ir.only_qubit_targets(idx):
+                    # Resets, noise and classically controlled gates: stim cannot build a
+                    # tableau for any suffix containing them.
+                    well_defined = False
+                    continue
+                gate = stim.Tableau.from_named_gate(name)
+                arity = len(gate_images)
+                qubits = ir.instruction_qubits(idx).tolist()
+                for i in range(len(qubits) - arity, -1, -arity):
+                    tableau.prepend(gate, qubits[i:i + arity])
+            self._suffix_images = images
+        return self._suffix_images
         
     def enumerate_fault_locations(self) -> List[FaultLocation]:
         """
@@ -144,24 +195,17 @@ class FaultToleranceChecker:
         locations = []
         step = 0
         
-        # Flatten the circuit to handle REPEAT blocks
-        flattened_instructions = self._flatten_circuit(self.circuit)
+        # The IR has REPEAT blocks expanded
+        ir = self.ir
         
-        for instruction in flattened_instructions:
-            instruction_name = instruction.name
-            
+        for idx, instruction_name in enumerate(ir.names):
             # Handle TICK - just increment step counter
             if instruction_name == 'TICK':
                 step += 1
                 continue
             
-            targets = instruction.targets_copy()
-            
-            # Extract qubit indices from targets
-            qubit_indices = []
-            for target in targets:
-                if target.is_qubit_target:
-                    qubit_indices.append(target.value)
+            # Qubit indices of the targets
+            qubit_indices = ir.instruction_qubits(idx).tolist()
             
             if not qubit_indices:
                 continue
@@ -216,6 +260,7 @@ class FaultToleranceChecker:
                     ))
                 
         self.fault_locations = locations
+        self._build_location_index()
         return locations
     
     def inject_and_propagate_error(self, location: FaultLocation, 
@@ -223,8 +268,9 @@ class FaultToleranceChecker:
         """
         Inject a Pauli error at a specific location and propagate through circuit.
         
-        Strategy: Build the full circuit, tracking where to inject the error,
-        then use Stim's tableau to propagate the error through.
+        Strategy: Look up the instruction the location refers to in the table built
+        alongside `enumerate_fault_locations`, then read the image of the error under
+        the suffix after that instruction from a single backward pass over the circuit.
         
         Args:
             location: Where to inject the error
@@ -233,65 +279,25 @@ class FaultToleranceChecker:
         Returns:
             Final Pauli string after propagation
         """
-        # Flatten the circuit to handle REPEAT blocks
-        flattened_instructions = self._flatten_circuit(self.circuit)
-        
-        # Build a list of all instructions with their positions
-        instructions_list = []
-        current_step = 0
-        
-        for instruction in flattened_instructions:
-            if instruction.name == 'TICK':
-                current_step += 1
-                instructions_list.append((current_step - 1, instruction))
-            else:
-                instructions_list.append((current_step, instruction))
-        
-        # Find the index of the fault instruction
-        fault_index = None
-        for idx, (step, instr) in enumerate(instructions_list):
-            if instr.name == 'TICK':
-                continue
-            
-            targets = instr.targets_copy()
-            qubits = [t.value for t in targets if t.is_qubit_target]
-            
-            if (step == location.step and 
-                location.qubit in qubits and 
-                instr.name == location.gate_type):
-                fault_index = idx
-                break
+        fault_index = self._build_location_index().get(
+            (location.step, location.gate_type, location.qubit))
         
         if fault_index is None:
             # Couldn't find fault location, return identity
             return stim.PauliString('I' * self.num_qubits)
         
-        # Build circuit_after: everything AFTER the fault instruction
-        # The error occurs AFTER the fault gate executes
-        circuit_after = stim.Circuit()
-        for idx, (step, instr) in enumerate(instructions_list):
-            if idx > fault_index:  # Exclude the fault instruction itself
-                circuit_after.append(instr)
-        
         # Create initial Pauli string (error at the injection location)
         pauli_list = ['I'] * self.num_qubits
         pauli_list[location.qubit] = pauli_type
         initial_error = stim.PauliString(''.join(pauli_list))
         
-        # Propagate through circuit_after
-        if len(circuit_after) == 0:
-            # No gates after fault, error doesn't propagate
+        images = self._build_suffix_images()[fault_index]
+        if images is None:
+            # The rest of the circuit has no tableau (e.g. resets), error doesn't propagate
             return initial_error
         
-        try:
-            # Try with ignore_measurement for circuits with measurements
-            tableau = stim.Tableau.from_circuit(circuit_after, ignore_measurement=True)
-            final_error = tableau(initial_error)
-        except Exception as e:
-            # If that fails, the error doesn't propagate (return as-is)
-            final_error = initial_error
-        
-        return final_error
+        x_image, y_image, z_image = images[location.qubit]
+        return {'X': x_image, 'Y': y_image, 'Z': z_image}[pauli_type]
     
     def analyze_error_propagation(self, pauli_types: List[str] = ['X', 'Z']) -> List[ErrorPropagation]:
         """
@@ -307,6 +313,7 @@ class FaultToleranceChecker:
             self.enumerate_fault_locations()
         
         propagations = []
+        roles = self.ir.role_mask(self.data_qubits, self.flag_qubits)
         
         for location in self.fault_locations:
             for pauli in pauli_types:
@@ -314,18 +321,14 @@ class FaultToleranceChecker:
                     final_pauli = self.inject_and_propagate_error(location, pauli)
                     
                     # Count weight (non-identity Paulis) on data qubits only
-                    affected_data_qubits = set()
-                    for q in range(self.num_qubits):
-                        if q in self.data_qubits and final_pauli[q] != 0:  # 0 = I
-                            affected_data_qubits.add(q)
+                    support = np.asarray(final_pauli.pauli_indices(), dtype=np.intp)
+                    support_roles = roles[support]
+                    affected_data_qubits = set(support[(support_roles & DATA) != 0].tolist())
                     
                     weight_on_data = len(affected_data_qubits)
                     
                     # Track which flag qubits are affected
-                    flags_triggered = set()
-                    for q in range(self.num_qubits):
-                        if q in self.flag_qubits and final_pauli[q] != 0:
-                            flags_triggered.add(q)
+                    flags_triggered = set(support[(support_roles & FLAG) != 0].tolist())
                     
                     propagation = ErrorPropagation(
                         initial_location=location,
@@ -0,0 +1,209 @@
+"""
+Content-addressed on-disk cache of verification results, shared across runs and processes.
+
+The same circuits are checked again and again: every B3 run re-scores the original
+dataset circuits, and re-processing outcome files re-checks every stored candidate. The
+`cached_*` functions below look results up in an SQLite database before computing them.
+The key hashes the kind of result, the checker version and every input:
+
+    sha256([kind, version, sha256(normalized circuit), stabilizers / qubits / d / ...])
+
+Normalized circuit text is hashed without parsing it, so a hit costs no Stim parse.
+`check_stabilizers` results are only stored for measurement-free circuits, whose outcome
+is deterministic (see `check_stabilizers.is_unitary_circuit`).
+
+CHECKER_VERSIONS holds one version per kind of result: bump it whenever the logic behind
+that result changes. Keys of other versions never match, and their rows are deleted when
+the database is opened. The database keeps at most MAX_ENTRIES rows, dropping the least
+recently used ones.
+
+The database is data/verification_cache.sqlite by default; the VERIFICATION_CACHE
+environment variable sets another path, or disables the cache when set to "off".
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from check_error_propagation import analyze_propagation
+from check_stabilizers import check_stabilizers, check_stabilizers_batch, is_unitary_circuit
+from circuit_ingest import ingest_circuit, normalize_stim_text
+from circuit_metric import DEFAULT_VOLUME_GATES, CircuitMetrics, compute_metrics
+
+CHECKER_VERSIONS = {
+    "check_stabilizers": 1,
+    "ft_check": 1,
+    "compute_metrics": 1,
+}
+MAX_ENTRIES = 500_000
+# Rows written between two checks of the size bound.
+EVICTION_CHECK_INTERVAL = 1000
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / "data" / "verification_cache.sqlite"
+
+
+class VerificationCache:
+    """An SQLite table from content keys to JSON-encoded results."""
+
+    def __init__(self, path: str | Path, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Worker processes of the runners share the file, hence WAL and a generous timeout
+        self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, version INTEGER NOT NULL, "
+            "value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._writes = 0
+        self._drop_stale_versions()
+
+    def _drop_stale_versions(self) -> None:
+        kinds = [kind for (kind,) in self._db.execute("SELECT DISTINCT kind FROM entries")]
+        for kind in kinds:
+            self._db.execute(
+                "DELETE FROM entries WHERE kind = ? AND version != ?", (kind, CHECKER_VERSIONS.get(kind, -1))
+            )
+
+    @staticmethod
+    def key(kind: str, circuit: str, *parts) -> str:
+        """Content key of a `kind` result for the circuit text and the other inputs."""
+        circuit_digest = hashlib.sha256(normalize_stim_text(circuit).encode()).hexdigest()
+        payload = json.dumps([kind, CHECKER_VERSIONS[kind], circuit_digest, parts], separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str):
+        """The stored value, or None."""
+        row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, kind: str, value) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, kind, version, value, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, kind, CHECKER_VERSIONS[kind], json.dumps(value), time.time()),
+        )
+        self._writes += 1
+        if self._writes % EVICTION_CHECK_INTERVAL == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete the least recently used rows beyond max_entries."""
+        (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# One connection per process; a forked worker must not reuse its parent's.
+_cache: VerificationCache | None = None
+_cache_pid: int | None = None
+
+
+def get_cache() -> VerificationCache | None:
+    """The cache configured by VERIFICATION_CACHE for this process, or None when disabled."""
+    global _cache, _cache_pid
+    location = os.environ.get("VERIFICATION_CACHE", str(DEFAULT_CACHE_PATH))
+    if location.lower() in ("off", "0", "none", ""):
+        return None
+    if _cache is None or _cache_pid != os.getpid() or _cache.path != Path(location):
+        _cache = VerificationCache(location)
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def cached_check_stabilizers(circuit: str, stabilizers: list[str]) -> dict[str, bool]:
+    """`check_stabilizers` through the on-disk cache."""
+    cache = get_cache()
+    if cache is None:
+        return check_stabilizers(circuit, stabilizers)
+    key = cache.key("check_stabilizers", circuit, list(stabilizers))
+    preserved = cache.get(key)
+    if preserved is not None:
+        return dict(zip(stabilizers, preserved))
+    result = check_stabilizers(circuit, stabilizers)
+    if is_unitary_circuit(ingest_circuit(circuit).circuit):
+        cache.put(key, "check_stabilizers", list(result.values()))
+    return result
+
+
+def cached_check_stabilizers_batch(items: list[tuple[str, list[str]]], workers: int = 1,
+                                   return_exceptions: bool = False) -> list:
+    """`check_stabilizers_batch` through the on-disk cache; only the misses are checked."""
+    cache = get_cache()
+    if cache is None:
+        return check_stabilizers_batch(items, workers=workers, return_exceptions=return_exceptions)
+    items = [(circuit, list(stabilizers)) for circuit, stabilizers in items]
+    keys = [cache.key("check_stabilizers", circuit, stabilizers) for circuit, stabilizers in items]
+    results = [None] * len(items)
+    misses = []
+    for i, ((_, stabilizers), key) in enumerate(zip(items, keys)):
+        preserved = cache.get(key)
+        if preserved is None:
+            misses.append(i)
+        else:
+            results[i] = dict(zip(stabilizers, preserved))
+
+    checked = check_stabilizers_batch([items[i] for i in misses], workers=workers,
+                                      return_exceptions=return_exceptions)
+    for i, result in zip(misses, checked):
+        results[i] = result
+        if isinstance(result, Exception):
+            continue
+        if is_unitary_circuit(ingest_circuit(items[i][0]).circuit):
+            cache.put(keys[i], "check_stabilizers", list(result.values()))
+    return results
+
+
+def cached_ft_check(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3,
+                    backend: str = "numpy") -> tuple[bool, float]:
+    """(is_fault_tolerant, ft_score) of `analyze_propagation` through the on-disk cache."""
+    cache = get_cache()
+    if cache is None:
+        analysis = analyze_propagation(circuit, data_qubits, flag_qubits, backend)
+        return analysis.is_fault_tolerant(d), analysis.ft_score(d)
+    key = cache.key("ft_check", circuit, sorted(data_qubits), sorted(flag_qubits), d, backend)
+    stored = cache.get(key)
+    if stored is not None:
+        return stored["fault_tolerant"], stored["ft_score"]
+    analysis = analyze_propagation(circuit, data_qubits, flag_qubits, backend)
+    is_ft, score = analysis.is_fault_tolerant(d), analysis.ft_score(d)
+    cache.put(key, "ft_check", {"fault_tolerant": is_ft, "ft_score": score})
+    return is_ft, score
+
+
+def cached_ft_score(circuit: str, data_qubits: list[int], flag_qubits: list[int], d: int = 3,
+                    backend: str = "numpy") -> float:
+    """`check_error_propagation.ft_score` through the on-disk cache."""
+    return cached_ft_check(circuit, data_qubits, flag_qubits, d, backend)[1]
+
+
+def cached_compute_metrics(
+    circuit_text: str,
+    volume_gates: frozenset[str] = DEFAULT_VOLUME_GATES,
+    *,
+    tick_is_barrier: bool = True,
+) -> CircuitMetrics:
+    """`circuit_metric.compute_metrics` through the on-disk cache."""
+    cache = get_cache()
+    if cache is None:
+        return compute_metrics(circuit_text, volume_gates, tick_is_barrier=tick_is_barrier)
+    key = cache.key("compute_metrics", circuit_text, sorted(volume_gates), tick_is_barrier)
+    stored = cache.get(key)
+    if stored is not None:
+        return CircuitMetrics(**stored)
+    metrics = compute_metrics(circuit_text, volume_gates, tick_is_barrier=tick_is_barrier)
+    cache.put(key, "compute_metrics", metrics.as_dict())
+    return metrics